@@ -0,0 +1,218 @@
+import argparse
+import numpy as np
+
+from pathlib import Path
+
+try:
+    from numba import njit             # rozbaľovanie blokov v skompilovanej slučke (ak je numba nainštalovaná)
+except ImportError:
+    njit = None
+
+# -------------------------------------------
+# Komprimované postings (PFor štýl ako v Lucene): postings.bin z indexera prepíšem do postings.pfor
+INDEX_DIR         = Path("data/index")
+PFOR_NAME         = "postings.pfor"
+PFOR_VERSION      = 1
+BLOCK             = 128        # počet čísel v bloku, všetky čísla v bloku majú spoločnú bitovú šírku
+PACK_CHUNK        = 1024       # koľko blokov jednej šírky bitovo balím naraz (obmedzí pamäť pri balení)
+
+# Formát postings.pfor (little-endian):
+#   u32 n, u32 verzia, u64 start[n + 1]   – začiatok termu v u32 slovách dátovej časti (termy v poradí terms.bin)
+#   dáta pre každý term:
+#     u8 (doc_bits, tf_bits) pre každý blok, doplnené nulami na celé u32 slovo
+#     pre každý blok: doc medzery (prvá = doc index), potom tf - 1, každé zbalené na svoju šírku
+#   posledný blok termu má len df % 128 čísel a zaberie len toľko slov, koľko ich naozaj treba
+
+
+# ------------------------------------------
+# zápis
+
+def _bit_widths(blocks: np.ndarray) -> np.ndarray:
+    # najmenšia bitová šírka, do ktorej sa zmestí každé číslo v bloku (frexp exponent = počet bitov, 0 -> 0)
+    return np.frexp(blocks.max(axis=1).astype(np.float64))[1].astype(np.uint8)
+
+def _pack_blocks(blocks: np.ndarray, widths: np.ndarray) -> list:
+    # každý blok zbalím na jeho šírku: bity čísel idú za sebou od najnižšieho (little-endian bitstream)
+    # bloky rovnakej šírky balím naraz cez numpy
+    packed = [b""] * len(blocks)
+    for w in np.unique(widths).tolist():
+        if w == 0:
+            continue
+        rows = np.flatnonzero(widths == w)
+        shifts = np.arange(w, dtype=np.uint32)
+        for s in range(0, len(rows), PACK_CHUNK):
+            part = rows[s:s + PACK_CHUNK]
+            bits = ((blocks[part, :, None] >> shifts) & 1).astype(np.uint8).reshape(len(part), BLOCK * w)
+            data = np.packbits(bits, axis=1, bitorder="little")
+            for r, row in zip(part.tolist(), data):
+                packed[r] = row.tobytes()
+    return packed
+
+def pack_postings(dfs: np.ndarray, postings: np.ndarray) -> bytes:
+    # postings.bin (pre každý term u32 doc[df] vzostupne, u32 tf[df]) -> obsah postings.pfor
+    n = len(dfs)
+    dfs = dfs.astype(np.int64)
+    starts = np.zeros(n, dtype=np.int64)
+    np.cumsum(2 * dfs[:-1], out=starts[1:])
+    total = int(dfs.sum())
+
+    # doc indexy a tf všetkých termov za sebou (bez prekladania), pozícia v rámci termu
+    in_term = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(dfs) - dfs, dfs)
+    src = np.repeat(starts, dfs) + in_term
+    ids = np.asarray(postings[src], dtype=np.uint32)
+    tfs = np.asarray(postings[src + np.repeat(dfs, dfs)], dtype=np.uint32) - 1
+
+    # delta kódovanie: medzera k predchádzajúcemu dokumentu v tom istom terme, prvý ostane celý
+    gaps = ids.copy()
+    gaps[1:] -= ids[:-1]
+    first = in_term == 0
+    gaps[first] = ids[first]
+
+    # rozdelenie do blokov po 128 (posledný blok termu doplním nulami, nuly nezvýšia šírku)
+    nblocks = (dfs + BLOCK - 1) // BLOCK
+    block_start = np.zeros(n, dtype=np.int64)
+    np.cumsum(nblocks[:-1], out=block_start[1:])
+    slot = np.repeat(block_start * BLOCK, dfs) + in_term
+    doc_blocks = np.zeros((int(nblocks.sum()), BLOCK), dtype=np.uint32)
+    tf_blocks = np.zeros_like(doc_blocks)
+    doc_blocks.reshape(-1)[slot] = gaps
+    tf_blocks.reshape(-1)[slot] = tfs
+
+    doc_bits = _bit_widths(doc_blocks)
+    tf_bits = _bit_widths(tf_blocks)
+    doc_packed = _pack_blocks(doc_blocks, doc_bits)
+    tf_packed = _pack_blocks(tf_blocks, tf_bits)
+    del doc_blocks, tf_blocks
+
+    # poskladám termy: hlavička so šírkami, potom bloky (z posledného bloku len potrebné slová)
+    out = []
+    term_start = np.zeros(n + 1, dtype=np.int64)
+    pos = 0
+    for t, (df, b0, nb) in enumerate(zip(dfs.tolist(), block_start.tolist(), nblocks.tolist())):
+        term_start[t] = pos
+        widths = np.empty(2 * nb, dtype=np.uint8)
+        widths[0::2] = doc_bits[b0:b0 + nb]
+        widths[1::2] = tf_bits[b0:b0 + nb]
+        head = widths.tobytes()
+        head += b"\0" * (-len(head) % 4)
+        out.append(head)
+        pos += len(head) // 4
+        for k in range(nb):
+            cnt = min(BLOCK, df - k * BLOCK)
+            for packed, w in ((doc_packed[b0 + k], widths[2 * k]), (tf_packed[b0 + k], widths[2 * k + 1])):
+                words = (cnt * int(w) + 31) // 32
+                out.append(packed[:4 * words])
+                pos += words
+    term_start[n] = pos
+
+    header = np.array([n, PFOR_VERSION], dtype="<u4").tobytes() + term_start.astype("<u8").tobytes()
+    return header + b"".join(out)
+
+
+# ------------------------------------------
+# čítanie
+
+def _unpack_block(words, pos, cnt, w, out, o):
+    # rozbalí cnt čísel šírky w zo slov od pozície pos do out[o:], vráti pozíciu za blokom
+    if w == 0:
+        for i in range(cnt):
+            out[o + i] = 0
+        return pos
+    mask = (1 << w) - 1
+    for i in range(cnt):
+        bit = i * w
+        j = pos + (bit >> 5)
+        s = bit & 31
+        v = np.int64(words[j]) >> s
+        if s + w > 32:
+            v |= np.int64(words[j + 1]) << (32 - s)
+        out[o + i] = v & mask
+    return pos + (cnt * w + 31) // 32
+
+def _unpack_block_np(words, pos, cnt, w, out, o):
+    # to isté bez numby: bity cez unpackbits a skalárny súčin s mocninami dvojky
+    nwords = (cnt * w + 31) // 32
+    if w:
+        bits = np.unpackbits(words[pos:pos + nwords].view(np.uint8), bitorder="little")[:cnt * w]
+        out[o:o + cnt] = bits.reshape(cnt, w) @ (np.uint64(1) << np.arange(w, dtype=np.uint64))
+    else:
+        out[o:o + cnt] = 0
+    return pos + nwords
+
+if njit is not None:
+    _unpack_block = njit(cache=True)(_unpack_block)      # LLVM slučku so shift/mask vektorizuje
+else:
+    _unpack_block = _unpack_block_np
+
+def decode_term(words: np.ndarray, start: int, df: int):
+    # postings jedného termu z postings.pfor -> (doc indexy vzostupne, tf) ako u32 polia
+    nb = (df + BLOCK - 1) // BLOCK
+    widths = words[start:start + (2 * nb + 3) // 4].view(np.uint8)[:2 * nb].tolist()
+    pos = start + (2 * nb + 3) // 4
+    ids = np.empty(df, dtype=np.uint32)
+    tfs = np.empty(df, dtype=np.uint32)
+    for k in range(nb):
+        cnt = min(BLOCK, df - k * BLOCK)
+        pos = _unpack_block(words, pos, cnt, widths[2 * k], ids, k * BLOCK)
+        pos = _unpack_block(words, pos, cnt, widths[2 * k + 1], tfs, k * BLOCK)
+    np.cumsum(ids, out=ids)       # medzery -> doc indexy
+    tfs += 1
+    return ids, tfs
+
+def load_packed_postings(index_dir: Path, terms):
+    # vráti get_postings(term) -> (doc indexy, tf) nad postings.pfor (mmap), alebo None, ak súbor nie je
+    # alebo nesedí verzia / počet termov s terms.bin; terms = slovník z load_binary_index
+    path = index_dir / PFOR_NAME
+    if not path.exists():
+        return None
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    head = raw[:8].view("<u4")
+    n = int(head[0])
+    if int(head[1]) != PFOR_VERSION or n != len(terms):
+        return None
+    term_start = raw[8:8 + 8 * (n + 1)].view("<u8")
+    words = np.asarray(raw[8 + 8 * (n + 1):].view("<u4"))
+
+    def get_postings(term):
+        e = terms.get(term)
+        if e is None:
+            return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint32)
+        return decode_term(words, int(term_start[e[6]]), e[1])
+
+    return get_postings
+
+
+# --------- CLI ---------------------------------------------------------------
+
+def main():
+    # vstup: priečinok s binárnym indexom z indexera, výstup postings.pfor vedľa neho
+    parser = argparse.ArgumentParser(
+        description="Prepíše postings.bin do komprimovaného postings.pfor (delta + bit-packing po blokoch 128)."
+    )
+    parser.add_argument("--index-dir", type=Path, default=INDEX_DIR,
+                        help="Priečinok s terms.bin a postings.bin (default: data/index).")
+    args = parser.parse_args()
+
+    terms_path = args.index_dir / "terms.bin"
+    postings_path = args.index_dir / "postings.bin"
+    if not (terms_path.exists() and postings_path.exists()):
+        raise SystemExit(f"[ERR] Chýba terms.bin alebo postings.bin v {args.index_dir}")
+
+    # z terms.bin mi stačí počet termov a DF (layout podľa indexera)
+    raw = terms_path.read_bytes()
+    n = int.from_bytes(raw[:4], "little")
+    dfs = np.frombuffer(raw, dtype="<u4", count=n, offset=8 + 32 * n)
+    if postings_path.stat().st_size:
+        postings = np.memmap(postings_path, dtype="<u4", mode="r")
+    else:
+        postings = np.empty(0, dtype="<u4")
+
+    out_path = args.index_dir / PFOR_NAME
+    out_path.write_bytes(pack_postings(dfs, postings))
+
+    before, after = postings_path.stat().st_size, out_path.stat().st_size
+    print(f"[OK] {postings_path.name}: {before} B -> {out_path.name}: {after} B"
+          f" ({before / max(after, 1):.1f}x menšie)")
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,156 @@
 import os
-import re
 import csv
 import time
+import heapq
 import random
-import requests
+import sqlite3
+import asyncio
+import aiohttp
+import zstandard
+from selectolax.lexbor import LexborHTMLParser
+from pybloom_live import ScalableBloomFilter
 from datetime import datetime
+from functools import lru_cache
 from collections import deque
-from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit
+from urllib.parse import urljoin, urlsplit, urlunsplit
 from urllib.robotparser import RobotFileParser
+from extractor import get_allowed_section, is_denied_url
 
 # ----------------- Konfigurácia -----------------
 BASE_URL = "https://www.drugs.com"
 HEADERS = {
     "User-Agent": "STU-FIIT-StudentCrawler/1.0 (course Information Retrieval; contact: xkuchtovas@stuba.sk)"
 }
-SAVE_DIR = "data/html_stranky"
-
-TO_VISIT_QUEUE_FILE = "to_visit_queue.txt"   # FIFO fronta čakajúcich URL
-VISITED_FILE = "visited.txt"                 # set už navštívených URL
-CSV_LOG = "crawl_log.csv"                    # logovanie behu crawlu
+SAVE_DIR = "data/html_stranky"              # logický priečinok html (v crawl logu); obsah ide do PAGES_DB
+PAGES_DB = "pages.db"                        # stiahnuté html stránky (zstd) v jednej SQLite db namiesto tisícov súborov
+PAGES_COMMIT_EVERY = 50                      # po koľkých uložených stránkach commitnem pages.db
+PAGES_ZSTD_LEVEL = 3                         # úroveň zstd kompresie html
+NON_HTML_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp",
+                       ".zip", ".gz", ".mp4", ".mp3", ".doc", ".docx", ".xls", ".xlsx"}  # url s touto príponou nesťahujem
+
+TO_VISIT_QUEUE_FILE = "to_visit_queue.txt"   # pôvodná textová FIFO fronta (migruje sa do QUEUE_DB)
+QUEUE_DB = "queue.db"                        # FIFO fronta čakajúcich URL v SQLite
+VISITED_FILE = "visited.txt"                 # set už navštívených URL (append-only log)
+VISITED_BLOOM_CAPACITY = 100000              # počiatočná kapacita Bloom filtra pre visited (ďalej sa sám zväčšuje)
+VISITED_BLOOM_ERROR = 0.001                  # povolená miera falošne pozitívnych zásahov
+CSV_LOG = "crawl_log.csv"                    # pôvodný csv log behu crawlu (migruje sa do CRAWL_LOG_DB)
+CRAWL_LOG_DB = "crawl_log.db"                # logovanie behu crawlu v SQLite
 
 CRAWL_DELAY_BASE = 8                        # pauza po úspešnom stiahnutí
 FAILED_URLS_FILE = "failed.txt"              # finálne zlyhané URL po vyčerpaní pokusov
 
-# Jednoduchý backoff requeue - pri chybe vraciame URL na koniec fronty až MAX_RETRIES krát
+LOG_COMMIT_EVERY = 50                        # po koľkých riadkoch commitnem crawl log na disk
+QUEUE_SAVE_EVERY = 500                       # po koľkých spracovaných url priebežne uložím retry počty
+
+# Súbežnosť - koľko požiadaviek môže byť naraz rozbehnutých a koľko z nich na jeden host
+CONCURRENCY = 100                            # globálny strop súbežných požiadaviek (asyncio.Semaphore)
+MAX_PER_HOST = 2                             # max. súbežných požiadaviek na jeden host (slušné crawlovanie)
+BATCH_SIZE = CONCURRENCY                     # koľko url naraz vyberiem z fronty do jednej dávky
+
+# Backoff requeue - pri chybe vraciame URL po exponenciálnom čakaní na koniec fronty až MAX_RETRIES krát
 MAX_RETRIES = 3
 RETRY_COUNTS_FILE = "retry_counts.txt"       # evidujeme počty pokusov: TSV (url \t count)
+BACKOFF_BASE = 2                             # základ exponenciálneho backoffu (s)
+BACKOFF_CAP = 60                             # horný strop čakania pred ďalším pokusom (s)
+
+ROBOTS_TTL = 6 * 3600                        # ako dlho (s) platí stiahnutý/načítaný robots.txt
+ALWAYS_CHECKED_PREFIXES = ("/pro/", "/mtm/") # sekcie, ktoré aj tak overuje get_allowed_section v extraktore
+_parser_cache = {}                           # base_url -> (parser, time.monotonic() pri načítaní)
 
 
 # ----------------------------------
 #  funkcie na prácu s robot.txt
 
-def get_robots_parser(base_url=BASE_URL, cache_file="robots.txt"):
+def _parse_robots(lines):
     parser = RobotFileParser()
+    parser.parse(lines)
+    # prefixy z ALWAYS_CHECKED_PREFIXES, ktoré žiadne Disallow pravidlo pre "*" nezasahuje
+    # - pre tieto url potom is_allowed nemusí prechádzať pravidlá
+    rules = [r.path for e in parser.entries + [parser.default_entry]
+             if e is not None and e.applies_to("*")
+             for r in e.rulelines if not r.allowance]
+    parser.fast_allow = tuple(p for p in ALWAYS_CHECKED_PREFIXES
+                              if not parser.disallow_all
+                              and not any(r.startswith(p) or p.startswith(r) for r in rules if r))
+    return parser
 
-    # zistím, či som už robot.txt raz stiahla a mám ho uložený - ak áno, sparsujem ho
-    if os.path.exists(cache_file):
-        with open(cache_file, "r", encoding="utf-8") as f:
-            parser.parse(f.read().splitlines())
-        return parser
 
-    # ak som ho ešte nestiahla tak ho stiahnem a sparsujem
-    try:
-        resp = requests.get(base_url + "/robots.txt", headers=HEADERS, timeout=(10, 30))
-        if resp.status_code == 200:
-            with open(cache_file, "w", encoding="utf-8") as f:
-                f.write(resp.text)
-            parser.parse(resp.text.splitlines())
-    except requests.exceptions.RequestException:
-        # Ak sieť zlyhá, ponechám parser prázdny (teda default bude allow all)
-        pass
+async def get_robots_parser(session, base_url=BASE_URL, cache_file="robots.txt"):
+    # parser držím v pamäti (_parser_cache) a znova ho načítam až po uplynutí ROBOTS_TTL
+    cached = _parser_cache.get(base_url)
+    if cached and time.monotonic() - cached[1] < ROBOTS_TTL:
+        return cached[0]
+
+    parser = None
+    # zistím, či som už robot.txt raz stiahla a mám ho uložený - ak áno a nie je starý, sparsujem ho
+    if os.path.exists(cache_file) and time.time() - os.path.getmtime(cache_file) < ROBOTS_TTL:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            parser = _parse_robots(f.read().splitlines())
+
+    # ak som ho ešte nestiahla (alebo je starý) tak ho stiahnem a sparsujem
+    if parser is None:
+        # sťahujem cez tú istú aiohttp session ako stránky (jedno keep-alive spojenie, žiadny ďalší handshake)
+        try:
+            timeout = aiohttp.ClientTimeout(connect=10, total=30)
+            async with session.get(base_url + "/robots.txt", timeout=timeout) as resp:
+                if resp.status == 200:
+                    text = await resp.text(errors="replace")
+                    with open(cache_file, "w", encoding="utf-8") as f:
+                        f.write(text)
+                    parser = _parse_robots(text.splitlines())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+
+    if parser is None:
+        if os.path.exists(cache_file):
+            # stiahnuť sa nepodarilo - radšej použijem starú kópiu z disku
+            with open(cache_file, "r", encoding="utf-8") as f:
+                parser = _parse_robots(f.read().splitlines())
+        else:
+            # Ak sieť zlyhá, ponechám parser prázdny (teda default bude allow all)
+            parser = RobotFileParser()
+            parser.fast_allow = ()
 
+    _parser_cache[base_url] = (parser, time.monotonic())
     return parser
 
 
 def is_allowed(url, parser):
     # overím či môžem danú url sťahovať podľa robot.txt
+    # /pro/ a /mtm/ (ak ich robots.txt nijako neobmedzuje) pustím hneď bez prechádzania pravidiel
+    fast = getattr(parser, "fast_allow", ())
+    if fast and urlsplit(url).path.startswith(fast):
+        return True
     return parser.can_fetch("*", url)
 
 
 # ----------------------------------
 #  funkcie na prácu so zoznamom navštívených stránok
 def load_visited(filename=VISITED_FILE):
-    # Načítam visited.txt pomocu set aby sme nemali duplicity
+    # visited.txt načítam do Bloom filtra - pri 100k+ url by plný set zaberal zbytočne veľa RAM
+    # (pár falošných pozitív ~0.1 % znamená len to, že sa niektorá url preskočí)
+    visited = ScalableBloomFilter(initial_capacity=VISITED_BLOOM_CAPACITY, error_rate=VISITED_BLOOM_ERROR)
     if not os.path.exists(filename):
-        return set()
+        return visited
     with open(filename, "r", encoding="utf-8") as f:
-        return set(line.strip() for line in f if line.strip())
+        for line in f:
+            line = line.strip()
+            if line:
+                visited.add(line)
+    return visited
 
 
-def save_visited(visited, filename=VISITED_FILE):
-    # uloží zoznam navštívených url do súboru
-    with open(filename, "w", encoding="utf-8") as f:
-        for u in sorted(visited):
-            f.write(u + "\n")
+def append_visited(f, urls):
+    # pripíšem navštívené url dávky na koniec logu – až keď je dávka vo fronte (queue.db) potvrdená,
+    # inak by po páde boli url vo visited.txt, ale ich nájdené linky by sa do fronty nikdy nedostali
+    f.write("".join(u + "\n" for u in urls))
+    f.flush()
 
 
 # ----------------------------------
-# funkcie na prácu s frontou (FIFO)
+# funkcie na prácu s frontou (FIFO) - fronta je v SQLite (queue.db), nedržím ju celú v pamäti
 def load_queue(filename=TO_VISIT_QUEUE_FILE):
-    # Načítam FIFO frontu z disku do deque aby som zachovala poradie url
+    # Načítam starú textovú FIFO frontu (používa sa už iba pri migrácii do queue.db)
     if not os.path.exists(filename):
         return deque()
     with open(filename, "r", encoding="utf-8") as f:
@@ -87,11 +158,48 @@ def load_queue(filename=TO_VISIT_QUEUE_FILE):
     return deque(lines)
 
 
-def save_queue(q, filename=TO_VISIT_QUEUE_FILE):
-    # uložím aktuálne poradie aby som ho zachovala (FIFO)
-    with open(filename, "w", encoding="utf-8") as f:
-        for u in q:
-            f.write(u + "\n")
+def open_queue(db_path=QUEUE_DB, legacy_file=TO_VISIT_QUEUE_FILE):
+    # otvorím (alebo vytvorím) frontu v SQLite; seq drží FIFO poradie, url je unikátna
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS q(seq INTEGER PRIMARY KEY AUTOINCREMENT, host TEXT, url TEXT UNIQUE)")
+    conn.execute("CREATE INDEX IF NOT EXISTS q_host_seq ON q(host, seq)")
+    conn.commit()
+
+    # ak mám ešte starú frontu v txt, raz ju prelejem do db a txt odložím, aby sa nenačítala znova
+    if os.path.exists(legacy_file):
+        with conn:
+            _insert_urls(conn, load_queue(legacy_file))
+        os.replace(legacy_file, legacy_file + ".migrated")
+    return conn
+
+
+def _insert_urls(conn, urls):
+    # vložím url na koniec fronty (už zaradené url sa ticho preskočia - INSERT OR IGNORE)
+    conn.executemany("INSERT OR IGNORE INTO q(host, url) VALUES (?, ?)",
+                     ((urlsplit(u).netloc, u) for u in urls))
+
+
+def enqueue(conn, urls):
+    with conn:
+        _insert_urls(conn, urls)
+
+
+def peek_queue(conn, after_seq, n):
+    # prečítam ďalších n url z čela fronty (za after_seq); mažú sa až po spracovaní dávky
+    return conn.execute("SELECT seq, url FROM q WHERE seq > ? ORDER BY seq LIMIT ?", (after_seq, n)).fetchall()
+
+
+def finish_batch(conn, seqs, new_urls):
+    # v jednej transakcii odstránim spracovanú dávku a pridám novo nájdené url
+    with conn:
+        conn.executemany("DELETE FROM q WHERE seq = ?", ((s,) for s in seqs))
+        _insert_urls(conn, new_urls)
+
+
+def queue_size(conn):
+    return conn.execute("SELECT COUNT(*) FROM q").fetchone()[0]
 
 
 # ----------------------------------
@@ -116,34 +224,81 @@ def save_retry_counts(d):
 
 
 # ---------------------------------
-# inicializujem si csv súbor, v ktorom si udržiavam základé údaje o sťahovaných súboroch
-
-def init_csv(csv_path=CSV_LOG):
-    # vytvorím si hlavičku dokumentu aby som potom už iba pridávala informácie
-    if not os.path.exists(csv_path):
-        with open(csv_path, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["timestamp", "url", "filepath", "status", "http_status", "bytes", "elapsed_ms"])
-
-
-def log_csv(url, filepath, status, http_status=None, nbytes=None, elapsed_ms=None):
-    # pridávam nové riadky do csv súboru aby som mala prehľad
-    with open(CSV_LOG, "a", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([
-            datetime.now().isoformat(timespec="seconds"),           # čas kedy som stiahla súbor
-            url,                                                    # url, ktorú som sťahovala
-            filepath or "",                                         # kde som to uložila (ak sa mi to podarilo inak prázdneň
-            status,                                                 # status sťahovania (či sa mi to podarilo alebo je tam výnimkaň
-            (http_status if http_status is not None else ""),       # aky status som dostala pri odpovedi (napr. 200)
-            (nbytes if nbytes is not None else ""),                 # veľkosť stiahnuého súboru (ak sa stiahol)
-            (elapsed_ms if elapsed_ms is not None else "")          # ako dlho trvala odpoveď od servera
-        ])
+# crawl log - základné údaje o sťahovaných url držím v SQLite (crawl_log.db), extraktor si z neho
+# vyberá iba status=ok jedným dotazom namiesto parsovania celého csv
+
+def _log_value(v):
+    # hodnoty zo starého csv logu: prázdny reťazec -> NULL, čísla -> int
+    if v == "":
+        return None
+    return int(v) if v.isdigit() else v
+
+
+def init_crawl_log(db_path=CRAWL_LOG_DB, legacy_csv=CSV_LOG):
+    # vytvorím tabuľku logu (ak ešte nie je) a raz do nej prelejem starý crawl_log.csv
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS log(timestamp TEXT, url TEXT, filepath TEXT, status TEXT, "
+                 "http_status INTEGER, bytes INTEGER, elapsed_ms INTEGER)")
+    conn.execute("CREATE INDEX IF NOT EXISTS log_status ON log(status)")
+    conn.commit()
+    if os.path.exists(legacy_csv):
+        with open(legacy_csv, "r", newline="", encoding="utf-8") as f, conn:
+            reader = csv.reader(f)
+            next(reader, None)          # hlavička
+            conn.executemany("INSERT INTO log VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             ([_log_value(v) for v in row] for row in reader if len(row) == 7))
+        os.replace(legacy_csv, legacy_csv + ".migrated")
+    return conn
+
+
+# crawl log držím otvorený počas celého behu a commitujem ho iba po dávkach riadkov
+_log_db = None
+_log_pending = 0
+
+
+def open_crawl_log(db_path=CRAWL_LOG_DB):
+    # otvorím crawl log raz na celý beh
+    global _log_db, _log_pending
+    _log_db = init_crawl_log(db_path)
+    _log_pending = 0
+
+
+def close_crawl_log():
+    # zapíšem zvyšné riadky a zatvorím crawl log
+    global _log_db, _log_pending
+    if _log_db is not None:
+        _log_db.commit()
+        _log_db.close()
+    _log_db = None
+    _log_pending = 0
+
+
+def log_crawl(url, filepath, status, http_status=None, nbytes=None, elapsed_ms=None):
+    # pridávam nové riadky do crawl logu aby som mala prehľad
+    global _log_pending
+    if _log_db is None:
+        open_crawl_log()
+    _log_db.execute("INSERT INTO log VALUES (?, ?, ?, ?, ?, ?, ?)", (
+        datetime.now().isoformat(timespec="seconds"),           # čas kedy som stiahla súbor
+        url,                                                    # url, ktorú som sťahovala
+        filepath or "",                                         # kde som to uložila (ak sa mi to podarilo inak prázdne)
+        status,                                                 # status sťahovania (či sa mi to podarilo alebo je tam výnimka)
+        http_status,                                            # aky status som dostala pri odpovedi (napr. 200)
+        nbytes,                                                 # veľkosť stiahnuého súboru (ak sa stiahol)
+        elapsed_ms,                                             # ako dlho trvala odpoveď od servera
+    ))
+    # na disk posielam riadky iba raz za LOG_COMMIT_EVERY riadkov
+    _log_pending += 1
+    if _log_pending >= LOG_COMMIT_EVERY:
+        _log_db.commit()
+        _log_pending = 0
 
 
 # ----------------------------------
-def normalize_url(u: str) -> str:
-    # normalizujem url aby bola malými písmenami, bola bez query a koncovej lomky aby som predišla duplicitám
+def _normalize_url_slow(u: str) -> str:
+    # pôvodná normalizácia cez urllib - používam ju len pre nezvyčajné url (porty, userinfo, IPv6, medzery...)
     s = urlsplit(u)
     scheme = "https"
     netloc = s.netloc.lower()
@@ -151,184 +306,360 @@ def normalize_url(u: str) -> str:
     return urlunsplit((scheme, netloc, path, "", ""))
 
 
+@lru_cache(maxsize=200000)
+def normalize_url(u: str) -> str:
+    # normalizujem url aby bola malými písmenami, bola bez query a koncovej lomky aby som predišla duplicitám
+    # bežné http(s) url spracujem priamo cez slicing (bez urlsplit/urlunsplit), ostatné cez _normalize_url_slow
+    if u.startswith("https://"):
+        p = 8
+    elif u.startswith("http://"):
+        p = 7
+    else:
+        return _normalize_url_slow(u)
+    if "\t" in u or "\r" in u or "\n" in u:
+        return _normalize_url_slow(u)
+
+    # koniec hostu je prvý z '/', '?', '#'
+    q = len(u)
+    for ch in "/?#":
+        i = u.find(ch, p, q)
+        if i != -1:
+            q = i
+    host = u[p:q]
+    if not host or not host.isascii() or "@" in host or ":" in host or "[" in host or "]" in host:
+        return _normalize_url_slow(u)
+
+    path = u[q:].split("#", 1)[0].split("?", 1)[0].rstrip("/")
+    return "https://" + host.lower() + path
+
+
 def extract_links(html, base_url):
-    # prechádzam html subor a hľadám referencie na stránky
+    # prechádzam html subor a hľadám referencie na stránky (parsovanie robí selectolax v C, nie regex)
     links = set()
-    for match in re.findall(r'href=[\'"]([^\'"]+)[\'"]', html, flags=re.IGNORECASE):
+    # doménu base_url si zistím iba raz - normalizované url sú vždy https://<netloc>/..., takže stačí porovnať prefix
+    site = "https://" + urlsplit(base_url).netloc
+    site_prefix = site + "/"
+    for node in LexborHTMLParser(html).css("a[href]"):
+        href = (node.attributes.get("href") or "").strip()
         # preskočím pseudo-odkazy a e-mailové odkazy
-        if not match or match.startswith(("javascript:", "#", "mailto:")):
+        if not href or href.startswith(("javascript:", "#", "mailto:")):
             continue
         # zmením relatívne adresy na absolútne podľa base_url
-        full = urljoin(base_url, match)
+        full = urljoin(base_url, href)
         # normalizujem url aby mala malé písmená, bola bez query a poslednje lomky
         full = normalize_url(full)
         # skontrolujem, či daná adresa zostáva na mojej doméne drugs.com - tie ktore idu mimo zahodím
-        if urlparse(full).netloc == urlparse(base_url).netloc:
-            links.add(full)
+        if not (full == site or full.startswith(site_prefix)):
+            continue
+        # url, ktoré extraktor aj tak zahodí (nie je to stránka lieku ani známy zoznam/index), vôbec nezaraďujem
+        # - indexy z deny listu (napr. /alpha/...) nechávam, lebo cez ne crawler objavuje stránky liekov
+        if get_allowed_section(full) is None and not is_denied_url(full):
+            continue
+        links.add(full)
     return links
 
 
 def safe_filename_from_url(url):
     # vytvorím názov súboru podľa url ktoru spracovávam - odstranim protokol, nahradím / _ aby to nebralo
     # # ako cestu a pridam .html ak nie je
-    name = re.sub(r"^https?://", "", url).replace("/", "_")
+    # protokol odstránim obyčajným slicingom (na pevný prefix netreba regex)
+    if url.startswith("https://"):
+        url = url[8:]
+    elif url.startswith("http://"):
+        url = url[7:]
+    name = url.replace("/", "_")
     if not name.endswith(".html"):
         name += ".html"
     return os.path.join(SAVE_DIR, name)
 
 
-def polite_sleep(base=CRAWL_DELAY_BASE):
-    # náhodná pauza po úspešnom stiahnutí url (base + náhodný jitter 0–3 s).
-    time.sleep(base + random.uniform(0.0, 3.0))
+async def polite_sleep(base=CRAWL_DELAY_BASE):
+    # náhodná pauza po úspešnom stiahnutí url (base + náhodný jitter 0–3 s) - neblokuje ostatné požiadavky
+    await asyncio.sleep(base + random.uniform(0.0, 3.0))
+
+
+# ----------------------------------
+# úložisko stiahnutých stránok - jedna SQLite db, html je skomprimované cez zstd
+# kľúčom je meno súboru (ako v crawl logu), aby extraktor vedel páry log <-> stránka nájsť rovnako ako predtým
+_pages_db = None
+_pages_pending = 0
+_zstd = zstandard.ZstdCompressor(level=PAGES_ZSTD_LEVEL)
+
+
+def open_pages_db(db_path=PAGES_DB):
+    global _pages_db, _pages_pending
+    _pages_db = sqlite3.connect(db_path)
+    _pages_db.execute("PRAGMA journal_mode=WAL")
+    _pages_db.execute("PRAGMA synchronous=NORMAL")
+    _pages_db.execute("CREATE TABLE IF NOT EXISTS pages(name TEXT PRIMARY KEY, url TEXT, html BLOB)")
+    _pages_db.commit()
+    _pages_pending = 0
+
+
+def close_pages_db():
+    # commitnem zvyšné stránky a zatvorím db
+    global _pages_db, _pages_pending
+    if _pages_db is not None:
+        _pages_db.commit()
+        _pages_db.close()
+    _pages_db = None
+    _pages_pending = 0
+
+
+def store_page(filepath, url, html):
+    # uložím stiahnuté html (skomprimované) pod menom súboru; commitujem iba raz za PAGES_COMMIT_EVERY stránok
+    global _pages_pending
+    if _pages_db is None:
+        open_pages_db()
+    _pages_db.execute("INSERT OR REPLACE INTO pages(name, url, html) VALUES (?, ?, ?)",
+                      (os.path.basename(filepath), url, _zstd.compress(html.encode("utf-8"))))
+    _pages_pending += 1
+    if _pages_pending >= PAGES_COMMIT_EVERY:
+        _pages_db.commit()
+        _pages_pending = 0
+
+
+# per-host semafory - na jeden host púšťam najviac MAX_PER_HOST požiadaviek naraz (vrátane slušnej pauzy)
+_host_slots = {}
+
+
+def host_slot(url):
+    # vrátim semafor pre host danej url, ak ešte neexistuje tak ho vytvorím
+    host = urlsplit(url).netloc
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(MAX_PER_HOST)
+    return slot
 
 
 # ----------------------------------
 # hlavná funkcia pre sťahovanie url
 
-def download_page(url, parser):
+async def download_page(session, url, parser):
     # skontrolujem či url nie je zakazana podľa robot.txt, ak áno tak skončím
     if not is_allowed(url, parser):
         print(f"[BLOCKED] {url}")
-        log_csv(url, None, status="blocked")
+        log_crawl(url, None, status="blocked")
         return None, set(), "blocked", None, None, None
 
-    # cieľový priečinok a názov súboru
-    os.makedirs(SAVE_DIR, exist_ok=True)
+    # podľa prípony zjavne nejde o html (pdf, obrázky, archívy) - vôbec ju nesťahujem
+    if os.path.splitext(urlsplit(url).path)[1] in NON_HTML_EXTENSIONS:
+        print(f"[SKIP-NONHTML] {url}  (prípona)")
+        log_crawl(url, None, status="skip-nonhtml")
+        return None, set(), "skip-nonhtml", None, None, None
+
+    # názov súboru (pod týmto menom stránku uložím do pages.db a zapíšem do logu)
     filepath = safe_filename_from_url(url)
 
     try:
-        # samotný request
+        # samotný request - 10 sekund čakam na spojenie so serverom a celkovo najviac 40 na odpoveď
         t0 = time.time()                # čas odoslania požiadavky
-        resp = requests.get(url, headers=HEADERS, timeout=(10, 40)) # 10 sekund čakam na spojenie so serverom a 40 na odpoveď
-        elapsed_ms = int((time.time() - t0) * 1000)   # čas ako dlho trvalo serveru odpovedat na požiadavku v milisekundách
-        http_status = resp.status_code
-        ctype = (resp.headers.get("Content-Type") or "").lower()  # zistim, aky obsah mi server poslal - či je to html napr.
+        timeout = aiohttp.ClientTimeout(connect=10, total=40)
+        async with session.get(url, timeout=timeout) as resp:
+            http_status = resp.status
+            ctype = (resp.headers.get("Content-Type") or "").lower()  # zistim, aky obsah mi server poslal - či je to html napr.
+            if http_status == 200 and "text/html" not in ctype:
+                # nie je to html - telo vôbec nečítam, spojenie zavriem hneď po hlavičkách
+                nbytes = resp.content_length      # veľkosť (ak ju server poslal v hlavičke)
+                resp.close()
+            else:
+                body = await resp.read()
+                nbytes = len(body)   # zistím si veľkosť súboru
+            elapsed_ms = int((time.time() - t0) * 1000)   # čas ako dlho trvalo serveru odpovedat na požiadavku v milisekundách
+
+            # úslešne stiahnute html
+            if http_status == 200 and "text/html" in ctype:
+                html = await resp.text(errors="replace")
 
-        # úslešne stiahnute html
         if http_status == 200 and "text/html" in ctype:
-            # tvytorim si subor, kde zapíšem odpoveď servera (moje html)
-            html = resp.text
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(html)
+            # odpoveď servera (moje html) uložím do pages.db
+            store_page(filepath, url, html)
             # pokúsim sa získať linky z hrml
             found = extract_links(html, BASE_URL)
-            nbytes = len(resp.content)   # zistím si veľkosť súboru
             print(f"[OK] {url}  ({nbytes} B)")
-            # vložím si údaje o súbore a url do csv súboru
-            log_csv(url, filepath, status="ok", http_status=http_status, nbytes=nbytes, elapsed_ms=elapsed_ms)
+            # vložím si údaje o súbore a url do crawl logu
+            log_crawl(url, filepath, status="ok", http_status=http_status, nbytes=nbytes, elapsed_ms=elapsed_ms)
             # počkám určitý čas kým začnej sťahovať novú url
-            polite_sleep()
+            await polite_sleep()
             return filepath, found, "ok", http_status, nbytes, elapsed_ms
 
         # úspešne stiahnuté, ale nie HTML (obrázky, PDF, JSON…) - preskočíme
         elif http_status == 200:
             print(f"[SKIP-NONHTML] {url}  Content-Type={ctype}")
-            log_csv(url, None, status="skip-nonhtml", http_status=http_status, nbytes=len(resp.content), elapsed_ms=elapsed_ms)
-            polite_sleep()
-            return None, set(), "skip-nonhtml", http_status, len(resp.content), elapsed_ms
+            log_crawl(url, None, status="skip-nonhtml", http_status=http_status, nbytes=nbytes, elapsed_ms=elapsed_ms)
+            await polite_sleep()
+            return None, set(), "skip-nonhtml", http_status, nbytes, elapsed_ms
 
         # neúslešné stiahnutie - chyba
         else:
             print(f"[ERROR] {url} ({http_status})")
-            log_csv(url, None, status="http-error", http_status=http_status, elapsed_ms=elapsed_ms)
-            time.sleep(2)  # krátka pauza po chybe
+            log_crawl(url, None, status="http-error", http_status=http_status, elapsed_ms=elapsed_ms)
             return None, set(), "http-error", http_status, None, elapsed_ms
 
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         # výnimky pri sťahovaní
-        print(f"[EXCEPTION] {url}: {e}")
-        log_csv(url, None, status="exception")
-        time.sleep(5)  # dlhšia pauza po výnimke
+        print(f"[EXCEPTION] {url}: {e!r}")
+        log_crawl(url, None, status="exception")
         return None, set(), "exception", None, None, None
 
 
+async def fetch(session, url, parser, sem):
+    # stiahnem jednu url - globálny semafor drží strop súbežnosti, per-host semafor slušnosť voči serveru
+    async with sem, host_slot(url):
+        return url, await download_page(session, url, parser)
+
+
 # ----------------- Hlavný crawl (FIFO + requeue backoff) -----------------
-def crawl_step(limit):
-    # vytvorím csv súbor pre zapisovanie informácií o url, datume, stave
-    init_csv()
-    # získam parser robot.txt
-    parser = get_robots_parser()
+async def crawl(limit):
+    # otvorím crawl log pre zapisovanie informácií o url, datume, stave
+    open_crawl_log()
+    # otvorím db pre stiahnuté html stránky
+    open_pages_db()
 
     # načítam aktuálne zoznamy
-    to_visit_q = load_queue()         # FIFO fronta
-    visited = load_visited()          # zoznam už spracovaných URL
-    to_visit_set = set(to_visit_q)    # pomocná množina
+    queue = open_queue()              # FIFO fronta v SQLite
+    visited = load_visited()          # Bloom filter už spracovaných URL
 
     retry_counts = load_retry_counts()  # mapovanie url -> pokusy
 
     # ak je prvý beh (prázdna fronta aj visited), vložím BASE_URL do zoznamu
-    if not to_visit_q and BASE_URL not in visited:
-        seed = normalize_url(BASE_URL)
-        to_visit_q.append(seed)
-        to_visit_set.add(seed)
+    if not queue_size(queue) and BASE_URL not in visited:
+        enqueue(queue, [normalize_url(BASE_URL)])
 
     count = 0  # koľko url spracujeme v tomto behu
 
-    while to_visit_q and count < limit:
-        print('count: ', count)
-        # zoberiem ďalšiu URL z čela fronty
-        url = to_visit_q.popleft()
-        to_visit_set.discard(url)
-
-        # ak sme ju už spracovali v inom behu, preskoč danu url
-        if url in visited:
-            continue
-
-        # pokus o stiahnutie
-        filepath, found_links, status, *_ = download_page(url, parser)
-
-        count += 1
-
-        if status == "ok":
-            # stiahnutu url adresu pridám do zoznamu stiahnutých
-            visited.add(url)
-            # url som úspešne stiahla, preto vynulujem counter pre počítanie pokusov stiahnutia
-            if url in retry_counts:
-                del retry_counts[url]
-            # do zoznamov pridám nové linky, ktore som ešte nenavštívila (nie su v to_visit_set)
-            for u in found_links:
-                if u not in visited and u not in to_visit_set:
-                    to_visit_q.append(u)
-                    to_visit_set.add(u)
-        # ak sa mi url nepodarilo stiahnúť
-        elif status in ("http-error", "exception"):
-            # zistím, koľký pokus o sťahovanie tejto url to už bol
-            attempts = retry_counts.get(url, 0) + 1   # ak je tam 0 tak vráti 1 = prvý pokus
-            retry_counts[url] = attempts        # uložím späť počet pokusov o stiahnutie
-            # ak som ešte nedosiahla limit pokusov sťahovania, vrátim ju do zoznamu
-            if attempts <= MAX_RETRIES:
-                to_visit_q.append(url)   # vráť na koniec fronty (časom sa k nej dostaneme znova)
-                to_visit_set.add(url)
-                log_csv(url, None, status="deferred")
-            else:
-                # po vyčerpaní pokusov už túto URL nechceme skúšať znova
-                visited.add(url)
-                # dosiahla som limit pokusov sťahovania, vložím do súboru neúspešne stiahnutých
-                with open(FAILED_URLS_FILE, "a", encoding="utf-8") as f:
-                    f.write(url + "\n")
-                log_csv(url, None, status="gave-up")
-                if url in retry_counts:
-                    del retry_counts[url]
-
-        else:
-            visited.add(url)
-            # ak je to blocked / skip-nonhtml, neskúšame znova stiahnúť a odstránime počet pokusov
-            if url in retry_counts:
-                del retry_counts[url]
-
-    # uložím stavy zoznamov (fronta, visited, retry počty)
-    save_queue(to_visit_q)
-    save_visited(visited)
+    sem = asyncio.Semaphore(CONCURRENCY)
+    # jedna session pre celý beh - drží otvorené spojenia (keep-alive) a cache DNS záznamov
+    connector = aiohttp.TCPConnector(limit=CONCURRENCY, limit_per_host=MAX_PER_HOST, ttl_dns_cache=600)
+    # visited.txt si otvorím iba raz a nové url do neho len pripisujem
+    visited_f = open(VISITED_FILE, "a", encoding="utf-8", buffering=1 << 16)
+
+    batch_visited = []  # navštívené url aktuálnej dávky – do visited.txt idú až po finish_batch
+
+    def mark_visited(u):
+        visited.add(u)
+        batch_visited.append(u)
+
+    next_save = QUEUE_SAVE_EVERY
+    delayed = []        # halda (čas pripravenosti, url) pre url čakajúce na ďalší pokus
+    # hlavičky (User-Agent) nastavím raz pre celú session
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS) as session:
+        # získam parser robot.txt
+        parser = await get_robots_parser(session)
+
+        while count < limit:
+            # url, ktorým už uplynul backoff, vrátim na koniec fronty
+            ready = []
+            while delayed and delayed[0][0] <= time.monotonic():
+                ready.append(heapq.heappop(delayed)[1])
+            if ready:
+                enqueue(queue, ready)
+
+            # vyberiem ďalšiu dávku URL z čela fronty
+            batch = []
+            seqs = []       # všetky prečítané riadky fronty (aj preskočené) - po dávke ich zmažem
+            last_seq = 0
+            while len(batch) < min(BATCH_SIZE, limit - count):
+                rows = peek_queue(queue, last_seq, BATCH_SIZE)
+                if not rows:
+                    break
+                for seq, url in rows:
+                    if len(batch) >= min(BATCH_SIZE, limit - count):
+                        break
+                    last_seq = seq
+                    seqs.append(seq)
+                    # ak sme ju už spracovali v inom behu, preskoč danu url
+                    if url in visited:
+                        continue
+                    batch.append(url)
+            if not batch:
+                finish_batch(queue, seqs, ())
+                if not delayed:
+                    break
+                # fronta je prázdna, ale niektoré url ešte čakajú na backoff - počkám na prvú z nich
+                await asyncio.sleep(max(0.0, delayed[0][0] - time.monotonic()))
+                continue
+            print('count: ', count, ' batch: ', len(batch))
+
+            # pokus o stiahnutie celej dávky naraz, výsledky spracujem v poradí ako dobiehajú
+            found_by_url = {}
+            tasks = [fetch(session, url, parser, sem) for url in batch]
+            for fut in asyncio.as_completed(tasks):
+                url, (filepath, found_links, status, *_) = await fut
+
+                count += 1
+
+                if status == "ok":
+                    # stiahnutu url adresu pridám do zoznamu stiahnutých
+                    mark_visited(url)
+                    # url som úspešne stiahla, preto vynulujem counter pre počítanie pokusov stiahnutia
+                    if url in retry_counts:
+                        del retry_counts[url]
+                    found_by_url[url] = found_links
+                # ak sa mi url nepodarilo stiahnúť
+                elif status in ("http-error", "exception"):
+                    # zistím, koľký pokus o sťahovanie tejto url to už bol
+                    attempts = retry_counts.get(url, 0) + 1   # ak je tam 0 tak vráti 1 = prvý pokus
+                    retry_counts[url] = attempts        # uložím späť počet pokusov o stiahnutie
+                    # ak som ešte nedosiahla limit pokusov sťahovania, vrátim ju do zoznamu
+                    if attempts <= MAX_RETRIES:
+                        # do fronty ju nevrátim hneď, ale až po exponenciálnom backoffe s náhodným jitterom
+                        delay = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempts) * random.random()
+                        heapq.heappush(delayed, (time.monotonic() + delay, url))
+                        log_crawl(url, None, status="deferred")
+                    else:
+                        # po vyčerpaní pokusov už túto URL nechceme skúšať znova
+                        mark_visited(url)
+                        # dosiahla som limit pokusov sťahovania, vložím do súboru neúspešne stiahnutých
+                        with open(FAILED_URLS_FILE, "a", encoding="utf-8") as f:
+                            f.write(url + "\n")
+                        log_crawl(url, None, status="gave-up")
+                        if url in retry_counts:
+                            del retry_counts[url]
+
+                else:
+                    mark_visited(url)
+                    # ak je to blocked / skip-nonhtml, neskúšame znova stiahnúť a odstránime počet pokusov
+                    if url in retry_counts:
+                        del retry_counts[url]
+
+            # nové linky pridám až po dobehnutí dávky a v poradí dávky, aby fronta ostala FIFO
+            new_urls = [u for url in batch for u in found_by_url.get(url, ()) if u not in visited]
+            finish_batch(queue, seqs, new_urls)
+            # dávka aj jej linky sú vo fronte potvrdené – až teraz zapíšem jej url ako navštívené
+            append_visited(visited_f, batch_visited)
+            batch_visited.clear()
+
+            # retry počty ukladám celé iba raz za QUEUE_SAVE_EVERY url (a na konci behu)
+            if count >= next_save:
+                save_retry_counts(retry_counts)
+                next_save = count + QUEUE_SAVE_EVERY
+
+    visited_f.close()
+    close_crawl_log()
+    close_pages_db()
+
+    # url, ktoré ešte čakali na backoff, nestratím - vrátim ich do fronty pre ďalší beh
+    enqueue(queue, [url for _, url in sorted(delayed)])
+
+    # uložím retry počty - visited aj fronta sú už priebežne zapísané
     save_retry_counts(retry_counts)
+    remaining = queue_size(queue)
+    queue.close()
 
     print("\n--- STAV SŤAHOVANIA PO SPUSTENÍ PROGRAMU ---")
     print(f" Navštívené spolu: {len(visited)}")
-    print(f" Zostáva vo fronte: {len(to_visit_q)}")
+    print(f" Zostáva vo fronte: {remaining}")
     print(f" Spracované v tomto behu: {count}")
 
     return count
 
 
+def crawl_step(limit):
+    # spustím asynchrónny crawl a počkám kým dobehne
+    return asyncio.run(crawl(limit))
+
+
 # ----------------- Spustenie -----------------
 if __name__ == "__main__":
     # limit - koľko url chcem spracovať v jednom toku
@@ -1,16 +1,28 @@
+import os
 import re
+import mmap
 import csv
+import sqlite3
+import zstandard
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from html import unescape
 from pathlib import Path
-from typing import List, Optional, Set, Dict
+from typing import FrozenSet, List, Optional, Set, Dict, Tuple, Union
 from urllib.parse import urlparse
 
 
-INPUT_DIR      = Path("data/html_stranky")        # priečinok so stiahnutými HTML súbormi
+INPUT_DIR      = Path("data/html_stranky")        # priečinok so stiahnutými HTML súbormi (staršie behy crawlera)
+PAGES_DB       = Path("pages.db")                 # SQLite db so stiahnutými HTML (zstd) z crawlera
 OUTPUT_CSV     = Path("data/csv/extracted2.csv")  # výstupné CSV s extrahovanými poliami
 PROCESSED_LIST = Path("processed_files2.txt")     # zoznam už spracovaných HTML súborov (aby sa nespracovali 2×)
-CRAWL_LOG      = Path("crawl_log.csv")            # log z crawlera (filterujeme len status=ok)
+CRAWL_LOG      = Path("crawl_log.csv")            # starší csv log z crawlera (filterujeme len status=ok)
+CRAWL_LOG_DB   = Path("crawl_log.db")             # log z crawlera v SQLite (ak existuje, má prednosť pred csv)
 EXTRACT_LIMIT  = 20000                            # koľko HTML súborov spracovať v jednom behu (horný limit)
+EXTRACT_WORKERS = os.cpu_count() or 1             # počet procesov pre paralelnú extrakciu
+EXTRACT_CHUNKSIZE = 50                            # koľko súborov naraz pošlem jednému procesu
+PROCESSED_SAVE_EVERY = 1000                       # po koľkých súboroch priebežne uložím CSV aj zoznam spracovaných
+CSV_BUFFER     = 1 << 20                          # veľkosť zápisového bufferu výstupného CSV (1 MiB)
 
 FALLBACK_MAX_CHARS = 4000                         # maximálna dĺžka fallback textu pred skracovaním
 FALLBACK_SENTENCES = 6                            # koľko viet ponechať pri skrátení fallbacku
@@ -18,25 +30,29 @@ FALLBACK_SENTENCES = 6                            # koľko viet ponechať pri sk
 # ========================================================
 # funkcie na prácu s csv súborom s extrahovanými dátami a s txt súborom so zoznamom spracovaných stránok
 
+def _csv_writer(f):
+    # csv.writer s dohodnutým formátom výstupného CSV (bodkočiarka, úvodzovky, escape)
+    return csv.writer(f, delimiter=";", quoting=csv.QUOTE_MINIMAL, quotechar='"', escapechar="\\")
+
 def init_csv(csv_path: Path = OUTPUT_CSV) -> None:
     # vytvorím výstupné CSV s hlavičkou, ak ešte neexistuje
     if not csv_path.exists():
         csv_path.parent.mkdir(parents=True, exist_ok=True)
         with csv_path.open("w", newline="", encoding="utf-8-sig") as f:         # otvorí súbor na zápis (UTF-8 BOM pre Excel)
-            w = csv.writer(
-                f, delimiter=";", quoting=csv.QUOTE_MINIMAL, quotechar='"', escapechar="\\"
-            )
+            w = _csv_writer(f)
             w.writerow([    # zapíše hlavičky stĺpcov v dohodnutom poradí
                 "url","drug_name","title","generic_name","brand_names",
                 "dosage_forms","drug_class","availability",
                 "indications","dosage","side_effects","warnings"
             ])
 
-def append_csv_row(row: List[str], csv_path: Path = OUTPUT_CSV) -> None:
-    # pridmá jeden nový riadok do výstupného CSV
-    with csv_path.open("a", newline="", encoding="utf-8-sig") as f:             # otvorí CSV v režime append
-        w = csv.writer(f, delimiter=";", quoting=csv.QUOTE_MINIMAL, quotechar='"', escapechar="\\")
-        w.writerow(row)                        # zapíše dáta v poradí podľa hlavičky
+def open_csv_append(csv_path: Path = OUTPUT_CSV):
+    # otvorí výstupné CSV v režime append raz na celý beh (väčší buffer, riadky sa zapisujú po dávkach)
+    return csv_path.open("a", newline="", encoding="utf-8-sig", buffering=CSV_BUFFER)
+
+def append_csv_row(writer, row: List[str]) -> None:
+    # pridmá jeden nový riadok do výstupného CSV cez už otvorený writer
+    writer.writerow(row)                        # zapíše dáta v poradí podľa hlavičky
 
 def load_processed(path: Path = PROCESSED_LIST) -> Set[str]:
     # načítam mená HTML súborov, ktoré už boli spracované (na deduplikáciu spracovania)
@@ -51,36 +67,64 @@ def save_processed(processed: Set[str], path: Path = PROCESSED_LIST) -> None:
         for name in sorted(processed):             # v abecednom poradí
             f.write(name + "\n")
 
-def load_ok_file_basenames_from_log(log_path: Path = CRAWL_LOG) -> Set[str]:
-    # z crawl_log.csv vyberiem názvy súborov s úspešným statusom 'ok', aby som extrahovala dáta iba z úspešne stiahnutých stránok
-    ok_names: Set[str] = set()
+_LOG_HEADER = b"timestamp,url,filepath,status,"      # očakávané poradie stĺpcov v crawl_log.csv
+# riadok logu so statusom ok: timestamp, url (aj v úvodzovkách), filepath (aj v úvodzovkách) -> skupina 1 alebo 2
+_OK_ROW_RE = re.compile(
+    rb'^[^,\r\n]*,(?:"(?:[^"]|"")*"|[^,\r\n]*),(?:"((?:[^"]|"")+)"|([^,"\r\n]+)),[ \t]*ok[ \t]*,',
+    re.M | re.I,
+)
+
+def load_ok_file_basenames_from_log(log_path: Path = CRAWL_LOG, db_path: Path = CRAWL_LOG_DB) -> FrozenSet[str]:
+    # z crawl logu vyberiem názvy súborov s úspešným statusom 'ok', aby som extrahovala dáta iba z úspešne stiahnutých stránok
+    if db_path.exists():
+        # crawl_log.db - stačí jeden dotaz cez index na status
+        conn = sqlite3.connect(f"file:{db_path.as_posix()}?mode=ro", uri=True)
+        try:
+            return frozenset(Path(filepath.strip()).name for (filepath,) in
+                             conn.execute("SELECT filepath FROM log WHERE status = 'ok' AND filepath != ''"))
+        finally:
+            conn.close()
     if not log_path.exists():
-        print(f"[WARN] Nenašiel som crawl log: {log_path}.")
-        return ok_names                                             # vrátim prázdny set
+        print(f"[WARN] Nenašiel som crawl log: {db_path} ani {log_path}.")
+        return frozenset()                                          # vrátim prázdnu množinu
+    if log_path.stat().st_size == 0:
+        return frozenset()
+    with log_path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(_LOG_HEADER)] == _LOG_HEADER:
+            # známe poradie stĺpcov -> jeden prechod regexom cez celý log (bez csv parsovania po riadkoch)
+            names = set()
+            for m in _OK_ROW_RE.finditer(mm):
+                fp = m.group(2) if m.group(1) is None else m.group(1).replace(b'""', b'"')
+                fp = fp.decode("utf-8").strip()
+                if fp:
+                    names.add(Path(fp).name)                        # pridá len názov súboru (bez cesty)
+            return frozenset(names)
+    # iná hlavička -> čítam CSV podľa hlavičiek
     with log_path.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)                              # čítam CSV podľa hlavičiek
-        for row in reader:
-            if (row.get("status") or "").strip().lower() == "ok" and (row.get("filepath") or "").strip():
-                ok_names.add(Path(row["filepath"]).name)                    # pridá len názov súboru (bez cesty)
-    return ok_names                                                    # vráti množinu úspešne stiahnutých súborov
+        return frozenset(Path(row["filepath"]).name for row in csv.DictReader(f)
+                         if (row.get("status") or "").strip().lower() == "ok" and (row.get("filepath") or "").strip())
 
 # ============================================================
 # filtrovanie URL stránok podľa toho, či ide o lieky
 
+_PRO_PATH_RE  = re.compile(r"^/pro/[a-z0-9-]+\.html$")     # presný tvar /pro/<nazov>.html
+_MTM_PATH_RE  = re.compile(r"^/mtm/[a-z0-9-]+\.html$")     # presný tvar /mtm/<nazov>.html
+_ROOT_PATH_RE = re.compile(r"^/[a-z0-9-]+\.html$")         # root tvar /<nazov>.html
+
 def get_allowed_section(url: str) -> Optional[str]:
     # podľa URL rozhodne, či ide o sekciu 'pro' | 'mtm' | 'root' alebo None (ignorujem)
     if not url:
         return None
     path = urlparse(url).path or ""          # vyberiem path časť URL (napr. /pro/...)
-    if path.startswith("/pro/") and re.match(r"^/pro/[a-z0-9-]+\.html$", path):  # presný tvar /pro/<nazov>.html
+    if path.startswith("/pro/") and _PRO_PATH_RE.match(path):  # presný tvar /pro/<nazov>.html
         return "pro"                                                             # vráti label „pro“
-    if path.startswith("/mtm/") and re.match(r"^/mtm/[a-z0-9-]+\.html$", path):  # presný tvar /mtm/<nazov>.html
+    if path.startswith("/mtm/") and _MTM_PATH_RE.match(path):  # presný tvar /mtm/<nazov>.html
         return "mtm"                                                   # vráti label „mtm“
-    if re.match(r"^/[a-z0-9-]+\.html$", path):                  # root tvar /<nazov>.html
+    if _ROOT_PATH_RE.match(path):                  # root tvar /<nazov>.html
         return "root"             # vráti label „root“
     return None        # inú štruktúru ignoruje
 
-DENY_PATTERNS = [         # vzory URL (len pre „root“), ktoré ignorujeme pretože ide o zoznamy a nie stránky s liekmi ale nevieme ich inak odfiltlrovať
+DENY_PATTERNS = tuple(re.compile(p) for p in [         # vzory URL (len pre „root“), ktoré ignorujeme pretože ide o zoznamy a nie stránky s liekmi ale nevieme ich inak odfiltlrovať
     r"^/alpha/.*",
     r"^/imprints[a-z0-9-]*\.html$",
     r"^/cg[a-z0-9]+\.html$",
@@ -92,7 +136,7 @@ DENY_PATTERNS = [         # vzory URL (len pre „root“), ktoré ignorujeme pr
     r"^/mdx[0-9a-z-]*\.html$",
     r"^/generic-availability-[a-z0-9-]+\.html$",
     r"^/international-[a-z0-9-]+\.html$",
-]
+])
 
 def is_denied_url(url: str) -> bool:
     # vrátim True, ak root URL zjavne patrí medzi indexy/zoznamy (deny list)
@@ -101,18 +145,31 @@ def is_denied_url(url: str) -> bool:
     path = urlparse(url).path or ""              # vyber path
     if path.startswith("/pro/") or path.startswith("/mtm/"):        # na 'pro' a 'mtm' deny neaplikujeme
         return False
-    return any(re.match(p, path) for p in DENY_PATTERNS)        # test proti deny regexom
+    return any(p.match(path) for p in DENY_PATTERNS)        # test proti deny regexom (skompilované pri importe)
 
-def extract_canonical_url(html: str) -> Optional[str]:
-    # z HTML vytiahne kanonickú URL (<link rel="canonical"> alebo <meta property="og:url">)
-    m = re.search(r'<link[^>]+rel=["\']canonical["\'][^>]*href=["\']([^"\']+)["\']', html, flags=re.I)
+# bytes regexy - kanonickú URL hľadám priamo v namapovanom súbore (mmap), bez dekódovania celého HTML
+_CANONICAL_RE = re.compile(rb'<link[^>]+rel=["\']canonical["\'][^>]*href=["\']([^"\']+)["\']', re.I)
+_OG_URL_RE    = re.compile(rb'<meta[^>]+property=["\']og:url["\'][^>]*content=["\']([^"\']+)["\']', re.I)
+
+def extract_canonical_url(raw) -> Optional[str]:
+    # z HTML (bytes / mmap) vytiahne kanonickú URL (<link rel="canonical"> alebo <meta property="og:url">)
+    m = _CANONICAL_RE.search(raw)
     if m:                      # ak našlo canonical link vráti jeho URL
-        return m.group(1).strip()
-    m = re.search(r'<meta[^>]+property=["\']og:url["\'][^>]*content=["\']([^"\']+)["\']', html, flags=re.I)
+        return m.group(1).decode("utf-8", "ignore").strip()
+    m = _OG_URL_RE.search(raw)
     if m:
-        return m.group(1).strip()
+        return m.group(1).decode("utf-8", "ignore").strip()
     return None
 
+
+def _decode_html(raw) -> str:
+    # celé HTML dekódujem až keď ho naozaj extrahujem (rovnako ako read_text: utf-8 + univerzálne konce riadkov)
+    # dekódujem priamo z bufferu (mmap/bytes) bez medzikópie cez bytes(); konce riadkov riešim len ak tam \r je
+    text = str(raw, "utf-8", "ignore")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
 # ==========================================================
 
 _TAG_RE = re.compile(r"<[^>]+>")         # regex na odstránenie HTML tagov
@@ -126,14 +183,17 @@ def html_to_text(fragment: str) -> str:
     txt = _WS_RE.sub(" ", txt).strip()         # viac medzier -> jedna, oreže okraje
     return txt           # vrátim čistý text
 
-def extract_first(html: str, patterns: List[str]) -> str:
-    # vrátim prvý match zo zoznamu regexov
+def _compile(patterns: List[str]) -> Tuple[re.Pattern, ...]:
+    # vzory skompilujem raz pri importe do n-tice (rovnaké flagy, aké používa extract_first)
+    return tuple(re.compile(p, re.IGNORECASE | re.DOTALL) for p in patterns)
+
+def extract_first(html: str, patterns: Tuple[re.Pattern, ...]) -> str:
+    # vrátim prvý match zo zoznamu skompilovaných regexov
     for pat in patterns:
-        m = re.search(pat, html, flags=re.IGNORECASE | re.DOTALL)
+        m = pat.search(html)
         if m:                             # ak našlo match
-            gd = m.groupdict()                     # získam menované skupiny
-            if "body" in gd:                          # ak existuje skupina 'body'
-                return html_to_text(gd["body"])           # vráť očistený text z nej
+            if "body" in pat.groupindex:              # ak má vzor menovanú skupinu 'body' (bez groupdict pri každom matchi)
+                return html_to_text(m.group("body"))      # vráť očistený text z nej
             return html_to_text(m.group(1))               # inak prvú zachytenú skupinu
     return ""                                             # ak nič nenašlo, prázdny reťazec
 
@@ -141,147 +201,222 @@ def extract_first(html: str, patterns: List[str]) -> str:
 # regexy na moje atributy
 
 # Title
-TITLE_PATTERNS = [r"<title>\s*(?P<body>.*?)\s*</title>"]      # univerzálne vybratie obsahu <title>
+_TITLE_RE = re.compile(r"<title>(.*?)</title>", re.I | re.S)      # univerzálne vybratie obsahu <title>
+
+def _find_title(html: str) -> Optional[str]:
+    # <title> nájdem v HTML iba raz, ďalšie regexy (drug name) už bežia len nad jeho krátkym obsahom
+    m = _TITLE_RE.search(html)
+    return m.group(1) if m else None
 
-# Drug name z <title> – viac tvarov
-DRUG_NAME_PATTERNS = [
-    r"<title>\s*(?P<body>[^:]+?)\s*:\s*.*?</title>",                     # „Name: ...“
-    r"<title>\s*(?P<body>.*?)\s*-\s*Drugs\.com\s*</title>",              # „Name - Drugs.com“
-    r"<title>\s*(?P<body>.*?)\s+Uses\b.*?</title>",                      # „Name Uses ...“
-    r"<title>\s*(?P<body>.*?)\s+Information from Drugs\.com\s*</title>", # „Name Information from Drugs.com“
-]
+# Drug name z obsahu <title> – viac tvarov
+DRUG_NAME_PATTERNS = _compile([
+    r"^\s*(?P<body>[^:]+?)\s*:",                                # „Name: ...“
+    r"^\s*(?P<body>.*?)\s*-\s*Drugs\.com\s*$",                 # „Name - Drugs.com“
+    r"^\s*(?P<body>.*?)\s+Uses\b",                              # „Name Uses ...“
+    r"^\s*(?P<body>.*?)\s+Information from Drugs\.com\s*$",    # „Name Information from Drugs.com“
+])
 
 # Generic / Brand
-GENERIC_NAME_PATTERNS = [
+GENERIC_NAME_PATTERNS = _compile([
     r'(?s)<b>\s*Generic name\s*:\s*</b>\s*(?P<body>.*?)<br',       # HTML vzor 'Generic name:'
     r'(?s)"nonProprietaryName"\s*:\s*"(?P<body>[^"]+)"',
-]
-BRAND_NAMES_PATTERNS = [
+])
+BRAND_NAMES_PATTERNS = _compile([
     r'(?s)<b>\s*Brand name(?:s)?\s*:\s*</b>\s*(?P<body>.*?)<br',       # HTML vzor 'Brand name(s):'
     r'(?s)(?:Also|Other)\s+known\s+as:\s*(?P<body>.*?)(?:\.|</p>|</li>|<br)',    # „Also/Other known as:“
     r'(?s)Other\s+brand\s+names\s+of\s+.*?\s+include:\s*(?P<body>.*?)(?:\.|</p>|</li>|<br)',  # ďalší variant
-]
+])
 
 # Dosage forms – JSON/Sidebar/inline
-DOSAGE_FORMS_PATTERNS = [
+DOSAGE_FORMS_PATTERNS = _compile([
     r'(?s)"dosageForm"\s*:\s*"(?P<body>[^"]+)"',
     r'(?s)<dt[^>]*>\s*Dosage forms?\s*</dt>\s*<dd[^>]*>\s*(?P<body>.*?)\s*</dd>',# sidebar
     r'(?s)<p[^>]*class=["\']drug-subtitle["\'][^>]*>.*?(?:<b>\s*Dosage forms?\s*:\s*</b>|Dosage forms?\s*:)\s*(?P<body>.*?)(?:<br\s*/?>|</p>)',
     r'(?s)<li[^>]*>\s*<strong>\s*Dosage forms?\s*:\s*</strong>\s*(?P<body>.*?)</li>',
     r'(?s)Dosage forms?\s*:\s*</?[^>]*>\s*(?P<body>.*?)(?:<|$)',
-]
+])
 
 # Drug class
-DRUG_CLASS_PATTERNS = [
+DRUG_CLASS_PATTERNS = _compile([
     r'(?s)<b>\s*Drug class(?:es)?:\s*</b>\s*(?P<body>.*?)\s*(?:<br|</p>)',    # „Drug class:“ v tele
-]
+])
 
 # Availability – hlavné cesty a sekcia
-AVAILABILITY_MAIN_PATTERNS = [
+AVAILABILITY_MAIN_PATTERNS = _compile([
     r'"prescriptionStatus"\s*:\s*"(?P<body>[^"]+)"',
     r'(?s)<dt[^>]*>\s*Availability\s*</dt>\s*<dd[^>]*>\s*(?P<body>.*?)\s*</dd>', # sidebar
-]
-AVAILABILITY_SECTION_PATTERN = (                             # blok „Drug Status“
-    r'(?s)<h2[^>]*>\s*(?:Drug Status|DRUG STATUS)\s*</h2>(?P<body>.*?)(?:<h2|</aside>|</section>|</main>|</body>)'
-)
-AVAILABILITY_INLINE_PATTERNS = [
+])
+AVAILABILITY_SECTION_PATTERNS = _compile([                             # blok „Drug Status“
+    r'(?s)<h2[^>]*>\s*(?:Drug Status|DRUG STATUS)\s*</h2>(?P<body>.*?)(?:<h2|</aside>|</section>|</main>|</body>)',
+])
+AVAILABILITY_INLINE_PATTERNS = _compile([
     r'(?s)Availability\s*:\s*</?[^>]*>\s*(?P<body>.*?)(?:<|$)',       # inline „Availability: …“
     r'(?s)<[^>]*>\s*Availability\s*</[^>]*>\s*[:\-]?\s*(?P<body>[^<]+)',    # alternatívny inline zápis
-]
+])
 
 # Root/MTM sekcie (spotrebiteľské)
-INDICATIONS_PATTERNS_ROOT = [
+INDICATIONS_PATTERNS_ROOT = _compile([
     r'(?s)<h2[^>]*>\s*(?:What is .*?|Uses)\s*</h2>(?P<body>.*?)(?:<h2[^>]*>|</main>|</body>)',
-]
-DOSAGE_PATTERNS_ROOT = [
+])
+DOSAGE_PATTERNS_ROOT = _compile([
     r'(?s)<h2[^>]*>\s*(?:Dosage|Dosing Information|Recommended dosage)\s*</h2>(?P<body>.*?)(?:<h2[^>]*>|</main>|</body>)'
-]
-WARNINGS_PATTERNS_ROOT = [
+])
+WARNINGS_PATTERNS_ROOT = _compile([
     r'(?s)<h2[^>]*>\s*(?:Warnings|Before taking .*?)\s*</h2>(?P<body>.*?)(?:<h2[^>]*>|</main>|</body>)'
-]
-SIDE_EFFECTS_PATTERNS_COMMON = [
+])
+SIDE_EFFECTS_PATTERNS_COMMON = _compile([
     r'(?s)<h2[^>]*id=["\']side-effects["\'][^>]*>.*?</h2>(?P<body>.*?)(?:<h2|</main>|</body>)',
     r'(?s)<h2[^>]*id=["\']adverse-reactions["\'][^>]*>.*?</h2>(?P<body>.*?)(?:<h2|</main>|</body>)',
     r'(?s)<h2[^>]*>\s*(?:Side effects|Side Effects|Side effects of .*?)\s*</h2>(?P<body>.*?)(?:<h2|</main>|</body>)',
-]
+])
+
+# kľúčové slová, bez ktorých daný zoznam vzorov nemôže nič nájsť (hľadám ich v casefold-nutom HTML)
+# - ak v dokumente žiadne nie je, celý zoznam vzorov nad HTML vôbec nespúšťam
+GENERIC_NAME_KEYS = ("generic name", "nonproprietaryname")
+BRAND_NAMES_KEYS  = ("brand", "known")
+DOSAGE_FORMS_KEYS = ("dosage form", "dosageform")
+DRUG_CLASS_KEYS   = ("drug class",)
+AVAILABILITY_KEYS = ("prescriptionstatus", "availability", "drug status")
+
+def _has_any(low: str, keys: Tuple[str, ...]) -> bool:
+    # rýchly test podreťazcov (v C) - je aspoň jedno kľúčové slovo v dokumente?
+    return any(k in low for k in keys)
 
 # PRO: Highlights a plné sekcie
+_SCRIPT_STYLE_RE = re.compile(r"(?is)<(script|style)[^>]*>.*?</\1>")   # skripty a štýly
+_ANY_TAG_RE      = re.compile(r"(?is)<[^>]+>")                         # ľubovoľný tag
+
 def _strip_html(s: str) -> str:
     # odtagujem  script/style a všetky tagy a znormalizuje medzery
     s = s or ""
-    s = re.sub(r"(?is)<(script|style)[^>]*>.*?</\1>", "", s)   # zahodí skripty a štýly
-    s = re.sub(r"(?is)<[^>]+>", " ", s)         # všetky tagy nahradí medzerou
-    return re.sub(r"\s+", " ", s).strip()       # whitespace normalizácia
-
-def _pro_highlights_block(html: str) -> Optional[str]:
-    # vyberiem celé telo „Highlights of Prescribing Information“ (H2 → ďalší H2)
-    m = re.search(
-        r'(?is)<h2[^>]*>\s*Highlights of Prescribing Information\s*</h2>(?P<body>.*?)(?=<h2[^>]*>)',
-        html
-    )
-    return m.group("body") if m else None        # vráti raw HTML blok alebo None
-
-def _hl_sec(body: str, title_core_regex: str) -> str:
-    # z 'Highlights' vymedzí konkrétnu podsekciu (podľa H3/H4 titulku) a odtaguje ju
-    m = re.search(
-        rf'(?is)<h[34][^>]*>\s*(?:[^<]*?)?(?:{title_core_regex})(?:[^<]*?)?\s*</h[34]>\s*(?P<b>.*?)(?=<h[34][^>]*>|\Z)',
-        body
-    )
-    return _strip_html(m.group("b") if m else "")       # vráti plain text podsekcie
-
-def extract_pro_from_highlights(html: str) -> dict:
+    s = _SCRIPT_STYLE_RE.sub("", s)   # zahodí skripty a štýly
+    s = _ANY_TAG_RE.sub(" ", s)         # všetky tagy nahradí medzerou
+    return _WS_RE.sub(" ", s).strip()       # whitespace normalizácia
+
+# Index nadpisov: jeden lineárny prechod cez HTML namiesto samostatného regexu pre každú sekciu
+_HEADING_MARK_RE = re.compile(r"<(h[234])[^>]*>|</(?:section|main|body)>", re.IGNORECASE)   # začiatok nadpisu / koniec sekcie
+_HEADING_TEXT_RE = re.compile(r"([^<]*)</(h[234])>", re.IGNORECASE)                        # text nadpisu bez vnorených tagov
+
+def _index_headings(html: str) -> List[tuple]:
+    # vrátim zoznam značiek (level, title, close_level, start, body_start) v poradí ako sú v HTML
+    #   level       - 'h2'/'h3'/'h4' pre nadpis, None pre </section>, </main>, </body>
+    #   title       - text nadpisu (orezaný), None ak nadpis obsahuje vnorené tagy
+    #   close_level - ktorým tagom sa nadpis uzatvára ('h2'/'h3'/'h4')
+    #   start       - pozícia otváracieho tagu, body_start - pozícia hneď za nadpisom
+    marks = []
+    for m in _HEADING_MARK_RE.finditer(html):
+        level = m.group(1)
+        if level is None:                                  # koniec sekcie/main/body
+            marks.append((None, None, None, m.start(), m.start()))
+            continue
+        t = _HEADING_TEXT_RE.match(html, m.end())
+        if t:
+            marks.append((level.lower(), t.group(1).strip(), t.group(2).lower(), m.start(), t.end()))
+        else:
+            marks.append((level.lower(), None, None, m.start(), m.end()))
+    return marks
+
+def _section_end(marks: List[tuple], i: int, levels: tuple, stop_at_closers: bool, default: int) -> int:
+    # nájdem koniec sekcie i - najbližší ďalší nadpis z 'levels' (prípadne koniec section/main/body)
+    for level, _, _, start, _ in marks[i + 1:]:
+        if level in levels or (stop_at_closers and level is None):
+            return start
+    return default
+
+def _find_heading(marks: List[tuple], levels: tuple, title_re: re.Pattern, lo: int = 0, hi: Optional[int] = None) -> Optional[int]:
+    # vrátim index prvého nadpisu z 'levels' uzavretého rovnakým levelom, ktorého titulok zodpovedá title_re
+    for i, (level, title, close_level, start, _) in enumerate(marks):
+        if start < lo or level not in levels or close_level not in levels or title is None:
+            continue
+        if hi is not None and start >= hi:
+            break
+        if title_re.search(title):
+            return i
+    return None
+
+_HIGHLIGHTS_TITLE = "highlights of prescribing information"
+
+def extract_pro_from_highlights(html: str, marks: Optional[List[tuple]] = None) -> dict:
     # kúsi vytiahnuť Indications/Dosage/Warnings/Side effects z Highlights; inak vráti prázdne hodnoty
-    body = _pro_highlights_block(html)      # najskôr lokalizuje celý blok
-    if body is None:          # ak Highlights blok nie je, vráti prázdny dict
+    if marks is None:
+        marks = _index_headings(html)
+    # najskôr lokalizujem celý blok „Highlights of Prescribing Information“ (H2 → ďalší H2)
+    hl = None
+    for i, (level, title, close_level, _, _) in enumerate(marks):
+        if level == "h2" and close_level == "h2" and title is not None and title.lower() == _HIGHLIGHTS_TITLE:
+            hl = i
+            break
+    if hl is None:          # ak Highlights blok nie je, vráti prázdny dict
+        return {}
+    body_start = marks[hl][4]
+    body_end = _section_end(marks, hl, ("h2",), False, -1)
+    if body_end < 0:        # blok musí byť ukončený ďalším H2
         return {}
+
+    def hl_sec(title_re: re.Pattern) -> str:
+        # z 'Highlights' vymedzí konkrétnu podsekciu (podľa H3/H4 titulku) a odtaguje ju
+        i = _find_heading(marks, ("h3", "h4"), title_re, body_start, body_end)
+        if i is None:
+            return ""
+        end = min(_section_end(marks, i, ("h3", "h4"), False, body_end), body_end)
+        return _strip_html(html[marks[i][4]:end])       # vráti plain text podsekcie
+
     return {             # inak extrahuje podsekcie podľa názvov
-        "indications":  _hl_sec(body, r"Indications(?:\s*&\s*|\s+and\s+)Usage"),
-        "dosage":       _hl_sec(body, r"Dosage(?:\s*&\s*|\s+and\s+)Administration"),
-        "warnings":     _hl_sec(body, r"(?:Boxed\s+Warning|WARNING:|Contraindications|Warnings(?:\s*&\s*|\s+and\s+)Precautions|Warnings\b)"),
-        "side_effects": _hl_sec(body, r"(?:Adverse\s+Reactions(?:/Side Effects)?|Adverse\s+Events|Side\s+Effects\b)"),
+        "indications":  hl_sec(HL_INDICATIONS_TITLE),
+        "dosage":       hl_sec(HL_DOSAGE_TITLE),
+        "warnings":     hl_sec(HL_WARNINGS_TITLE),
+        "side_effects": hl_sec(HL_SIDE_EFFECTS_TITLE),
     }
 
-def _pro_block_samelevel(tag: str, title_core_regex: str) -> str:
-    # regex na vybratie sekcie z plného PI podľa nadpisu <h2>/<h3> po najbližší rovnaký heading
-    end_tag = tag               # sekcia končí ďalším rovnakým headingom
-    return (
-        rf'(?is)<{tag}[^>]*>\s*(?:\d+\.\s*)?(?:[^<]*?)?{title_core_regex}(?:[^<]*?)?\s*</{tag}>\s*'
-        rf'(?P<body>.*?)'
-        rf'(?=<{end_tag}[^>]*>|</section>|</main>|</body>|$)'
-    )
-
-# PI vzory pre PRO stránky (plné sekcie)
-INDICATIONS_PATTERNS_PRO = [
-    _pro_block_samelevel("h2", r"Indications(?:\s*&\s*|\s+and\s+)Usage"),
-    _pro_block_samelevel("h3", r"Indications(?:\s*&\s*|\s+and\s+)Usage"),
-]
-DOSAGE_PATTERNS_PRO = [
-    _pro_block_samelevel("h2", r"Dosage(?:\s*&\s*|\s+and\s+)Administration"),
-    _pro_block_samelevel("h3", r"Dosage(?:\s*&\s*|\s+and\s+)Administration"),
-]
-WARNINGS_TOGETHER_PATTERNS_PRO = [
-    _pro_block_samelevel("h2", r"Warnings(?:\s*&\s*|\s+and\s+)Precautions"),
-    _pro_block_samelevel("h3", r"Warnings(?:\s*&\s*|\s+and\s+)Precautions"),
-]
-WARNINGS_SPLIT_PATTERNS_PRO = [
-    _pro_block_samelevel("h2", r"Warnings"),
-    _pro_block_samelevel("h3", r"Warnings"),
-    _pro_block_samelevel("h2", r"Precautions"),
-    _pro_block_samelevel("h3", r"Precautions"),
-]
-SIDE_EFFECTS_PATTERNS_PRO = [
-    _pro_block_samelevel("h2", r"Adverse\s+Reactions(?:/Side Effects)?"),
-    _pro_block_samelevel("h3", r"Adverse\s+Reactions(?:/Side Effects)?"),
-    _pro_block_samelevel("h2", r"Adverse\s+Events"),
-    _pro_block_samelevel("h3", r"Adverse\s+Events"),
-]
+def extract_section_pro(html: str, marks: List[tuple], specs: Tuple[tuple, ...]) -> str:
+    # vyberiem sekciu z plného PI podľa nadpisu <h2>/<h3> po najbližší rovnaký heading (alebo koniec section/main/body)
+    for level, title_re in specs:                   # poradie (level, titulok) určuje prioritu ako pri extract_first
+        i = _find_heading(marks, (level,), title_re)
+        if i is not None:
+            end = _section_end(marks, i, (level,), True, len(html))
+            return html_to_text(html[marks[i][4]:end])
+    return ""
+
+def _title_re(title_core_regex: str) -> re.Pattern:
+    # regex na text nadpisu (hľadá sa kdekoľvek v titulku)
+    return re.compile(title_core_regex, re.IGNORECASE)
+
+# titulky podsekcií v Highlights (H3/H4)
+HL_INDICATIONS_TITLE  = _title_re(r"Indications(?:\s*&\s*|\s+and\s+)Usage")
+HL_DOSAGE_TITLE       = _title_re(r"Dosage(?:\s*&\s*|\s+and\s+)Administration")
+HL_WARNINGS_TITLE     = _title_re(r"(?:Boxed\s+Warning|WARNING:|Contraindications|Warnings(?:\s*&\s*|\s+and\s+)Precautions|Warnings\b)")
+HL_SIDE_EFFECTS_TITLE = _title_re(r"(?:Adverse\s+Reactions(?:/Side Effects)?|Adverse\s+Events|Side\s+Effects\b)")
+
+# PI sekcie pre PRO stránky (plné sekcie) - (level nadpisu, titulok) v poradí priority
+_INDICATIONS_TITLE_PRO = _title_re(r"Indications(?:\s*&\s*|\s+and\s+)Usage")
+_DOSAGE_TITLE_PRO      = _title_re(r"Dosage(?:\s*&\s*|\s+and\s+)Administration")
+_WARN_PREC_TITLE_PRO   = _title_re(r"Warnings(?:\s*&\s*|\s+and\s+)Precautions")
+_WARNINGS_TITLE_PRO    = _title_re(r"Warnings")
+_PRECAUTIONS_TITLE_PRO = _title_re(r"Precautions")
+_ADVERSE_REACT_TITLE   = _title_re(r"Adverse\s+Reactions(?:/Side Effects)?")
+_ADVERSE_EVENTS_TITLE  = _title_re(r"Adverse\s+Events")
+
+INDICATIONS_SECTIONS_PRO = (("h2", _INDICATIONS_TITLE_PRO), ("h3", _INDICATIONS_TITLE_PRO))
+DOSAGE_SECTIONS_PRO = (("h2", _DOSAGE_TITLE_PRO), ("h3", _DOSAGE_TITLE_PRO))
+WARNINGS_TOGETHER_SECTIONS_PRO = (("h2", _WARN_PREC_TITLE_PRO), ("h3", _WARN_PREC_TITLE_PRO))
+# samostatné „Warnings“ a „Precautions“ (vopred rozdelené, aby sa pri každom súbore nerobil slice)
+WARNINGS_SPLIT_W_PRO = (("h2", _WARNINGS_TITLE_PRO), ("h3", _WARNINGS_TITLE_PRO))
+WARNINGS_SPLIT_P_PRO = (("h2", _PRECAUTIONS_TITLE_PRO), ("h3", _PRECAUTIONS_TITLE_PRO))
+SIDE_EFFECTS_SECTIONS_PRO = (
+    ("h2", _ADVERSE_REACT_TITLE),
+    ("h3", _ADVERSE_REACT_TITLE),
+    ("h2", _ADVERSE_EVENTS_TITLE),
+    ("h3", _ADVERSE_EVENTS_TITLE),
+)
 
 # ============================================================
 # funkcie na skracovanie príliš dlhých sekcií
 
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[\.\!\?])\s+')      # hranica vety (. ! ? + medzera)
+
 def _first_sentences(text: str, n: int = FALLBACK_SENTENCES) -> str:
     # ráti prvých N viet z textu (delenie na . ! ? + medzera)
-    parts = re.split(r'(?<=[\.\!\?])\s+', (text or "").strip())      # rozdelí text na vety
+    parts = _SENTENCE_SPLIT_RE.split((text or "").strip())      # rozdelí text na vety
     return " ".join(parts[:max(1, n)]).strip()          # spojí prvých N viet
 
 def _cap_fallback(text: str) -> str:
@@ -300,7 +435,7 @@ def extract_availability(html: str) -> str:
     val = extract_first(html, AVAILABILITY_MAIN_PATTERNS)          # JSON alebo sidebar hodnota
     if val:                                    # ak niečo našiel
         return val
-    block = extract_first(html, [AVAILABILITY_SECTION_PATTERN])         # inak skús celý sekčný blok
+    block = extract_first(html, AVAILABILITY_SECTION_PATTERNS)         # inak skús celý sekčný blok
     if block:                                               # ak existuje blok, skús inline hodnotu vnútri bloku
         inner = extract_first(block, AVAILABILITY_INLINE_PATTERNS)
         return inner or block                   # preferuj inline, inak vráť celý blok textu
@@ -327,38 +462,41 @@ def extract_brand_names(html: str) -> str:
 
 def extract_one_html(html: str, section: str) -> Dict[str, str]:
     # extrahujem všetky požadované polia z jedného HTML podľa rozpoznanej sekcie ('root'|'mtm'|'pro')
-    title_full   = extract_first(html, TITLE_PATTERNS)        # <title>...</title>
-    drug_name    = extract_first(html, DRUG_NAME_PATTERNS)    # názov lieku z titulku
-    generic_name = extract_generic_name(html)
-    brand_names  = extract_brand_names(html)
-    dosage_forms = extract_dosage_forms(html)
-    drug_class   = extract_first(html, DRUG_CLASS_PATTERNS)
-    availability = extract_availability(html)
+    title_raw    = _find_title(html)                          # obsah <title>...</title> (hľadám iba raz)
+    title_full   = html_to_text(title_raw) if title_raw is not None else ""
+    drug_name    = extract_first(title_raw, DRUG_NAME_PATTERNS) if title_raw else ""   # názov lieku z titulku
+    low = html.casefold()       # raz pre celý dokument - podľa neho preskočím vzory, ktoré nemôžu nič nájsť
+    generic_name = extract_generic_name(html) if _has_any(low, GENERIC_NAME_KEYS) else ""
+    brand_names  = extract_brand_names(html) if _has_any(low, BRAND_NAMES_KEYS) else ""
+    dosage_forms = extract_dosage_forms(html) if _has_any(low, DOSAGE_FORMS_KEYS) else ""
+    drug_class   = extract_first(html, DRUG_CLASS_PATTERNS) if _has_any(low, DRUG_CLASS_KEYS) else ""
+    availability = extract_availability(html) if _has_any(low, AVAILABILITY_KEYS) else ""
 
     if section == "pro":                         # pre PRO stránky: najprv Highlights
-        hl = extract_pro_from_highlights(html)         # vytiahni skrátené sekcie z Highlights
+        marks = _index_headings(html)                  # nadpisy zaindexujem raz pre Highlights aj plné PI
+        hl = extract_pro_from_highlights(html, marks)         # vytiahni skrátené sekcie z Highlights
         indications = hl.get("indications", "")
         dosage      = hl.get("dosage", "")
         warnings    = hl.get("warnings", "")
         side_effects= hl.get("side_effects", "")
 
         if not indications:                # ak v Highlights chýbajú, skús plné PI
-            indications = extract_first(html, INDICATIONS_PATTERNS_PRO)
-            indications = _cap_fallback(indications)           # prípadne skráť ak je príliš dlhá text
+            indications = extract_section_pro(html, marks, INDICATIONS_SECTIONS_PRO)
+            indications = _cap_fallback(indications) if len(indications) > FALLBACK_MAX_CHARS else indications    # skráť len ak je príliš dlhý text
         if not dosage:
-            dosage = extract_first(html, DOSAGE_PATTERNS_PRO)
-            dosage = _cap_fallback(dosage)
+            dosage = extract_section_pro(html, marks, DOSAGE_SECTIONS_PRO)
+            dosage = _cap_fallback(dosage) if len(dosage) > FALLBACK_MAX_CHARS else dosage
         if not warnings:
-            warnings = extract_first(html, WARNINGS_TOGETHER_PATTERNS_PRO)         # spolu „Warnings & Precautions“
+            warnings = extract_section_pro(html, marks, WARNINGS_TOGETHER_SECTIONS_PRO)         # spolu „Warnings & Precautions“
             if not warnings:                                                       # ak nie je spolu, skús oddelene
-                w_part = extract_first(html, WARNINGS_SPLIT_PATTERNS_PRO[:2])      # časť „Warnings“
-                p_part = extract_first(html, WARNINGS_SPLIT_PATTERNS_PRO[2:])      # časť „Precautions“
+                w_part = extract_section_pro(html, marks, WARNINGS_SPLIT_W_PRO)      # časť „Warnings“
+                p_part = extract_section_pro(html, marks, WARNINGS_SPLIT_P_PRO)      # časť „Precautions“
                 warnings = " ".join(x for x in (w_part, p_part) if x)              # spojiť, ak existujú
-            warnings = _cap_fallback(warnings)
+            warnings = _cap_fallback(warnings) if len(warnings) > FALLBACK_MAX_CHARS else warnings
         if not side_effects:
-            side_effects = extract_first(html, SIDE_EFFECTS_PATTERNS_PRO) or \
+            side_effects = extract_section_pro(html, marks, SIDE_EFFECTS_SECTIONS_PRO) or \
                            extract_first(html, SIDE_EFFECTS_PATTERNS_COMMON)    # fallback na „common“ vzory
-            side_effects = _cap_fallback(side_effects)
+            side_effects = _cap_fallback(side_effects) if len(side_effects) > FALLBACK_MAX_CHARS else side_effects
     else:                            # root/mtm: spotrebiteľské nadpisy
         indications  = extract_first(html, INDICATIONS_PATTERNS_ROOT)
         dosage       = extract_first(html, DOSAGE_PATTERNS_ROOT)
@@ -381,23 +519,119 @@ def extract_one_html(html: str, section: str) -> Dict[str, str]:
 
 # ============================== Main =========================================
 
+def _extract_raw(name: str, raw) -> Tuple[str, str, Optional[str], Optional[List[str]], Optional[str]]:
+    # spracujem HTML v bytes (mmap súboru alebo rozbalená stránka z pages.db)
+    # vrátim (meno súboru, url, sekcia, riadok do CSV alebo None, chyba pri čítaní alebo None)
+    url = extract_canonical_url(raw) or ""         # z HTML vyťahni kanonickú URL
+    section = get_allowed_section(url)              # rozhodni, či je to 'root'/'mtm'/'pro'
+    if not section or is_denied_url(url):       # ak sekcia nevyhovuje alebo je deny
+        return name, url, section, None, None
+    html = _decode_html(raw)      # URL a sekciu zistím z bytes, dekódujem len to, čo naozaj extrahujem
+
+    data = extract_one_html(html, section)   # extrahuj všetky polia z HTML
+    row = [
+        url, data["drug_name"], data["title"], data["generic_name"], data["brand_names"],
+        data["dosage_forms"], data["drug_class"], data["availability"],
+        data["indications"], data["dosage"], data["side_effects"], data["warnings"],
+    ]
+    return name, url, section, row, None
+
+
+def extract_one(path: Path) -> Tuple[str, str, Optional[str], Optional[List[str]], Optional[str]]:
+    # spracujem jeden HTML súbor z disku (beží v samostatnom procese, preto je to top-level funkcia)
+    try:
+        f = open(path, "rb")
+    except OSError as e:
+        return path.name, "", None, None, str(e)
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:       # prázdny súbor sa nedá namapovať - nemá ani URL
+            return path.name, "", None, None, None
+        # súbor si iba namapujem, nečítam ho celý do pamäti
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            return path.name, "", None, None, str(e)
+        with mm:
+            return _extract_raw(path.name, mm)
+
+
+# spojenie na pages.db si každý proces otvorí raz (iba na čítanie)
+_pages_conn = None
+_zstd = zstandard.ZstdDecompressor()
+
+def extract_stored(name: str) -> Tuple[str, str, Optional[str], Optional[List[str]], Optional[str]]:
+    # spracujem jednu stránku uloženú crawlerom v pages.db
+    global _pages_conn
+    try:
+        if _pages_conn is None:
+            _pages_conn = sqlite3.connect(f"file:{PAGES_DB.as_posix()}?mode=ro", uri=True)
+        row = _pages_conn.execute("SELECT html FROM pages WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return name, "", None, None, "stránka chýba v pages.db"
+        raw = _zstd.decompress(row[0])
+    except (sqlite3.Error, zstandard.ZstdError) as e:
+        return name, "", None, None, str(e)
+    return _extract_raw(name, raw)
+
+
+def load_stored_names(db_path: Path = PAGES_DB) -> Set[str]:
+    # mená všetkých stránok v pages.db - jeden SELECT namiesto prechádzania tisícov súborov
+    if not db_path.exists():
+        return set()
+    conn = sqlite3.connect(f"file:{db_path.as_posix()}?mode=ro", uri=True)
+    try:
+        return {name for (name,) in conn.execute("SELECT name FROM pages")}
+    finally:
+        conn.close()
+
+
+def _prefetch(paths: List[Path]) -> None:
+    # jadru naraz ohlásim celú dávku súborov (POSIX_FADV_WILLNEED), aby ich načítalo do page cache
+    # paralelne, kým spracúvam prvé z nich; na Windows posix_fadvise nie je, vtedy nerobím nič
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for p in paths:
+        try:
+            fd = os.open(p, os.O_RDONLY)
+        except OSError:
+            continue            # chybu čítania aj tak nahlási extract_one
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def extract_batch(items: List[Union[Path, str]]) -> List[Tuple[str, str, Optional[str], Optional[List[str]], Optional[str]]]:
+    # jeden proces dostane celú dávku: Path = súbor na disku (najprv ich prednačítam), str = meno stránky v pages.db
+    _prefetch([p for p in items if isinstance(p, Path)])
+    return [extract_one(p) if isinstance(p, Path) else extract_stored(p) for p in items]
+
 def main():
     # načítam HTML, prefiltrované URL, extrahuje polia a uloží do CSV
     init_csv()              # pripraví CSV (ak chýba, vytvorí s hlavičkou)
     processed = load_processed()         # načíta set už spracovaných HTML mien
 
-    if not INPUT_DIR.exists():          # kontrola, že priečinok s HTML existuje
-        print(f"[ERROR] Neexistuje vstupný priečinok: {INPUT_DIR}")
+    stored = load_stored_names()         # stránky z pages.db (nové behy crawlera)
+    if not stored and not INPUT_DIR.exists():          # kontrola, že mám odkiaľ čítať HTML
+        print(f"[ERROR] Neexistuje vstupný priečinok {INPUT_DIR} ani {PAGES_DB}")
         return
 
-    all_html_files = sorted([p for p in INPUT_DIR.iterdir() if p.suffix.lower() == ".html"])  # zoznam všetkých .html
+    # staršie html súbory z disku beriem iba ak tú istú stránku nemám aj v pages.db
+    all_html_files = []
+    if INPUT_DIR.exists():
+        all_html_files = [p for p in INPUT_DIR.iterdir() if p.suffix.lower() == ".html" and p.name not in stored]
+    all_items = sorted(list(stored) + all_html_files, key=lambda p: p if isinstance(p, str) else p.name)
 
     ok_names = load_ok_file_basenames_from_log(CRAWL_LOG)       # z logu zober len súbory so status=ok
     if not ok_names:
-        print(f"[WARN] V logu {CRAWL_LOG} som nenašiel žiadne status=ok; nemám čo spracovať.")
+        print("[WARN] V crawl logu som nenašiel žiadne status=ok; nemám čo spracovať.")
         candidates = []                # prázdny zoznam kandidátov
     else:
-        candidates = [p for p in all_html_files if p.name not in processed and p.name in ok_names]
+        candidates = [p for p in all_items
+                      if (p if isinstance(p, str) else p.name) not in processed
+                      and (p if isinstance(p, str) else p.name) in ok_names]
 
     if not candidates:          # ak nie sú kandidáti
         print("[INFO] Nie sú žiadne nové HTML (status=ok) na extrakciu.")
@@ -407,36 +641,43 @@ def main():
     print(f"[RUN] Na extrakciu teraz: {len(to_process)} z {len(candidates)} nových (status=ok).")
 
     done_now = 0    # počítadlo práve spracovaných
-    for path in to_process:                                 # iterácia cez kandidátov
-        try:
-            html = path.read_text(encoding="utf-8", errors="ignore")        # načítaj HTML ako text
-        except Exception as e:
-            print(f"[READ-ERROR] {path.name}: {e}")
-            processed.add(path.name)         # označ ako spracované (aby sa nezacyklilo)
-            continue    # pokračuj ďalším súborom
-
-        url = extract_canonical_url(html) or ""         # z HTML vyťahni kanonickú URL
-        section = get_allowed_section(url)              # rozhodni, či je to 'root'/'mtm'/'pro'
-        if not section or is_denied_url(url):       # ak sekcia nevyhovuje alebo je deny
-            print(f"[SKIP] {path.name}  url={url or '(unknown)'}  section={section}  (denied/unsupported)")
-            processed.add(path.name)       # označ ako spracované a preskoč
-            done_now += 1
-            continue
-
-        print(f"[EXTRACT] file={path.name}  url={url or '(unknown)'}  section={section}")
-
-        data = extract_one_html(html, section)   # extrahuj všetky polia z HTML
-
-        append_csv_row([           # zapíš výsledný riadok do CSV
-            url, data["drug_name"], data["title"], data["generic_name"], data["brand_names"],
-            data["dosage_forms"], data["drug_class"], data["availability"],
-            data["indications"], data["dosage"], data["side_effects"], data["warnings"],
-        ])
-
-        processed.add(path.name)       # označ tento súbor za spracovaný
-        done_now += 1
-
-    save_processed(processed)     # ulož stav spracovaných súborov
+    next_save = PROCESSED_SAVE_EVERY
+    try:
+        # súbory extrahujem paralelne v procesoch, do CSV zapisuje iba hlavný proces (v pôvodnom poradí)
+        # procesov nespúšťam viac, ako je dávok; pri jedinej dávke (malý prírastok) pool vôbec netreba
+        batches = [to_process[i:i + EXTRACT_CHUNKSIZE] for i in range(0, len(to_process), EXTRACT_CHUNKSIZE)]
+        workers = min(EXTRACT_WORKERS, len(batches))
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext()
+        with open_csv_append() as out_f, pool as ex:
+            writer = _csv_writer(out_f)
+            results = ex.map(extract_batch, batches) if ex is not None else map(extract_batch, batches)
+            for batch in results:
+                for name, url, section, row, err in batch:
+                    if err is not None:
+                        print(f"[READ-ERROR] {name}: {err}")
+                        processed.add(name)         # označ ako spracované (aby sa nezacyklilo)
+                        continue    # pokračuj ďalším súborom
+
+                    if row is None:       # sekcia nevyhovuje alebo je deny
+                        print(f"[SKIP] {name}  url={url or '(unknown)'}  section={section}  (denied/unsupported)")
+                        processed.add(name)       # označ ako spracované a preskoč
+                        done_now += 1
+                        continue
+
+                    print(f"[EXTRACT] file={name}  url={url or '(unknown)'}  section={section}")
+                    append_csv_row(writer, row)           # zapíš výsledný riadok do CSV
+
+                    processed.add(name)       # označ tento súbor za spracovaný
+                    done_now += 1
+
+                # priebežný checkpoint: najprv CSV na disk, až potom zoznam spracovaných (aby sa riadky nestratili)
+                if len(processed) >= next_save:
+                    out_f.flush()
+                    save_processed(processed)
+                    next_save = len(processed) + PROCESSED_SAVE_EVERY
+    finally:
+        # stav uložím aj pri prerušení (Ctrl+C) - CSV je už zatvorené a flushnuté pri výstupe z with
+        save_processed(processed)     # ulož stav spracovaných súborov
 
     print(f"[DONE] Spracovaných teraz: {done_now}  (limit={EXTRACT_LIMIT})")
     print(f"[STATE] Spolu spracovaných súborov: {len(processed)}")
@@ -1,12 +1,21 @@
 import argparse
 import csv
 import hashlib
-import json
+import io
 import math
 import re
-from collections import defaultdict
+import numpy as np
+import orjson
+import xxhash
+
+try:
+    from isal import igzip as gzip     # SIMD zrýchlený gzip (ak je nainštalovaný isal)
+except ImportError:
+    import gzip
+from array import array
+from collections import Counter
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Tuple
 
 # -------------------------------------------
 # základné vstupné a výstupné súbory/cesty
@@ -14,9 +23,25 @@ CSV_EXTRACT = Path("data/csv/extracted.csv")   # vstupné CSV s extrahovanými 
 OUT_DIR     = Path("data/index")                # výstupný priečinok s indexom
 
 # Výstupné súbory
-INVERTED_INDEX_PATH = OUT_DIR / "inverted_index.jsonl"  # INVERTOVANÝ INDEX (term -> {doc_id: tf})
-IDF_PATH            = OUT_DIR / "idf.jsonl"             # DF/IDF pre termy (TF-IDF aj BM25)
-META_PATH           = OUT_DIR / "meta.json"             # meta a štatistiky (N, avgdl, doclen, mapy doc->meta)
+INVERTED_INDEX_PATH = OUT_DIR / "inverted_index.jsonl.gz"  # INVERTOVANÝ INDEX (term -> {doc_id: tf}), gzip
+IDF_PATH            = OUT_DIR / "idf.jsonl.gz"             # DF/IDF pre termy (TF-IDF aj BM25), gzip
+META_PATH           = OUT_DIR / "meta.json"             # štatistiky a nastavenia (N, avgdl, ...) – malý súbor
+DOCMETA_PATH        = OUT_DIR / "docmeta.jsonl"         # {url, drug_name} pre každý dokument, riadok = poradie v docids.bin
+WRITE_BUFFER        = 1 << 20                           # buffer pri zápise jsonl súborov (1 MiB)
+GZIP_LEVEL          = 1                                 # rýchla kompresia – JSON sa aj tak zmenší niekoľkonásobne
+
+# Binárna verzia indexu pre searcher (mmap, bez JSON parsovania), všetko little-endian
+TERMS_BIN_PATH      = OUT_DIR / "terms.bin"      # u32 n, u32 verzia, f64 idf_logN[n], f64 idf_bm25[n], f64 ub_tfidf[n],
+                                                 # f64 ub_bm25[n], u32 df[n], termy oddelené \n
+TERMS_BIN_VERSION   = 1
+POSTINGS_BIN_PATH   = OUT_DIR / "postings.bin"   # pre každý term (v poradí terms.bin): u32 doc[df] (vzostupne), u32 tf[df]
+DOCIDS_BIN_PATH     = OUT_DIR / "docids.bin"     # doc_id reťazce oddelené \n, index v postings = poradie tu
+DOCLEN_BIN_PATH     = OUT_DIR / "doclen.bin"     # u32 šírka (2 alebo 4 bajty), dĺžky dokumentov v poradí docids.bin
+TOKEN_CACHE_SIZE    = 4096                              # koľko posledných tokenizácií si pamätám (podľa hashu textu)
+
+# BM25 parametre, pre ktoré počítam horné odhady skóre termov (searcher ich používa ako default)
+BM25_K1 = 1.2
+BM25_B  = 0.75
 
 # ---------------------------------
 # atribúty na indexovanie (vynechávam title lebo z toho som si extrahovala drug_name)
@@ -38,12 +63,15 @@ ATTRS_TO_INDEX = (
 
 MIN_TOKEN_LEN_DEFAULT = 2  # minimálna dĺžka tokenu
 
+_TOKEN_RE_CACHE: Dict[int, "re.Pattern[str]"] = {}   # min_token_len -> skompilovaný regex tokenu
+
 def tokenize(text: str, min_token_len: int = MIN_TOKEN_LEN_DEFAULT) -> List[str]:
-    text = (text or "").lower()      # zmena na malé písmená
-    # ponecháme len písmená, čísla a znaky dôležité pre dávkovanie/jednotky
-    text = re.sub(r"[^a-z0-9%\./\-+ ]+", " ", text)
-    toks = re.split(r"\s+", text)       # split podľa whitespace
-    return [t for t in toks if t and len(t) >= min_token_len]   # zahodím prázdne a príliš krátke tokeny
+    # token = súvislý úsek písmen, čísel a znakov dôležitých pre dávkovanie/jednotky, aspoň min_token_len dlhý
+    # (jeden prechod cez findall namiesto sub + split + filtra)
+    pat = _TOKEN_RE_CACHE.get(min_token_len)
+    if pat is None:
+        pat = _TOKEN_RE_CACHE[min_token_len] = re.compile(r"[a-z0-9%%./+\-]{%d,}" % max(1, min_token_len))
+    return pat.findall((text or "").lower())      # zmena na malé písmená
 
 # -------------------------------------
 # práca s dokumentom = stránka
@@ -117,44 +145,60 @@ vytvorenie indexov, poznámky:
 def build_index(csv_path: Path, out_dir: Path, min_doc_tokens: int, min_token_len: int) -> None:
     """
     invertovaný index a výsledné dokumenty:
-      - inverted_index.jsonl : term -> {doc_id: tf}
-      - idf.jsonl            : term -> {df, idf_logN, idf_bm25}
-      - meta.json            : {N, avgdl, doclen, meta, nastavenia}
+      - inverted_index.jsonl.gz : term -> {doc_id: tf}   (termy zoradené abecedne)
+      - idf.jsonl.gz            : term -> {df, idf_logN, idf_bm25, ub_tfidf, ub_bm25}
+      - meta.json            : {N, avgdl, nastavenia}
+      - docmeta.jsonl        : {url, drug_name} pre každý dokument (searcher číta len riadky výsledkov)
+      - terms.bin, postings.bin, docids.bin, doclen.bin : to isté v binárnej podobe pre rýchle načítanie cez mmap
 
     meta.json obsahuje:
     - N: počet dokumentov
     - avgdl: priemerná dĺžka dokumentu (pre BM25)
-    - doclen: dĺžky jednotlivých dokumentov (doc_id -> token count)
-    - meta: mapovanie doc_id na URL a názov lieku (pre výstup výsledkov)
     - granularity: typ dokumentu ("page" = celá stránka)
     - attrs_joined: zoznam sekcií, ktoré boli spojené do jedného dokumentu
     => Tento súbor slúži na interpretáciu výsledkov a výpočet skóre, nie je to samotný index.
     """
 
-    global INVERTED_INDEX_PATH, IDF_PATH, META_PATH
-    INVERTED_INDEX_PATH = out_dir / "inverted_index.jsonl"
-    IDF_PATH            = out_dir / "idf.jsonl"
+    global INVERTED_INDEX_PATH, IDF_PATH, META_PATH, DOCMETA_PATH, TERMS_BIN_PATH, POSTINGS_BIN_PATH, DOCIDS_BIN_PATH, DOCLEN_BIN_PATH
+    INVERTED_INDEX_PATH = out_dir / "inverted_index.jsonl.gz"
+    IDF_PATH            = out_dir / "idf.jsonl.gz"
     META_PATH           = out_dir / "meta.json"
-
-    # Invertovaný index: term -> {doc_id: tf}
-    postings: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    DOCMETA_PATH        = out_dir / "docmeta.jsonl"
+    TERMS_BIN_PATH      = out_dir / "terms.bin"
+    POSTINGS_BIN_PATH   = out_dir / "postings.bin"
+    DOCIDS_BIN_PATH     = out_dir / "docids.bin"
+    DOCLEN_BIN_PATH     = out_dir / "doclen.bin"
+
+    # Invertovaný index: term -> (pole indexov dokumentov, pole tf) – kompaktné array('I') namiesto dict-u na term
+    postings: Dict[str, Tuple[array, array]] = {}
+    # doc_id -> hustý celočíselný index a späť (index do doc_ids)
+    doc_idx: Dict[str, int] = {}
+    doc_ids: List[str] = []
+    repeated = False   # objavilo sa niektoré doc_id (url) znova? potom pri zápise tf sčítam
     # Dĺžky dokumentov (počet tokenov) – pre normalizácie (BM25) a diagnostiku
     doclen: Dict[str, int] = {}
     # Meta údaje pre spätný výstup výsledkov
     meta: Dict[str, Dict[str, str]] = {}
 
     # deduplikácia stránok, ak by sa v CSV náhodou zopakovala tá istá stránka s identickým textom
-    seen_keys = set()  # (url, hash(textu))
+    seen_keys = set()  # (url, xxh3 hash textu)
+    # rovnaký text pod inou URL netokenizujem znova – tokeny si pamätám podľa toho istého xxh3 hashu
+    token_cache: Dict[int, List[str]] = {}
 
     for d in iter_docs_pages(csv_path):
-        text_hash = hashlib.md5(d["text"].encode("utf-8")).hexdigest()
+        text_hash = xxhash.xxh3_64_intdigest(d["text"].encode("utf-8"))   # rýchly nekryptografický hash (int)
         dedup_key = (d["url"], text_hash)
         if dedup_key in seen_keys:
             continue
         seen_keys.add(dedup_key)
 
         # tokenizácia textu stránky (spojené sekcie)
-        toks = tokenize(d["text"], min_token_len=min_token_len)
+        toks = token_cache.get(text_hash)
+        if toks is None:
+            toks = tokenize(d["text"], min_token_len=min_token_len)
+            if len(token_cache) >= TOKEN_CACHE_SIZE:
+                del token_cache[next(iter(token_cache))]   # vyhodím najstarší záznam
+            token_cache[text_hash] = toks
 
         # hranica na min. počet tokenov v dokumente (default 1 – ponechá aj veľmi krátke stránky)
         if len(toks) < min_doc_tokens:
@@ -169,9 +213,19 @@ def build_index(csv_path: Path, out_dir: Path, min_doc_tokens: int, min_token_le
             "drug_name": d["drug_name"],
         }
 
-        # naplím invertovaný index: TF pre každý term v dokumente
-        for t in toks:
-            postings[t][did] += 1
+        i = doc_idx.setdefault(did, len(doc_ids))
+        if i == len(doc_ids):
+            doc_ids.append(did)
+        else:
+            repeated = True
+
+        # naplním invertovaný index: TF spočítam naraz cez Counter (v C), do postings idem raz na unikátny term
+        for t, c in Counter(toks).items():
+            plist = postings.get(t)
+            if plist is None:
+                plist = postings[t] = (array("I"), array("I"))
+            plist[0].append(i)
+            plist[1].append(c)
 
     # počet dokumentov a priemerná dĺžka dokumentu (pre BM25)
     N = len(doclen)
@@ -181,40 +235,112 @@ def build_index(csv_path: Path, out_dir: Path, min_doc_tokens: int, min_token_le
     out_dir.mkdir(parents=True, exist_ok=True)
 
     # uložím INVERTOVANÝ INDEX
-    with INVERTED_INDEX_PATH.open("w", encoding="utf-8") as f:
-        for term, plist in postings.items():
-            f.write(json.dumps({"term": term, "postings": plist}, ensure_ascii=False) + "\n")
+    # postings poskladám späť na {doc_id: tf}, orjson serializuje rovno do UTF-8 bytes (aj s \n),
+    # zapisujem cez 1 MiB buffer do gzip-u (level 1); popri tom si do int32 poľa zbieram DF pre IDF nižšie
+    terms = sorted(postings)        # termy zoradím raz – v súboroch idú abecedne (binárne hľadanie / merge)
+    dfs = np.empty(len(terms), dtype=np.int32)
+    id_chunks: List[array] = []     # tie isté postings si odložím aj pre horné odhady skóre nižšie
+    tf_chunks: List[array] = []
+    # do postings.bin idú tie isté postings ako surové u32 polia (doc indexy sú v poradí dokumentov, teda vzostupne)
+    with io.BufferedWriter(gzip.open(INVERTED_INDEX_PATH, "wb", compresslevel=GZIP_LEVEL), WRITE_BUFFER) as f, \
+         POSTINGS_BIN_PATH.open("wb", buffering=WRITE_BUFFER) as fb:
+        for k, term in enumerate(terms):
+            ids, tfs = postings[term]
+            if repeated:
+                plist: Dict[str, int] = {}
+                for i, c in zip(ids, tfs):
+                    did = doc_ids[i]
+                    plist[did] = plist.get(did, 0) + c      # sčítam, ak by sa rovnaké doc_id (url) objavilo znova
+                pairs = sorted(zip(map(doc_idx.__getitem__, plist), plist.values()))
+                ids, tfs = array("I", [i for i, _ in pairs]), array("I", [c for _, c in pairs])
+            else:
+                plist = dict(zip(map(doc_ids.__getitem__, ids), tfs))
+            dfs[k] = len(plist)
+            f.write(orjson.dumps({"term": term, "postings": plist}, option=orjson.OPT_APPEND_NEWLINE))
+            fb.write(np.frombuffer(ids, dtype=np.uint32).astype("<u4", copy=False).tobytes())
+            fb.write(np.frombuffer(tfs, dtype=np.uint32).astype("<u4", copy=False).tobytes())
+            id_chunks.append(ids)
+            tf_chunks.append(tfs)
 
     # uložím DF/IDF pre obe metódy
-    with IDF_PATH.open("w", encoding="utf-8") as f:
-        for term, plist in postings.items():
-            df = len(plist)
-            obj = {
-                "term": term,
-                "df": df,
-                "idf_logN": round(idf_logN(df, N), 8),
-                "idf_bm25": round(idf_bm25(df, N), 8),
-            }
-            f.write(json.dumps(obj, ensure_ascii=False) + "\n")
-
-    # uložím meta a štatistiky
-    META_PATH.write_text(json.dumps({
+    # obe IDF spočítam vektorovo naraz nad poľom DF (vzorce ako idf_logN / idf_bm25)
+    idf_log_arr = np.log(N / np.maximum(dfs, 1)).round(8)
+    idf_bm_arr = np.log((N - dfs + 0.5) / (dfs + 0.5) + 1.0).round(8)
+    idf_log = idf_log_arr.tolist()
+    idf_bm = idf_bm_arr.tolist()
+
+    # dĺžky dokumentov v poradí doc indexov (pre horné odhady aj doclen.bin)
+    dl_docs = np.array([doclen[did] for did in doc_ids], dtype=np.int64)
+
+    # horný odhad príspevku každého termu k skóre (max cez jeho dokumenty) – pre MaxScore/WAND v searcheri
+    # počítam presne rovnakým vzorcom ako searcher, takže odhad je tesný
+    ub_tfidf = np.zeros(len(terms), dtype=np.float64)
+    ub_bm25 = np.zeros(len(terms), dtype=np.float64)
+    if terms:
+        all_ids = np.concatenate([np.frombuffer(a, dtype=np.uint32) for a in id_chunks])
+        all_tfs = np.concatenate([np.frombuffer(a, dtype=np.uint32) for a in tf_chunks]).astype(np.float64)
+        starts = np.zeros(len(terms), dtype=np.int64)
+        np.cumsum(dfs[:-1], out=starts[1:])
+        dl_arr = dl_docs[all_ids].astype(np.float64)
+        norm = avgdl if avgdl > 0 else 1.0
+        bm = np.repeat(idf_bm_arr, dfs) * (all_tfs * (BM25_K1 + 1)) / (all_tfs + BM25_K1 * (1 - BM25_B + BM25_B * (dl_arr / norm)))
+        ub_bm25 = np.maximum.reduceat(bm, starts)
+        ub_tfidf = (1.0 + np.log(np.maximum.reduceat(all_tfs, starts))) * idf_log_arr
+    del id_chunks, tf_chunks
+
+    with io.BufferedWriter(gzip.open(IDF_PATH, "wb", compresslevel=GZIP_LEVEL), WRITE_BUFFER) as f:
+        f.writelines(orjson.dumps({
+            "term": term,
+            "df": df,
+            "idf_logN": il,
+            "idf_bm25": ib,
+            "ub_tfidf": ut,
+            "ub_bm25": ub,
+        }, option=orjson.OPT_APPEND_NEWLINE)
+            for term, df, il, ib, ut, ub in zip(terms, dfs.tolist(), idf_log, idf_bm, ub_tfidf.tolist(), ub_bm25.tolist()))
+
+    # binárny zoznam termov (hlavička, IDF, DF, názvy) a zoznam doc_id pre postings.bin
+    with TERMS_BIN_PATH.open("wb", buffering=WRITE_BUFFER) as f:
+        f.write(np.array([len(terms), TERMS_BIN_VERSION], dtype="<u4").tobytes())
+        f.write(idf_log_arr.astype("<f8", copy=False).tobytes())
+        f.write(idf_bm_arr.astype("<f8", copy=False).tobytes())
+        f.write(ub_tfidf.astype("<f8", copy=False).tobytes())
+        f.write(ub_bm25.astype("<f8", copy=False).tobytes())
+        f.write(dfs.astype("<u4").tobytes())
+        f.write("\n".join(terms).encode("utf-8"))
+    DOCIDS_BIN_PATH.write_bytes("\n".join(doc_ids).encode("utf-8"))
+    # dĺžky ako uint16 (stačí, ak žiadny dokument nemá viac ako 65535 tokenov) – searcher ich má celé v cache
+    dl_dtype = "<u2" if dl_docs.size == 0 or dl_docs.max() <= 0xFFFF else "<u4"
+    DOCLEN_BIN_PATH.write_bytes(np.array([np.dtype(dl_dtype).itemsize], dtype="<u4").tobytes()
+                                + dl_docs.astype(dl_dtype).tobytes())
+
+    # staré nekomprimované verzie zmažem, aby vedľa nových .gz neostal neaktuálny index
+    for path in (INVERTED_INDEX_PATH, IDF_PATH):
+        path.with_suffix("").unlink(missing_ok=True)
+    # komprimované postings z build_packed.py by už nesedeli s novým postings.bin – treba ich spraviť znova
+    (out_dir / "postings.pfor").unlink(missing_ok=True)
+
+    # meta dokumentov po riadkoch (doc_id = riadok v docids.bin), dĺžky sú v doclen.bin
+    with DOCMETA_PATH.open("wb", buffering=WRITE_BUFFER) as f:
+        f.writelines(orjson.dumps(meta[did], option=orjson.OPT_APPEND_NEWLINE) for did in doc_ids)
+
+    # uložím štatistiky a nastavenia
+    META_PATH.write_bytes(orjson.dumps({
         "N": N,
         "avgdl": avgdl,
-        "doclen": doclen,          # dĺžky dokumentov – pre normalizáciu v BM25
-        "meta": meta,              # doc_id -> {url, drug_name}
         "granularity": "page",     #  dokument = stránka (1 riadok CSV)
         "attrs_joined": list(ATTRS_TO_INDEX),  # ktoré polia sa spojili do jedného textu
         "min_doc_tokens": min_doc_tokens,
         "min_token_len": min_token_len,
-    }), encoding="utf-8")
+    }))
 
     # Kontrolný výpis do konzoly
     print(f"[OK] Počet dokumentov (stránok): {N}")
     print(f"[OK] Unikátnych termov                  : {len(postings)}")
     print(f"[OK] Priemerný počet tokenov na dok.    : {avgdl:.2f}")
     print(f"[OK] Výstupný priečinok                 : {out_dir.resolve()}")
-    print(f"     - {INVERTED_INDEX_PATH.name}, {IDF_PATH.name}, {META_PATH.name}")
+    print(f"     - {INVERTED_INDEX_PATH.name}, {IDF_PATH.name}, {META_PATH.name}, {DOCMETA_PATH.name}")
+    print(f"     - {TERMS_BIN_PATH.name}, {POSTINGS_BIN_PATH.name}, {DOCIDS_BIN_PATH.name}, {DOCLEN_BIN_PATH.name}")
 
 # --------- CLI ---------------------------------------------------------------
 
@@ -1,9 +1,14 @@
 import os
 import csv
+import glob
+import gzip
 import lucene
+from contextlib import closing
+from operator import itemgetter
 
 # Importy Java tried z Lucene cez PyLucene wrapper
 from java.nio.file import Paths
+from java.util import ArrayList
 from org.apache.lucene.store import FSDirectory
 from org.apache.lucene.analysis.standard import StandardAnalyzer
 from org.apache.lucene.index import IndexWriter, IndexWriterConfig
@@ -11,18 +16,115 @@ from org.apache.lucene.document import Document, Field, TextField, StringField
 
 
 # cesty k dátam
-# Vstupný TSV súbor – výsledok joinu Drugs.com + Wikipedia zo Sparku
-INPUT_TSV = "data/join/drugs_wiki_join/part-00000-7cc105f0-9d80-4cfd-ace5-aa037ddbd2f9-c000.csv"
+# Vstupné TSV – výsledok joinu Drugs.com + Wikipedia zo Sparku (adresár s part-*.csv.gz, každý part má hlavičku)
+INPUT_TSV_DIR = "data/join/drugs_wiki_join"
 
 # Adresár, kam sa uloží Lucene index -> Lucene vytvorí množinu súborov
 INDEX_DIR = "lucene_index_drugs"
 
+# nastavenia IndexWriter-a pre jednorazové hromadné indexovanie
+RAM_BUFFER_MB = 1024.0   # väčší RAM buffer -> menej segmentov a menej mergovania (default je 16 MB)
+JVM_MAXHEAP   = "2g"     # heap pre JVM, aby sa RAM buffer zmestil do pamäte
+READ_BUFFER   = 1 << 20  # buffer pri čítaní vstupného TSV (1 MiB)
+ADD_BATCH     = 1000     # koľko dokumentov posielam do writer-a jedným addDocuments volaním
+
+
+# stĺpce vstupného TSV, ktoré čítam z každého riadku (v tomto poradí sa rozbaľujú do premenných)
+COLS = (
+    "url",
+    "drug_name",
+    "generic_name",
+    "title",
+    "brand_names",
+    "dosage_forms",
+    "drug_class",
+    "availability",
+    "indications",
+    "dosage",
+    "side_effects",
+    "warnings",
+    "wiki_title",
+    "wiki_url",
+    "wiki_summary",
+    "wiki_tradename",
+    "wiki_synonyms",
+    "wiki_routes",
+    "wiki_atc",
+    "wiki_half_life",
+    "wiki_cas",
+    "wiki_legal_status",
+    "wiki_pregnancy",
+    "wiki_has_infobox",
+    "wiki_has_atc",
+)
+
+# polia dokumentu: (názov, typ poľa, či sa hodnota ukladá)
+# Field objekty z tohto zoznamu vytvorím raz a pre každý riadok im len prepíšem hodnotu
+FIELD_SPECS = (
+    ("url",                 StringField, Field.Store.YES),
+    ("drug_name",           TextField,   Field.Store.YES),
+    ("generic_name",        TextField,   Field.Store.YES),
+    ("brand_names",         TextField,   Field.Store.YES),
+    ("title",               TextField,   Field.Store.NO),
+    ("generic_name_exact",  StringField, Field.Store.NO),
+    ("drug_name_exact",     StringField, Field.Store.NO),
+    ("dosage_forms",        TextField,   Field.Store.NO),
+    ("drug_class",          TextField,   Field.Store.NO),
+    ("indications",         TextField,   Field.Store.NO),
+    ("dosage",              TextField,   Field.Store.NO),
+    ("side_effects",        TextField,   Field.Store.NO),
+    ("warnings",            TextField,   Field.Store.NO),
+    ("availability",        StringField, Field.Store.YES),
+    ("wiki_title",          TextField,   Field.Store.NO),
+    ("wiki_tradename",      TextField,   Field.Store.YES),
+    ("wiki_synonyms",       TextField,   Field.Store.YES),
+    ("wiki_summary",        TextField,   Field.Store.NO),
+    ("wiki_routes",         TextField,   Field.Store.NO),
+    ("wiki_legal_status",   TextField,   Field.Store.NO),
+    ("wiki_pregnancy",      TextField,   Field.Store.NO),
+    ("wiki_url",            StringField, Field.Store.YES),
+    ("wiki_atc",            StringField, Field.Store.NO),
+    ("wiki_cas",            StringField, Field.Store.NO),
+    ("wiki_half_life",      TextField,   Field.Store.NO),
+    ("wiki_has_infobox",    StringField, Field.Store.NO),
+    ("wiki_has_atc",        StringField, Field.Store.NO),
+    ("full_text",           TextField,   Field.Store.NO),
+)
+
+
+# tabuľka A-Z -> a-z pre bytes.translate (rýchlejšie ako str.lower() pri ASCII vstupoch)
+_LOWER = bytes.maketrans(bytes(range(ord("A"), ord("Z") + 1)), bytes(range(ord("a"), ord("z") + 1)))
+
 
 def normalize(s: str) -> str:
     # pomocná funkcia na normalizáciu stringov: odstráni whitespace z okrajov, prevedie na malé písmená
-    if s is None:
+    if not s:
         return ""
-    return s.strip().lower()
+    s = s.strip()
+    # ASCII (bežný prípad – kódy, kategórie) idem cez translate tabuľku, inak klasické lower()
+    if s.isascii():
+        return s.encode("ascii").translate(_LOWER).decode("ascii")
+    return s.lower()
+
+
+def read_tsv_parts(paths):
+    # riadky zo všetkých part-* súborov za sebou (v poradí mien = poradie riadkov zo Sparku)
+    # hlavičku vrátim ako prvý riadok len raz, v ďalších partoch ju preskočím
+    header_sent = False
+    for path in paths:
+        if path.endswith(".gz"):
+            f = gzip.open(path, "rt", encoding="utf-8", newline="")
+        else:
+            f = open(path, "r", encoding="utf-8", newline="", buffering=READ_BUFFER)
+        with f:
+            reader = csv.reader(f, delimiter="\t")
+            header = next(reader, None)
+            if header is None:
+                continue
+            if not header_sent:
+                header_sent = True
+                yield header
+            yield from reader
 
 
 def create_index():
@@ -35,7 +137,7 @@ def create_index():
     # - commitne a uzavrie index.
 
     # inicializujem JVM (java virtual machine) pre PyLucene
-    lucene.initVM(vmargs=['-Djava.awt.headless=true'])     # zakáže GUI (headless režim)
+    lucene.initVM(vmargs=['-Djava.awt.headless=true'], maxheap=JVM_MAXHEAP)     # zakáže GUI (headless režim)
     print("Lucene version:", lucene.VERSION)
 
     # príprava FSDirectory a IndexWriter-a
@@ -54,153 +156,169 @@ def create_index():
     # OpenMode.CREATE vždy vytvorí nový index teda ak existuje starý, prepisuje ho.
     config.setOpenMode(IndexWriterConfig.OpenMode.CREATE)
 
+    # bulk nastavenia: flushujem len podľa RAM (nie podľa počtu dokumentov) a bez compound súborov,
+    # aby sa segmenty na konci zbytočne neprepisovali do .cfs
+    config.setRAMBufferSizeMB(RAM_BUFFER_MB)
+    config.setMaxBufferedDocs(IndexWriterConfig.DISABLE_AUTO_FLUSH)
+    config.setUseCompoundFile(False)
+    config.getMergePolicy().setNoCFSRatio(0.0)
+
     # IndexWriter – zápis dokumentov do indexu
     writer = IndexWriter(directory, config)
 
-    # skontrolujem, či existuje vstupný súbor
-    if not os.path.exists(INPUT_TSV):
-        # Ak vstupný súbor neexistuje, ukonči program s chybovým hlásením
-        raise SystemExit(f"Input TSV neexistuje: {INPUT_TSV}")
+    # skontrolujem, či existujú vstupné súbory
+    part_paths = sorted(glob.glob(os.path.join(INPUT_TSV_DIR, "part-*")))
+    if not part_paths:
+        # Ak vstupné súbory neexistujú, ukonči program s chybovým hlásením
+        raise SystemExit(f"Input TSV neexistuje: {INPUT_TSV_DIR}/part-*")
 
-    # otvorím TSV súbor v textovom režime
-    with open(INPUT_TSV, "r", encoding="utf-8", newline="") as f:
-        # DictReader vráti každý riadok ako dict {názov_stĺpca: hodnota}
-        reader = csv.DictReader(f, delimiter="\t")
+    # čítam všetky party ako jeden TSV (closing zatvorí aj práve otvorený part, ak skončím skôr)
+    # csv.reader vráti riadok ako list – nestavia dict pre každý riadok ako DictReader
+    with closing(read_tsv_parts(part_paths)) as reader:
+
+        # z hlavičky si raz spočítam indexy stĺpcov v poradí COLS;
+        # stĺpec, ktorý v hlavičke chýba, ukazuje na pridané "" za koncom riadku
+        header = next(reader, [])
+        pos = {name: i for i, name in enumerate(header)}
+        width = len(header)
+        has_missing = any(c not in pos for c in COLS)
+        get_cols = itemgetter(*(pos.get(c, width) for c in COLS))
 
         count = 0  # počítadlo zaindexovaných dokumentov
 
+        # Document + Field na každé pole vytvorím raz pre každé miesto v dávke a potom ich len
+        # znovupoužívam – nevytváram desiatky nových Java objektov (JNI volania + GC) na každý riadok
+        slots = [
+            (Document(), {name: cls(name, "", store) for name, cls, store in FIELD_SPECS})
+            for _ in range(ADD_BATCH)
+        ]
+        # dávka dokumentov pre writer.addDocuments – jeden JNI prechod na ADD_BATCH dokumentov
+        batch = ArrayList()
+
+        def put(field, value):
+            # nastavím hodnotu znovupoužitého poľa a pridám ho do aktuálneho dokumentu
+            field.setStringValue(value)
+            doc.add(field)
+
         # postupne prechádzam všetky riadky súboru
         for row in reader:
-            # vytvorím nový Lucene Document – každý záznam/liek = jeden dokument v indexe
-            doc = Document()
+            # prázdne riadky preskočím (DictReader to robil tiež)
+            if not row:
+                continue
+            # kratší riadok doplním prázdnymi hodnotami, dlhší orežem na šírku hlavičky
+            if len(row) != width:
+                row = (row + [""] * width)[:width]
+            if has_missing:
+                row.append("")
+
+            # vezmem voľný Document z dávky a vyprázdnim ho – každý záznam/liek = jeden dokument v indexe
+            # (prázdne hodnoty do neho nepridávam, rovnako ako doteraz)
+            doc, fields = slots[batch.size()]
+            doc.clear()
+
+            # všetky stĺpce vytiahnem naraz v poradí COLS
+            (
+                url, drug_name, generic_name, title, brand_names, dosage_forms, drug_class,
+                availability, indications, dosage, side_effects, warnings, wiki_title, wiki_url,
+                wiki_summary, wiki_tradename, wiki_synonyms, wiki_routes, wiki_atc, wiki_half_life,
+                wiki_cas, wiki_legal_status, wiki_pregnancy, wiki_has_infobox, wiki_has_atc,
+            ) = get_cols(row)
 
             # URL z Drugs.com – presný string na zobrazenie
-
-            # get("url", "") – vezme hodnotu zo stĺpca "url", ak chýba, vráti ""
-            url = row.get("url", "") or ""
             if url:
                 # StringField: NEanalyzované pole (berie sa ako jeden token), Store.YES – hodnotu chcem vedieť z dokumentu načítať (zobraziť ju).
-                doc.add(StringField("url", url, Field.Store.YES))
+                put(fields["url"], url)
 
             # Hlavné názvy – fulltext + zobrazovanie
-
-            drug_name = row.get("drug_name", "") or ""
-            generic_name = row.get("generic_name", "") or ""
-            title = row.get("title", "") or ""
-            brand_names = row.get("brand_names", "") or ""
-
             # tieto polia chcem fulltextovo vyhľadávať aj zobrazovať, preto použijem TextField + Store.YES.
             if drug_name:
-                doc.add(TextField("drug_name", drug_name, Field.Store.YES))
+                put(fields["drug_name"], drug_name)
             if generic_name:
-                doc.add(TextField("generic_name", generic_name, Field.Store.YES))
+                put(fields["generic_name"], generic_name)
             if brand_names:
-                doc.add(TextField("brand_names", brand_names, Field.Store.YES))
+                put(fields["brand_names"], brand_names)
 
             # 'title' – názov stránky, ktorý môže pomôcť pri fulltexte, ale nechcem ho zobrazovať -> Store.NO.
             if title:
-                doc.add(TextField("title", title, Field.Store.NO))
+                put(fields["title"], title)
 
             #  exact match polia – normalizované názvy - vytvorím si pomocne polia, kde budu normalizované hodnoty na exact match
             # generic_name_exact / drug_name_exact:StringField – NEanalyzované, normalize() – lower + trim, Store.NO – nezobrazujú sa
             if generic_name:
-                doc.add(StringField("generic_name_exact", normalize(generic_name), Field.Store.NO))
+                put(fields["generic_name_exact"], normalize(generic_name))
             if drug_name:
-                doc.add(StringField("drug_name_exact", normalize(drug_name), Field.Store.NO))
+                put(fields["drug_name_exact"], normalize(drug_name))
 
             # polia z Drugs.com – obsahové texty
-            dosage_forms = row.get("dosage_forms", "") or ""
-            drug_class = row.get("drug_class", "") or ""
-            availability = row.get("availability", "") or ""
-            indications = row.get("indications", "") or ""
-            dosage = row.get("dosage", "") or ""
-            side_effects = row.get("side_effects", "") or ""
-            warnings = row.get("warnings", "") or ""
-
             # tieto polia sú často dlhé texty – chcem v nich vyhľadávať,
             # ale nezobrazovať ich v základnom výsledku -> TextField + Store.NO.
             if dosage_forms:
-                doc.add(TextField("dosage_forms", dosage_forms, Field.Store.NO))
+                put(fields["dosage_forms"], dosage_forms)
             if drug_class:
-                doc.add(TextField("drug_class", drug_class, Field.Store.NO))
+                put(fields["drug_class"], drug_class)
             if indications:
-                doc.add(TextField("indications", indications, Field.Store.NO))
+                put(fields["indications"], indications)
             if dosage:
-                doc.add(TextField("dosage", dosage, Field.Store.NO))
+                put(fields["dosage"], dosage)
             if side_effects:
-                doc.add(TextField("side_effects", side_effects, Field.Store.NO))
+                put(fields["side_effects"], side_effects)
             if warnings:
-                doc.add(TextField("warnings", warnings, Field.Store.NO))
+                put(fields["warnings"], warnings)
 
             # 'availability' – kategória typu Rx-only, OTC atď
             # chceš ju používať ako filter (presný string) -> StringField + normalize() a zobrazovať vo výsledkoch -> Store.YES
             if availability:
-                doc.add(StringField("availability", normalize(availability), Field.Store.YES))
+                put(fields["availability"], normalize(availability))
 
             # Polia z Wikipédie
-            wiki_title = row.get("wiki_title", "") or ""
-            wiki_url = row.get("wiki_url", "") or ""
-            wiki_summary = row.get("wiki_summary", "") or ""
-            wiki_tradename = row.get("wiki_tradename", "") or ""
-            wiki_synonyms = row.get("wiki_synonyms", "") or ""
-            wiki_routes = row.get("wiki_routes", "") or ""
-            wiki_atc = row.get("wiki_atc", "") or ""
-            wiki_half_life = row.get("wiki_half_life", "") or ""
-            wiki_cas = row.get("wiki_cas", "") or ""
-            wiki_legal_status = row.get("wiki_legal_status", "") or ""
-            wiki_pregnancy = row.get("wiki_pregnancy", "") or ""
-            wiki_has_infobox = row.get("wiki_has_infobox", "") or ""
-            wiki_has_atc = row.get("wiki_has_atc", "") or ""
-
             # wiki_title : text, ktorý môže pomôcť pri fulltexte, nepotrebujem ho zobrazovať => TextField + Store.NO
             if wiki_title:
-                doc.add(TextField("wiki_title", wiki_title, Field.Store.NO))
+                put(fields["wiki_title"], wiki_title)
 
             # wiki_tradename, wiki_synonyms: texty, ktoré chcem vyhľadávať aj zobrazovať -> TextField + Store.YES
             if wiki_tradename:
-                doc.add(TextField("wiki_tradename", wiki_tradename, Field.Store.YES))
+                put(fields["wiki_tradename"], wiki_tradename)
             if wiki_synonyms:
-                doc.add(TextField("wiki_synonyms", wiki_synonyms, Field.Store.YES))
+                put(fields["wiki_synonyms"], wiki_synonyms)
 
             # wiki_summary_ veľmi užitočný pre fulltext ale príliš dlhý na zobrazovanie v základnom výsledku -> TextField + Store.NO.
             if wiki_summary:
-                doc.add(TextField("wiki_summary", wiki_summary, Field.Store.NO))
+                put(fields["wiki_summary"], wiki_summary)
 
             # wiki_routes, wiki_legal_status, wiki_pregnancy:
             #  textové polia vhodné na fulltextové vyhľadávanie, nezobrazujú sa priamo => Store.NO.
             if wiki_routes:
-                doc.add(TextField("wiki_routes", wiki_routes, Field.Store.NO))
+                put(fields["wiki_routes"], wiki_routes)
             if wiki_legal_status:
-                doc.add(TextField("wiki_legal_status", wiki_legal_status, Field.Store.NO))
+                put(fields["wiki_legal_status"], wiki_legal_status)
             if wiki_pregnancy:
-                doc.add(TextField("wiki_pregnancy", wiki_pregnancy, Field.Store.NO))
+                put(fields["wiki_pregnancy"], wiki_pregnancy)
 
             # wiki_url – presná URL článku: StringField (bez analýzy), chcem ju zobraziť ako odkaz vo výsledkoch -> Store.YES
             if wiki_url:
-                doc.add(StringField("wiki_url", wiki_url, Field.Store.YES))
+                put(fields["wiki_url"], wiki_url)
 
             # wiki_atc, wiki_cas – kódy: exact match polia, nepotrebuješ ich zobrazovať -> StringField + Store.NO.
             if wiki_atc:
-                doc.add(StringField("wiki_atc", wiki_atc, Field.Store.NO))
+                put(fields["wiki_atc"], wiki_atc)
             if wiki_cas:
-                doc.add(StringField("wiki_cas", wiki_cas, Field.Store.NO))
+                put(fields["wiki_cas"], wiki_cas)
 
             # wiki_half_life – text využiteľný vo fulltexte, nezobrazujem ho => TextField + Store.NO.
             if wiki_half_life:
-                doc.add(TextField("wiki_half_life", wiki_half_life, Field.Store.NO))
+                put(fields["wiki_half_life"], wiki_half_life)
 
             # wiki_has_infobox, wiki_has_atc – boolean flagy:
             #   - využiteľné na filtrovanie (napr. články, ktoré majú infobox/ATC),
             #   - StringField ("true"/"false"), Store.NO.
             if wiki_has_infobox:
-                doc.add(StringField("wiki_has_infobox", wiki_has_infobox.lower(), Field.Store.NO))
+                put(fields["wiki_has_infobox"], wiki_has_infobox.lower())
             if wiki_has_atc:
-                doc.add(StringField("wiki_has_atc", wiki_has_atc.lower(), Field.Store.NO))
+                put(fields["wiki_has_atc"], wiki_has_atc.lower())
 
             # full_text pole – agregovaný text nad celým dokumentom, len na fulltext, nezobrazovať
-            full_text_parts = []
-
-            for val in [
+            # filter(None, ...) vynechá prázdne hodnoty už v C, bez if-u v Pythone
+            full_text = " ".join(filter(None, (
                 drug_name,
                 generic_name,
                 title,
@@ -222,23 +340,29 @@ def create_index():
                 wiki_cas,
                 wiki_legal_status,
                 wiki_pregnancy,
-            ]:
-                if val:
-                    full_text_parts.append(val)
-
-            full_text = " ".join(full_text_parts)
+            )))
 
             if full_text:
-                doc.add(TextField("full_text", full_text, Field.Store.NO))
+                put(fields["full_text"], full_text)
 
-            # pridám kompletne nadefinovaný dokument do indexu
-            writer.addDocument(doc)
+            # pridám kompletne nadefinovaný dokument do dávky, plnú dávku pošlem do indexu naraz
+            batch.add(doc)
+            if batch.size() == ADD_BATCH:
+                writer.addDocuments(batch)
+                batch.clear()
             count += 1
 
             # pomocný výpis každých 1000 dokumentov
             if count % 1000 == 0:
                 print(f"Zaindexovaných dokumentov: {count}")
 
+        # zvyšok poslednej (neúplnej) dávky
+        if not batch.isEmpty():
+            writer.addDocuments(batch)
+            batch.clear()
+
+    # na konci (a len raz) zlúčim segmenty do jedného – rýchlejšie vyhľadávanie
+    writer.forceMerge(1)
     # commit() – zapíše všetky zmeny do indexu na disk
     writer.commit()
     # close() – uvoľní zdroje spojené s IndexWriter
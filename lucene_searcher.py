@@ -1,8 +1,14 @@
+import argparse
+import os
+import sys
 import lucene
+from functools import lru_cache
 from java.io import File
-from org.apache.lucene.store import FSDirectory
+from java.util import ArrayList, HashSet
+from java.util.concurrent import Executors
+from org.apache.lucene.store import MMapDirectory
 from org.apache.lucene.index import DirectoryReader
-from org.apache.lucene.search import IndexSearcher, BooleanQuery, BooleanClause, BoostQuery
+from org.apache.lucene.search import IndexSearcher, BoostQuery, DisjunctionMaxQuery
 from org.apache.lucene.analysis.standard import StandardAnalyzer
 from org.apache.lucene.util import QueryBuilder
 
@@ -10,7 +16,22 @@ from org.apache.lucene.util import QueryBuilder
 # !!! musí byť rovnaký ako INDEX_DIR v indexeri, inak searcher uvidí iný / prázdny index.
 INDEX_DIR = "lucene_index_drugs"
 
-def main():
+SEARCH_THREADS = os.cpu_count() or 1   # vlákna, medzi ktoré IndexSearcher rozdelí segmenty indexu
+# uložené polia (Store.YES v indexeri), ktoré vypisujem pri výsledku, a ich popisy vo výpise
+DISPLAY_FIELDS = (
+    ("drug_name",      "drug_name"),
+    ("generic_name",   "generic_name"),
+    ("brand_names",    "brand_names"),
+    ("availability",   "availability"),
+    ("url",            "url (drugs.com)"),
+    ("wiki_tradename", "wiki_tradename"),
+    ("wiki_synonyms",  "wiki_synonyms"),
+    ("wiki_url",       "wiki_url"),
+)
+DISMAX_TIE_BREAKER = 0.1               # aká časť skóre ostatných (nie najlepšieho) polí sa pripočíta pri voľnom texte
+QUERY_CACHE_SIZE = 1024                # koľko posledných dopytov (a čiastkových dopytov pre polia) si pamätám – Query objekty sú nemenné
+
+def main(query_file=None):
     # štart JVM (Java Virtual Machine) pre PyLucene
     # moja poznamka: PyLucene je wrapper okolo Java Lucene, takže pred použitím
     # musím spustiť JVM. Bez initVM() by volania Lucene tried zlyhali.
@@ -18,13 +39,25 @@ def main():
     print("Lucene version:", lucene.VERSION)
 
     # Otvorenie existujúceho indexu na disku
-    directory = FSDirectory.open(File(INDEX_DIR).toPath())
+    # MMapDirectory explicitne – index sa namapuje raz a ďalšie dopyty idú z page cache
+    # (FSDirectory.open by si implementáciu vyberal podľa platformy)
+    directory = MMapDirectory(File(INDEX_DIR).toPath())
 
     # DirectoryReader.open(directory): otvorí index v read-only režime
     reader = DirectoryReader.open(directory)
 
     # IndexSearcher:nad "reader" vie vykonávať dopyty (Query) a vracať výsledky
-    searcher = IndexSearcher(reader)
+    # s executorom prehľadáva segmenty (slices) paralelne vo viacerých vláknach
+    # pozn.: indexer robí forceMerge(1), takže pri jednom segmente to pomôže až novšiemu Lucene (delenie segmentu)
+    executor = Executors.newFixedThreadPool(SEARCH_THREADS)
+    searcher = IndexSearcher(reader, executor)
+
+    # stored_fields slúži na načítanie uložených polí pre daný doc ID – stačí ho získať raz pre celý reader
+    stored_fields = searcher.storedFields()
+    # z uložených polí načítam len tie, ktoré vypisujem (document(id, polia) nedekóduje ostatné)
+    fields_to_load = HashSet()
+    for field, _ in DISPLAY_FIELDS:
+        fields_to_load.add(field)
 
     # Analyzer musí byť rovnakého typu ako ten, ktorý som použila pri indexovaní
     # (StandardAnalyzer) – aby QueryBuilder rovnako tokenizoval dopyty ako mám tokenizované dáta
@@ -62,6 +95,12 @@ def main():
     print('  indications:Crohn disease')
     print()
 
+    # QueryBuilder.createBooleanQuery(field, text) – spraví OR nad termami (podľa analyzera)
+    # rovnaké (pole, text) sa neanalyzuje znova, vráti sa už vytvorený čiastkový dopyt
+    @lru_cache(maxsize=QUERY_CACHE_SIZE)
+    def field_query(field: str, text: str):
+        return qb.createBooleanQuery(field, text)
+
     # pomocná funkcia na vytvorenie query pre jednoduchý field:hodnota dopyt
     def build_field_query(q_text: str):
         # Jednoduchý parser pre dopyty typu 'field:hodnota'.
@@ -79,53 +118,45 @@ def main():
         if not field or not value:
             return None
 
-        # QueryBuilder.createBooleanQuery(field, text) – spraví OR nad termami (podľa analyzera)
-        q = qb.createBooleanQuery(field, value)
+        q = field_query(field, value)
         return q
 
-    # pomocná funkcia: voľný text → multi-field váhovaný BooleanQuery
+    # pomocná funkcia: voľný text → multi-field váhovaný DisjunctionMaxQuery
     def build_weighted_multi_field_query(text: str):
-        # vytvorí BooleanQuery, ktorý hľadá text v niekoľkých poliach naraz, pričom každé pole má svoju váhu
-        builder = BooleanQuery.Builder()
+        # hľadá text v niekoľkých poliach naraz, pričom každé pole má svoju váhu;
+        # DisMax berie skóre najlepšieho poľa (+ tie_breaker * ostatné), nie súčet všetkých polí
+        subqueries = ArrayList()
         for field, boost in field_boosts:
-            q_field = qb.createBooleanQuery(field, text)
+            q_field = field_query(field, text)
             if q_field is None:
                 continue
             if boost != 1.0:
                 q_field = BoostQuery(q_field, boost)
-            builder.add(q_field, BooleanClause.Occur.SHOULD)
-        return builder.build()
-
-    # slučka – čakanie na dopyty od používateľa ak nezada prazny dopyt
-    # ============================================
-    while True:
+            subqueries.add(q_field)
+        return DisjunctionMaxQuery(subqueries, DISMAX_TIE_BREAKER)
+
+    # celý dopyt podľa zadaného textu – opakovaný dopyt sa už znova neskladá
+    @lru_cache(maxsize=QUERY_CACHE_SIZE)
+    def build_query(q_text: str):
+        # Rozlíšenie typu dopytu:
+        # - ak obsahuje ":", skúsime ho interpretovať ako jednoduchý field:hodnota
+        # - inak ho berieme ako voľný text nad viacerými poliami s váhami
+        if ":" in q_text:
+            query = build_field_query(q_text)
+            if query is not None:
+                return query
+            # fallback: ak sa nepodarilo spraviť field query, použijem voľný text
+        return build_weighted_multi_field_query(q_text)
+
+    # jeden dopyt: zostavenie query, vyhľadanie a výpis top 5
+    def run_query(query_str: str):
         try:
-            # input() a strip() – odstráň medzery na okrajoch
-            query_str = input("Zadaj dopyt (alebo prázdny pre koniec): ").strip()
-        except (EOFError, KeyboardInterrupt):
-            # Ctrl+D (EOF) alebo Ctrl+C (KeyboardInterrupt) – ukončí program
-            break
-
-        # ak používateľ zadá prázdny riadok tak tiež ukonči slučku
-        if not query_str:
-            break
-
-        try:
-            # Rozlíšenie typu dopytu:
-            # - ak obsahuje ":", skúsime ho interpretovať ako jednoduchý field:hodnota
-            # - inak ho berieme ako voľný text nad viacerými poliami s váhami
-            if ":" in query_str:
-                query = build_field_query(query_str)
-                if query is None:
-                    # fallback: ak sa nepodarilo spraviť field query, použijem voľný text
-                    query = build_weighted_multi_field_query(query_str)
-            else:
-                query = build_weighted_multi_field_query(query_str)
+            query = build_query(query_str)
 
         except Exception as e:
-            # ak dopyt nie je správny (napr. prázdne pole), vypíšem chybu a spýtam sa používateľa znova
+            # ak dopyt nie je správny (napr. prázdne pole), vypíšem chybu a pokračujem ďalším dopytom
             print("Chyba pri vytváraní dopytu:", e)
-            continue
+            return
 
         # searcher.search(query, k) - vráti TopDocs s k najlepšími výsledkami podľa skóre (vráti top 5)
         top_docs = searcher.search(query, 5)
@@ -134,53 +165,68 @@ def main():
         total_hits = top_docs.totalHits.value()
         print(f"Nájdených dokumentov: {total_hits}")
 
-        # ak mi nič nenašlo, spýtajm sa používateľa na ďalší dopyt
+        # ak mi nič nenašlo, pokračujem ďalším dopytom
         if total_hits == 0:
-            continue
-
-        # stored_fields slúži na načítanie uložených polí pre daný doc ID
-        stored_fields = searcher.storedFields()
+            return
 
         # Prejdi všetky nájdené dokumenty (max 5, podľa search(query, 5))
+        # najprv načítam hodnoty zo všetkých dokumentov, výstup poskladám do jedného reťazca a zapíšem naraz
+        out = []
         for rank, score_doc in enumerate(top_docs.scoreDocs, start=1):
             # score_doc.doc = interné ID dokumentu v indexe
-            # stored_fields.document(id) vráti Document s uloženými poľami
-            doc = stored_fields.document(score_doc.doc)
+            # stored_fields.document(id, polia) vráti Document len so zadanými uloženými poľami
+            doc = stored_fields.document(score_doc.doc, fields_to_load)
 
             # Načítanie polí, ktoré sú Store.YES v indexeri
             # doc.get("field_name") vráti hodnotu uloženého poľa alebo None,
-            # preto používam "or ''", aby som nemala 'None' v printoch
-            url = doc.get("url") or ""
-            drug_name = doc.get("drug_name") or ""
-            generic_name = doc.get("generic_name") or ""
-            brand_names = doc.get("brand_names") or ""
-            availability = doc.get("availability") or ""
-            wiki_url = doc.get("wiki_url") or ""
-            wiki_tradename = doc.get("wiki_tradename") or ""
-            wiki_synonyms = doc.get("wiki_synonyms") or ""
+            # preto používam "or ''", aby som nemala 'None' vo výpise
+            values = [doc.get(field) or "" for field, _ in DISPLAY_FIELDS]
 
             # score_doc.score = skóre, ktoré Lucene pridelil dokumentu pre daný dopyt
-            print("=" * 80)
-            print(f"Výsledok #{rank}  (score={score_doc.score})")
-            print(f"  drug_name      : {drug_name}")
-            print(f"  generic_name   : {generic_name}")
-            print(f"  brand_names    : {brand_names}")
-            print(f"  availability   : {availability}")
-            print(f"  url (drugs.com): {url}")
-            print(f"  wiki_tradename : {wiki_tradename}")
-            print(f"  wiki_synonyms  : {wiki_synonyms}")
-            print(f"  wiki_url       : {wiki_url}")
-
-        print("-" * 80)
+            out.append("=" * 80)
+            out.append(f"Výsledok #{rank}  (score={score_doc.score})")
+            out.extend(f"  {label:<15}: {value}" for (_, label), value in zip(DISPLAY_FIELDS, values))
+
+        out.append("-" * 80)
+        sys.stdout.write("\n".join(out) + "\n")
+        sys.stdout.flush()
+
+    if query_file:
+        # dávkový režim: dopyty zo súboru (jeden na riadok) nad tým istým searcherom a cache dopytov
+        with open(query_file, encoding="utf-8") as f:
+            for line in f:
+                query_str = line.strip()
+                if query_str:
+                    print(f"Dopyt: {query_str}")
+                    run_query(query_str)
+    else:
+        # slučka – čakanie na dopyty od používateľa ak nezada prazny dopyt
+        # ============================================
+        while True:
+            try:
+                # input() a strip() – odstráň medzery na okrajoch
+                query_str = input("Zadaj dopyt (alebo prázdny pre koniec): ").strip()
+            except (EOFError, KeyboardInterrupt):
+                # Ctrl+D (EOF) alebo Ctrl+C (KeyboardInterrupt) – ukončí program
+                break
+
+            # ak používateľ zadá prázdny riadok tak tiež ukonči slučku
+            if not query_str:
+                break
+
+            run_query(query_str)
 
     # zatvorenie readera a directory po skončení - dôležité kvôli uvoľneniu file handlerov a zdrojov v JVM
+    executor.shutdown()
     reader.close()
     directory.close()
     print("Koniec vyhľadávania.")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Vyhľadávanie v Lucene indexe (interaktívne alebo dopyty zo súboru).")
+    parser.add_argument("--query-file", default=None, help="Súbor s dopytmi, jeden na riadok.")
+    main(parser.parse_args().query_file)
 
 
     # ============================================
@@ -1,18 +1,48 @@
 import argparse
-import json
+import gzip
 import math
+import os
 import re
+import numpy as np
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Set
+from typing import Dict, List, Tuple
+from build_packed import PFOR_NAME, load_packed_postings
+
+try:
+    from numba import njit      # voliteľné – skórovanie nad binárnym indexom v jednej skompilovanej slučke
+except ImportError:
+    njit = None
 
 # ============
 # tokenizacia dopytu (rovnako ako v indexeri)
 
 MIN_TOKEN_LEN_DEFAULT = 2  # minimálna dĺžka tokenu (slova)
 
+# BM25 parametre – horné odhady skóre termov (ub_bm25) z indexera sú spočítané pre tieto hodnoty
+BM25_K1 = 1.2
+BM25_B  = 0.75
+TERMS_BIN_VERSION = 1      # verzia formátu terms.bin, ktorú viem čítať
+UB_SLACK = 1e-9            # rezerva pri porovnaní so súčtom horných odhadov (zaokrúhľovanie)
+SCORE_THREADS = os.cpu_count() or 1   # vlákna na skórovanie dlhých postings (len s numbou)
+PARALLEL_MIN_DF = 1 << 16  # koľko postings pripadne aspoň na jedno vlákno, inak sa delenie neoplatí
+
+# tabuľka pre ASCII text: A-Z -> a-z, povolené znaky ostanú, všetko ostatné -> medzera (jeden prechod textom)
+_TOKEN_ALLOWED = b"abcdefghijklmnopqrstuvwxyz0123456789%./-+"
+_TOKEN_TABLE = bytes(
+    c + 32 if 65 <= c <= 90 else (c if c in _TOKEN_ALLOWED else 32)
+    for c in range(256)
+)
+
 def tokenize(text: str, min_token_len: int = MIN_TOKEN_LEN_DEFAULT) -> List[str]:
     # prevedie text na malé písmená, odstráni nežiaduce znaky, rozdelí na tokeny (slova)
-    text = (text or "").lower()  # prevedie text na malé písmená
+    text = text or ""
+    if text.isascii():
+        # rýchla cesta bez regexov: malé písmená + náhrada znakov naraz cez translate tabuľku
+        toks = text.encode("ascii").translate(_TOKEN_TABLE).decode("ascii").split()
+        return [t for t in toks if len(t) >= min_token_len]
+    text = text.lower()  # prevedie text na malé písmená
     text = re.sub(r"[^a-z0-9%\./\-+ ]+", " ", text)      # ponechá len znaky a-z, čísla, medicínske znaky
     toks = re.split(r"\s+", text)  # rozdelí podľa medzier
     return [t for t in toks if t and len(t) >= min_token_len]  # odfiltruje prázdne a krátke tokeny
@@ -21,101 +51,376 @@ def tokenize(text: str, min_token_len: int = MIN_TOKEN_LEN_DEFAULT) -> List[str]
 # ============
 # načítam si všetky súbory, ktore som vytvorila pri indexovaní
 
-def load_inverted_index(path: Path) -> Dict[str, Dict[str, int]]:
-    # načítam inverted_index.jsonl → pre každý term zoznam dokumentov a ich frekvencie
+def _open_jsonl(path: Path):
+    # indexer zapisuje .jsonl.gz, staršie indexy sú nekomprimované .jsonl
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+def _index_file(index_dir: Path, name: str) -> Path:
+    # uprednostním komprimovanú verziu súboru, ak existuje
+    gz = index_dir / (name + ".gz")
+    return gz if gz.exists() else index_dir / name
+
+def load_inverted_index(path: Path, doc_index: Dict[str, int]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    # načítam inverted_index.jsonl(.gz) → pre každý term indexy dokumentov (vzostupne) a ich frekvencie
+    # ako dve uint32 polia – namiesto dict-u s Python reťazcami a int-mi; doc_index = doc_id -> index dokumentu
     inv = {}
-    with path.open("r", encoding="utf-8") as f:
+    with _open_jsonl(path) as f:
         for line in f:
-            obj = json.loads(line)  # načíta jeden JSON objekt (term + postings)
-            inv[obj["term"]] = {k: int(v) for k, v in obj["postings"].items()}  # prevod na dict
+            obj = orjson.loads(line)  # načíta jeden JSON objekt (term + postings)
+            plist = obj["postings"]
+            ids = np.fromiter(map(doc_index.__getitem__, plist), dtype=np.uint32, count=len(plist))
+            tfs = np.fromiter(plist.values(), dtype=np.uint32, count=len(plist))
+            order = np.argsort(ids, kind="stable")   # vzostupne kvôli searchsorted
+            inv[obj["term"]] = (ids[order], tfs[order])
     return inv
 
 def load_idf_table(path: Path) -> Dict[str, Dict[str, float]]:
-    # načítam idf.jsonl → pre každý term uloží DF, IDF pre TF-IDF aj BM25
+    # načítam idf.jsonl(.gz) → pre každý term uloží DF, IDF pre TF-IDF aj BM25
     idf = {}
-    with path.open("r", encoding="utf-8") as f:
+    with _open_jsonl(path) as f:
         for line in f:
-            obj = json.loads(line)
+            obj = orjson.loads(line)
             idf[obj["term"]] = {
                 "df": float(obj["df"]),              # počet dokumentov obsahujúcich term
                 "idf_logN": float(obj["idf_logN"]),  # klasický logaritmický IDF
                 "idf_bm25": float(obj["idf_bm25"]),  # upravený IDF pre BM25
             }
+            if "ub_bm25" in obj:                     # horné odhady skóre termu (len novšie indexy)
+                idf[obj["term"]]["ub_tfidf"] = float(obj["ub_tfidf"])
+                idf[obj["term"]]["ub_bm25"] = float(obj["ub_bm25"])
     return idf
 
 def load_meta(path: Path):
-    # načítam meta.json → obsahuje celkové štatistiky a metadáta dokumentov
-    meta_json = json.loads(path.read_text(encoding="utf-8"))
+    # načítam meta.json → obsahuje celkové štatistiky (staršie buildy aj dĺžky a metadáta dokumentov)
+    # orjson je rýchlejší parser ako json; pri novom formáte dĺžky doskladám z doclen.bin
+    # meta (url, názov) sa tu neparsuje – vrátim meta_json a doc_id v poradí súboru pre load_doc_meta
+    meta_json = orjson.loads(path.read_bytes())
     N = int(meta_json["N"])  # počet dokumentov
     avgdl = float(meta_json["avgdl"])  # priemerná dĺžka dokumentov
-    doclen = {k: int(v) for k, v in meta_json["doclen"].items()}  # dĺžky dokumentov
-    meta = meta_json["meta"]  # info o lieku (názov, url)
-    return N, avgdl, doclen, meta
+    if "doclen" in meta_json:
+        doclen = {k: int(v) for k, v in meta_json["doclen"].items()}  # dĺžky dokumentov
+    else:
+        doc_ids = (path.parent / "docids.bin").read_bytes().decode("utf-8").split("\n") if N else []
+        dl = load_doclen_bin(path.parent)
+        if dl is None or len(dl) != len(doc_ids):
+            raise SystemExit(f"[ERR] Chýba doclen.bin (alebo nesedí s docids.bin) a meta.json nemá doclen: {path.parent}")
+        doclen = dict(zip(doc_ids, dl.tolist()))
+    return N, avgdl, doclen, meta_json, list(doclen)
+
+def load_doc_meta(index_dir: Path, meta_json, doc_ids, idxs):
+    # meta (url, názov lieku) len pre dokumenty s indexmi idxs – z docmeta.jsonl sa parsujú len ich riadky
+    if "meta" in meta_json:
+        return {doc_ids[i]: meta_json["meta"].get(doc_ids[i], {}) for i in idxs}
+    lines = (index_dir / "docmeta.jsonl").read_bytes().split(b"\n")
+    return {doc_ids[i]: orjson.loads(lines[i]) for i in idxs}
+
+
+def load_binary_index(index_dir: Path):
+    # načítam binárny index z indexera: term -> (offset, df, idf_logN, idf_bm25, ub_tfidf, ub_bm25, poradie),
+    # postings cez mmap a zoznam doc_id; žiadny JSON – len jeden dict nad názvami termov
+    # pri inej verzii terms.bin vrátim None (searcher použije JSON súbory)
+    raw = (index_dir / "terms.bin").read_bytes()
+    n = int.from_bytes(raw[:4], "little")
+    if int.from_bytes(raw[4:8], "little") != TERMS_BIN_VERSION:
+        return None
+    idf_log = np.frombuffer(raw, dtype="<f8", count=n, offset=8)
+    idf_bm = np.frombuffer(raw, dtype="<f8", count=n, offset=8 + 8 * n)
+    ub_tfidf = np.frombuffer(raw, dtype="<f8", count=n, offset=8 + 16 * n)
+    ub_bm25 = np.frombuffer(raw, dtype="<f8", count=n, offset=8 + 24 * n)
+    dfs = np.frombuffer(raw, dtype="<u4", count=n, offset=8 + 32 * n).astype(np.int64)
+    names = raw[8 + 36 * n:].decode("utf-8").split("\n") if n else []
+    offsets = np.zeros(n, dtype=np.int64)          # term má v postings 2*df čísel (doc indexy, potom tf)
+    np.cumsum(2 * dfs[:-1], out=offsets[1:])
+    terms = dict(zip(names, zip(offsets.tolist(), dfs.tolist(), idf_log.tolist(), idf_bm.tolist(),
+                                ub_tfidf.tolist(), ub_bm25.tolist(), range(n))))
+
+    postings_path = index_dir / "postings.bin"
+    if not postings_path.exists():
+        postings = None                               # len komprimované postings.pfor (build_packed.py)
+    elif postings_path.stat().st_size:
+        postings = np.memmap(postings_path, dtype="<u4", mode="r")
+    else:
+        postings = np.empty(0, dtype="<u4")           # prázdny index – mmap prázdneho súboru nejde
+    doc_ids = (index_dir / "docids.bin").read_bytes().decode("utf-8").split("\n")
+    return terms, postings, doc_ids
+
+def load_doclen_bin(index_dir: Path):
+    # dĺžky dokumentov z doclen.bin (uint16/uint32 v poradí docids.bin) – malé celočíselné pole namiesto
+    # float64 z doclen dict-u; skóre vyjdú rovnako (dĺžky sú celé čísla), None ak súbor nie je (starší build)
+    path = index_dir / "doclen.bin"
+    if not path.exists():
+        return None
+    raw = path.read_bytes()
+    width = int.from_bytes(raw[:4], "little")
+    return np.frombuffer(raw, dtype="<u2" if width == 2 else "<u4", offset=4)
 
 
 # ============
 # výber dokumentov, v ktorých sa nachádzajú moje hladané termy v dopyte
 
-def candidate_docs_SOFT(terms: List[str], inv_index: Dict[str, Dict[str, int]]) -> Set[str]:
+def candidate_docs_SOFT(terms: List[str], inv_index: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
     # vrátim všetky dokumenty, ktoré obsahujú všetky z dotazových termov (ak nie su žiadne take dokuemnty tak vráti tie, kde ich je čo najvoac)
-    cand = set()
-    for t in dict.fromkeys(terms):
-        cand |= set(inv_index.get(t, {}).keys())  # union všetkých dokumentov
-    return cand
-
+    # (nad binárnym indexom sa kandidáti netvoria vôbec – skóre sa sčítava rovno do poľa podľa int doc indexov)
+    # union celočíselných indexov dokumentov naraz cez numpy -> zoradené pole
+    lists = [inv_index[t][0] for t in dict.fromkeys(terms) if t in inv_index]
+    if not lists:
+        return np.empty(0, dtype=np.uint32)
+    return np.unique(np.concatenate(lists))
 
 # ============
-# výpočet skóre – TF-IDF alevo BM25
-def tfidf_score(query_terms, doc_id, inv_index, idf_table):
-    # vypočítam TF-IDF skóre pre dokument podľa dotazu
-    score = 0.0
-    seen = set()
-    for t in query_terms:
-        if t in seen:  # ak už term bol spracovaný, preskočím ho
-            continue
-        seen.add(t)
-        plist = inv_index.get(t)  # postings list pre term
-        if not plist:
-            continue
-        tf = plist.get(doc_id, 0)  # term frequency pre daný dokument
-        if tf <= 0:
-            continue
-        idf = idf_table.get(t, {}).get("idf_logN", 0.0)  # IDF pre TF-IDF
-        tf_w = 1.0 + math.log(tf)  # váženie logaritmom TF
-        score += tf_w * idf        # súčet príspevkov jednotlivých termov
-    return score
-
-def bm25_score(query_terms, doc_id, inv_index, idf_table, doclen, avgdl, k1=1.2, b=0.75):
-    # vypočítam BM25 skóre pre dokument podľa dotazu
-    dl = doclen.get(doc_id, 0)  # dĺžka dokumentu
-    if dl <= 0:
-        return 0.0
-
-    score = 0.0
-    seen = set()
-    for t in query_terms:
-        if t in seen:
+# výpočet skóre – TF-IDF alebo BM25
+# TF-IDF: (1 + log tf) * idf_logN
+# BM25:   idf_bm25 * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)), prázdny dokument má skóre 0
+
+def length_norms(dl, avgdl, b=BM25_B) -> np.ndarray:
+    # BM25 normalizácia dĺžky (1 - b + b * dl/avgdl) závisí len od dokumentu – spočítam ju raz pre všetky
+    # prázdny dokument dostane inf, jeho príspevok potom vyjde 0
+    norm = avgdl if avgdl > 0 else 1.0
+    d = np.asarray(dl, dtype=np.float64)
+    return np.where(d > 0, 1 - b + b * (d / norm), np.inf)
+
+def _add_term_scores(scores, pos, tf, ln, idf, method, k1):
+    # pripočítam príspevok jedného termu dokumentom na pozíciách pos (tf a normalizácie dĺžky ln sú zarovnané s pos)
+    # vzorce TF-IDF / BM25 vyššie, naraz pre celé pole
+    if method == "bm25":
+        scores[pos] += idf * (tf * (k1 + 1)) / (tf + k1 * ln)
+    else:
+        scores[pos] += (1.0 + np.log(tf)) * idf
+
+def _score_kernel(off, df, lo, hi, idf, postings, len_norm, k1, bm25, alive, scores):
+    # jeden prechod cez postings termu (pozície lo..hi) bez dočasných polí, dokumenty mimo alive preskočím
+    # (rovnaké poradie operácií ako v _add_term_scores, aby skóre sedeli presne)
+    for i in range(lo, hi):
+        doc = postings[off + i]
+        if not alive[doc]:
             continue
-        seen.add(t)
+        tf = float(postings[off + df + i])
+        if bm25:
+            scores[doc] += idf * (tf * (k1 + 1)) / (tf + k1 * len_norm[doc])
+        else:
+            scores[doc] += (1.0 + math.log(tf)) * idf
+
+if njit is not None:
+    # skompiluje sa pri prvom volaní, potom z cache na disku; nogil – vlákna bežia naozaj paralelne
+    _score_kernel = njit(cache=True, nogil=True)(_score_kernel)
+
+_pool = None
+
+def _score_term(off, df, idf, postings, len_norm, k1, bm25, alive, scores):
+    # dlhé postings rozdelím medzi vlákna – doc indexy termu sú unikátne, takže kúsky píšu do rôznych dokumentov
+    global _pool
+    parts = min(SCORE_THREADS, df // PARALLEL_MIN_DF)
+    if parts < 2:
+        _score_kernel(off, df, 0, df, idf, postings, len_norm, k1, bm25, alive, scores)
+        return
+    if _pool is None:
+        _pool = ThreadPoolExecutor(SCORE_THREADS)
+    bounds = np.linspace(0, df, parts + 1).astype(np.int64).tolist()
+    list(_pool.map(lambda lo, hi: _score_kernel(off, df, lo, hi, idf, postings, len_norm, k1, bm25, alive, scores),
+                   bounds[:-1], bounds[1:]))
+
+def _maxscore_alive(scores: np.ndarray, rest_ub: float, topk: int):
+    # MaxScore: theta = aktuálne k-te najlepšie skóre; dokument, ktorému ani všetky zvyšné termy (súčet ich
+    # horných odhadov rest_ub) nepomôžu dosiahnuť theta, sa do top-k nedostane -> ďalej ho nepočítam
+    # vráti masku dokumentov, ktoré ešte treba počítať, alebo None (orezať sa zatiaľ nedá)
+    theta = -np.partition(-scores, topk - 1)[topk - 1] if len(scores) >= topk else 0.0
+    rest = rest_ub * (1 + UB_SLACK)
+    if rest >= theta:
+        return None            # aj úplne nový dokument by sa ešte mohol dostať do top-k
+    return scores + rest >= theta
+
+def _prune_order(entries, ub_i, topk, bm25, k1, b):
+    # termy zoradím od najväčšieho horného odhadu a pre každý spočítam súčet odhadov termov za ním
+    # (orezávam len pre default k1, b – pre tie sú odhady z indexera spočítané)
+    if topk <= 0 or len(entries) < 2 or (bm25 and (k1, b) != (BM25_K1, BM25_B)):
+        return entries, None
+    entries = sorted(entries, key=lambda e: e[ub_i], reverse=True)
+    rest = [0.0] * (len(entries) + 1)
+    for j in range(len(entries) - 1, -1, -1):
+        rest[j] = rest[j + 1] + entries[j][ub_i]
+    return entries, rest
+
+def _top_set(scores: np.ndarray, topk: int) -> np.ndarray:
+    # dokumenty, ktoré sú v top-k alebo tesne pri jeho hranici – tým po orezávaní prepočítam presné skóre
+    # (termy sa sčítali v inom poradí, takže skóre sa môže líšiť v posledných bitoch)
+    if len(scores) == 0:
+        return np.flatnonzero(scores)
+    theta = -np.partition(-scores, min(topk, len(scores)) - 1)[min(topk, len(scores)) - 1]
+    return np.flatnonzero((scores > 0) & (scores >= theta * (1 - UB_SLACK)))
+
+def score_binary(query_terms, terms, postings, dl, avgdl, method="bm25", k1=BM25_K1, b=BM25_B, topk=0,
+                 len_norm=None) -> np.ndarray:
+    # skóre pre všetky dokumenty nad binárnym indexom, term po terme
+    # pri topk > 0 preskakujem dokumenty, ktoré sa už do top-k dostať nemôžu (MaxScore) – ich skóre ostane neúplné
+    # len_norm = length_norms(dl, avgdl, b) – pri viacerých dopytoch ho stačí spočítať raz a podať sem
+    scores = np.zeros(len(dl), dtype=np.float64)
+    bm25 = method == "bm25"
+    if len_norm is None:
+        len_norm = length_norms(dl, avgdl, b) if bm25 else np.empty(0, dtype=np.float64)
+    idf_i, ub_i = (3, 5) if bm25 else (2, 4)
+    query_entries = [terms[t] for t in dict.fromkeys(query_terms) if t in terms]
+    entries, rest = _prune_order(query_entries, ub_i, topk, bm25, k1, b)
+    alive = None
+    if njit is not None:
+        alive = np.ones(len(dl), dtype=np.bool_)
+        postings = np.asarray(postings)
+    for j, e in enumerate(entries):
+        off, df, idf = e[0], e[1], e[idf_i]
+        if njit is not None:
+            _score_term(off, df, idf, postings, len_norm, k1, bm25, alive, scores)
+        else:
+            # bez numby: postings termu spracujem vektorovo (numpy)
+            ids = postings[off:off + df]
+            tf = postings[off + df:off + 2 * df].astype(np.float64)
+            if alive is not None:
+                keep = alive[ids]
+                ids, tf = ids[keep], tf[keep]
+            _add_term_scores(scores, ids, tf, len_norm[ids] if bm25 else None, idf, method, k1)
+        if rest is not None and j + 1 < len(entries):
+            mask = _maxscore_alive(scores, rest[j + 1], topk)
+            if mask is not None:
+                alive = mask
+    if rest is not None:
+        # top-k prepočítam v pôvodnom poradí termov (postings sú zoradené podľa doc indexu -> searchsorted)
+        top = _top_set(scores, topk)
+        exact = np.zeros(len(top), dtype=np.float64)
+        for e in query_entries:
+            off, df = e[0], e[1]
+            ids = postings[off:off + df]
+            at = np.minimum(np.searchsorted(ids, top), max(df - 1, 0))
+            hit = np.flatnonzero(ids[at] == top)
+            tf = postings[off + df + at[hit]].astype(np.float64)
+            _add_term_scores(exact, hit, tf, len_norm[top[hit]] if bm25 else None, e[idf_i], method, k1)
+        scores[top] = exact
+    return scores
+
+def score_candidates(query_terms, cand, inv_index, idf_table, dl, avgdl, method="bm25",
+                     k1=BM25_K1, b=BM25_B, topk=0) -> np.ndarray:
+    # skóre pre všetkých kandidátov naraz nad JSON indexom (cand = zoradené indexy dokumentov kandidátov,
+    # dl = dĺžky všetkých dokumentov podľa indexu); každý dokument z postings termu je v cand, pozícia sa nájde vždy
+    scores = np.zeros(len(cand), dtype=np.float64)
+    bm25 = method == "bm25"
+    len_norm = length_norms(dl[cand], avgdl, b)
+    idf_key, ub_key = ("idf_bm25", "ub_bm25") if bm25 else ("idf_logN", "ub_tfidf")
+    entries = []
+    for t in dict.fromkeys(query_terms):
         plist = inv_index.get(t)
-        if not plist:
+        if plist is not None and len(plist[0]):
+            row = idf_table.get(t, {})
+            entries.append((plist, row.get(idf_key, 0.0), row.get(ub_key)))
+    # horné odhady sú len v indexoch z novších buildov; ak niektorý chýba, neorezávam
+    if any(ub is None for _, _, ub in entries):
+        topk = 0
+    query_entries = entries
+    entries, rest = _prune_order(entries, 2, topk, bm25, k1, b)
+    alive = None
+    for j, ((ids, tfs), idf, _) in enumerate(entries):
+        pos = np.searchsorted(cand, ids)
+        tf = tfs.astype(np.float64)
+        keep = tf > 0
+        if alive is not None:
+            keep &= alive[pos]
+        if not keep.all():
+            pos, tf = pos[keep], tf[keep]
+        _add_term_scores(scores, pos, tf, len_norm[pos], idf, method, k1)
+        if rest is not None and j + 1 < len(entries):
+            mask = _maxscore_alive(scores, rest[j + 1], topk)
+            if mask is not None:
+                alive = mask
+    if rest is not None:
+        # top-k prepočítam v pôvodnom poradí termov, aby skóre sedeli presne
+        top = _top_set(scores, topk)
+        docs = cand[top]
+        exact = np.zeros(len(top), dtype=np.float64)
+        for (ids, tfs), idf, _ in query_entries:
+            at = np.minimum(np.searchsorted(ids, docs), len(ids) - 1)
+            tf = np.where(ids[at] == docs, tfs[at], 0).astype(np.float64)
+            hit = np.flatnonzero(tf > 0)
+            _add_term_scores(exact, hit, tf[hit], len_norm[top[hit]], idf, method, k1)
+        scores[top] = exact
+    return scores
+
+def gather_postings(query_terms, terms, get_postings):
+    # z postings.pfor rozbalím len termy dopytu do jedného malého poľa v rovnakom tvare ako postings.bin
+    # (doc indexy, potom tf) a offsety termov prepíšem naň – score_binary potom funguje bez zmeny
+    sub_terms = {}
+    chunks = []
+    off = 0
+    for t in dict.fromkeys(query_terms):
+        e = terms.get(t)
+        if e is None:
             continue
-        tf = plist.get(doc_id, 0)  # term frequency
-        if tf <= 0:
-            continue
-        idf = idf_table.get(t, {}).get("idf_bm25", 0.0)  # IDF pre BM25
-        denom = tf + k1 * (1 - b + b * (dl / (avgdl if avgdl > 0 else 1.0)))  # normalizácia podľa dĺžky
-        score += idf * (tf * (k1 + 1)) / (denom if denom != 0 else 1.0)  # hlavný BM25 vzorec
-    return score
+        ids, tf = get_postings(t)
+        sub_terms[t] = (off,) + e[1:]
+        chunks += (ids, tf)
+        off += 2 * e[1]
+    postings = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint32)
+    return sub_terms, postings
+
+def top_k(scores: np.ndarray, topk: int) -> np.ndarray:
+    # indexy najlepších topk dokumentov so skóre > 0 (najvyššie prvé, pri rovnosti nižší index)
+    # k-te najvyššie skóre nájdem cez partition v O(n), celé pole netriedim
+    hits = np.flatnonzero(scores > 0)
+    if topk <= 0:
+        return hits[:0]
+    if len(hits) > topk:
+        s = scores[hits]
+        kth = -np.partition(-s, topk - 1)[topk - 1]
+        above = hits[s > kth]
+        hits = np.concatenate((above, hits[s == kth][:topk - len(above)]))   # pri rovnosti beriem nižšie indexy
+    return hits[np.lexsort((hits, -scores[hits]))]
 
 
 # ============
 # hlavná funkcia na vyhľadávanie
 
-def search(query, index_dir, method="bm25", topk=5):
-    # vyhľadám relevantné dokumenty podľa dotazu pomocou Boolean logiky
-    inv_path = index_dir / "inverted_index.jsonl"
-    idf_path = index_dir / "idf.jsonl"
+def search_batch(queries: List[str], index_dir, method="bm25", topk=5):
+    # viac dopytov naraz: index a meta načítam raz, postings každého termu rozbalím len raz pre všetky dopyty
+    # (skóre každého dopytu sa ale sčítava v jeho vlastnom poradí termov – vyjde rovnako ako pri search())
+    # vráti ([výsledky pre každý dopyt v poradí queries], meta)
+    # duplicitné termy dopytu vyhodím raz tu (poradie ostane), skórovanie ich už nerieši pre každý dokument
+    q_terms = [list(dict.fromkeys(tokenize(q))) for q in queries]
+    # dopyty s rovnakými termami idú za sebou – ich postings sú ešte v cache
+    order = sorted(range(len(queries)), key=lambda i: sorted(set(q_terms[i])))
+    results: List[List[Tuple[str, float]]] = [[] for _ in queries]
+
+    if all((index_dir / name).exists() for name in ("terms.bin", "docids.bin", "meta.json")) and \
+            ((index_dir / "postings.bin").exists() or (index_dir / PFOR_NAME).exists()):
+        # binárny index (nové buildy indexera) – bez parsovania JSON-u
+        binary = load_binary_index(index_dir)
+        get_postings = load_packed_postings(index_dir, binary[0]) if binary is not None else None
+        if binary is not None and (get_postings is not None or binary[1] is not None):
+            terms, postings, doc_ids = binary
+            # termy, ktoré v indexe nie sú, vyhodím hneď – dopyt bez známych termov sa ani neskóruje
+            q_terms = [[t for t in qt if t in terms] for qt in q_terms]
+            if get_postings is not None:
+                # termy všetkých dopytov naraz -> každý term sa dekóduje raz
+                terms, postings = gather_postings([t for qt in q_terms for t in qt], terms, get_postings)
+            meta_json = orjson.loads((index_dir / "meta.json").read_bytes())
+            avgdl = float(meta_json["avgdl"])
+            dl = load_doclen_bin(index_dir)
+            if dl is None or len(dl) != len(doc_ids):
+                # staré buildy majú dĺžky v meta.json, nové len v doclen.bin
+                doclen = meta_json.get("doclen")
+                if doclen is None:
+                    raise SystemExit(f"[ERR] Chýba doclen.bin (alebo nesedí s docids.bin) a meta.json nemá doclen: {index_dir}")
+                dl = np.array([doclen.get(did, 0) for did in doc_ids], dtype=np.float64)
+            len_norm = length_norms(dl, avgdl) if method == "bm25" else None   # raz pre celú dávku
+            hits = []
+            for qi in order:
+                if not q_terms[qi]:
+                    continue
+                scores = score_binary(q_terms[qi], terms, postings, dl, avgdl, method, topk=topk, len_norm=len_norm)
+                top = top_k(scores, topk)
+                results[qi] = [(doc_ids[i], float(scores[i])) for i in top]
+                hits += top.tolist()
+            # meta (url, názov) načítam až teraz a len pre nájdené dokumenty
+            return results, load_doc_meta(index_dir, meta_json, doc_ids, hits)
+
+    inv_path = _index_file(index_dir, "inverted_index.jsonl")
+    idf_path = _index_file(index_dir, "idf.jsonl")
     meta_path = index_dir / "meta.json"
 
     # skontrolujem, či všetky súbory existujú
@@ -123,43 +428,59 @@ def search(query, index_dir, method="bm25", topk=5):
         raise SystemExit("[ERR] Chýbajú indexové súbory")
 
     # načítanie dát
-    inv_index = load_inverted_index(inv_path)
+    N, avgdl, doclen, meta_json, file_ids = load_meta(meta_path)
+    # dokumenty očíslujem v poradí doc_id – pri rovnakom skóre potom vyhrá menšie doc_id
+    doc_ids = sorted(doclen)
+    inv_index = load_inverted_index(inv_path, {did: i for i, did in enumerate(doc_ids)})
     idf_table = load_idf_table(idf_path)
-    N, avgdl, doclen, meta = load_meta(meta_path)
+    dl = np.fromiter((doclen[did] for did in doc_ids), dtype=np.float64, count=len(doc_ids))
+
+    for qi in order:
+        # termy mimo indexu vyhodím hneď, dopyt bez známych termov nemá výsledky
+        q_terms[qi] = [t for t in q_terms[qi] if t in inv_index]
+        if not q_terms[qi]:
+            continue
 
-    # tokenizácia dotazu
-    q_terms = tokenize(query)
+        # výber kandidátov
+        cand = candidate_docs_SOFT(q_terms[qi], inv_index)
+        if not len(cand):
+            continue
 
-    # výber kandidátov
-    candidates = candidate_docs_SOFT(q_terms, inv_index)
-    if not candidates:
-        return [], meta
+        # výpočet skóre podľa zvolenej metódy – pre všetkých kandidátov naraz (numpy)
+        scores = score_candidates(q_terms[qi], cand, inv_index, idf_table, dl, avgdl, method, topk=topk)
 
-    # výpočet skóre podľa zvolenej metódy
-    scored = []
-    if method == "bm25":
-        for did in candidates:
-            s = bm25_score(q_terms, did, inv_index, idf_table, doclen, avgdl)
-            if s > 0:
-                scored.append((did, s))
-    else:  # TF-IDF
-        for did in candidates:
-            s = tfidf_score(q_terms, did, inv_index, idf_table)
-            if s > 0:
-                scored.append((did, s))
+        # najlepších topk podľa skóre (najvyššie prvé); skóre orezaných dokumentov sú neúplné, ale tie v top-k nie sú
+        results[qi] = [(doc_ids[cand[i]], float(scores[i])) for i in top_k(scores, topk)]
+    # meta (url, názov) len pre nájdené dokumenty – indexy podľa poradia v docids.bin / meta.json
+    pos = {did: i for i, did in enumerate(file_ids)}
+    return results, load_doc_meta(index_dir, meta_json, file_ids, [pos[did] for res in results for did, _ in res])
+
+def search(query, index_dir, method="bm25", topk=5):
+    # vyhľadám relevantné dokumenty podľa dotazu pomocou Boolean logiky
+    results, meta = search_batch([query], index_dir, method, topk)
+    return results[0], meta
 
-    # zoradenie podľa skóre (najvyššie prvé)
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored[:topk], meta
 
+def print_results(results, meta, method):
+    # ak sa nič nenašlo
+    if not results:
+        print("Žiadne výsledky (žiadny dokument neobsahuje ani jeden term).")
+        return
 
+    # výpis výsledkov
+    print(f"\nTOP {len(results)} výsledkov  (metóda: {method})  [Soft Boolean]:")
+    for i, (did, score) in enumerate(results, start=1):
+        m = meta.get(did, {})
+        print(f"{i:>2}. doc_id={did} | {m.get('drug_name','(unknown)')} | {m.get('url','-')} | score={score:.4f}")
 
 def main():
     """Spúšťa vyhľadávanie cez príkazový riadok."""
     parser = argparse.ArgumentParser(
         description="Soft Boolean vyhľadávanie (union kandidátov) s BM25 alebo TF-IDF."
     )
-    parser.add_argument("query", type=str, help='Prirodzený dotaz, napr. "treatment for crohn disease"')
+    parser.add_argument("query", type=str, nargs="?", help='Prirodzený dotaz, napr. "treatment for crohn disease"')
+    parser.add_argument("--queries", type=Path, default=None,
+                        help="Súbor s dopytmi (jeden na riadok) – spracujú sa naraz.")
     parser.add_argument("--index-dir", type=Path, default=Path("data/index"),
                         help="Priečinok s indexovými súbormi.")
     parser.add_argument("--method", choices=["bm25", "tfidf"], default="bm25",
@@ -168,19 +489,20 @@ def main():
 
     args = parser.parse_args()  # načítanie argumentov z CLI
 
-    # spustenie vyhľadávania
-    results, meta = search(args.query, args.index_dir, args.method, args.topk)
-
-    # ak sa nič nenašlo
-    if not results:
-        print("Žiadne výsledky (žiadny dokument neobsahuje ani jeden term).")
+    if args.queries is not None:
+        # dávkový režim: prázdne riadky preskočím, výsledky vypíšem v poradí zo súboru
+        queries = [q.strip() for q in args.queries.read_text(encoding="utf-8").splitlines() if q.strip()]
+        all_results, meta = search_batch(queries, args.index_dir, args.method, args.topk)
+        for q, results in zip(queries, all_results):
+            print(f"\n=== {q}")
+            print_results(results, meta, args.method)
         return
+    if args.query is None:
+        parser.error("zadaj dopyt alebo --queries")
 
-    # výpis výsledkov
-    print(f"\nTOP {len(results)} výsledkov  (metóda: {args.method})  [Soft Boolean]:")
-    for i, (did, score) in enumerate(results, start=1):
-        m = meta.get(did, {})
-        print(f"{i:>2}. doc_id={did} | {m.get('drug_name','(unknown)')} | {m.get('url','-')} | score={score:.4f}")
+    # spustenie vyhľadávania
+    results, meta = search(args.query, args.index_dir, args.method, args.topk)
+    print_results(results, meta, args.method)
 
 # Spustenie hlavnej funkcie pri priamom spustení skriptu
 if __name__ == "__main__":
@@ -2,9 +2,15 @@ import os
 import sys
 import re
 import html
-from typing import Optional
+from typing import Optional, Tuple
 from urllib.parse import quote
 
+try:
+    import numpy as np
+    from numba import njit      # voliteľné – hľadanie konca infoboxu v skompilovanej slučke
+except ImportError:
+    njit = None
+
 
 
 # Nastavenie prostredia pre Spark na Windows
@@ -21,45 +27,89 @@ os.environ.setdefault("PYARROW_IGNORE_TIMEZONE", "1")
 
 from pyspark.sql import SparkSession, Row, functions as F
 from pyspark import StorageLevel
-from pyspark.sql import Window
+from pyspark.sql.types import StructType, StructField, StringType, BooleanType
+import pandas as pd
 
 # Cesty k dátam
 EXTRACTED_CSV      = "data/csv/extracted.csv"        # CSV z 1. zadania (Drugs.com extrakcia)
 WIKI_DUMPS_PATTERN = "data/wiki/*.bz2"               # Wiki XML dumpy
 OUT_TSV_DIR        = "data/join/drugs_wiki_join"     # Výstupný adresár pre joinnuté TSV
 
-# Regexy na parsovanie Wiki <page> blokov
-# <title>...</title> – názov článku
-TITLE_RE   = re.compile(r"<title>(.*?)</title>", re.S)
-# <text ...>...</text> – hlavný wikitext článku
-TEXT_RE    = re.compile(r"<text[^>]*>(.*?)</text>", re.S)
-# <redirect title="..."> – redirect stránky
-REDIR_RE   = re.compile(r'<redirect[^>]*title="([^"]+)"')
+# Wiki <page> bloky číta spark-xml priamo v JVM (rowTag="page"), každá stránka príde ako štruktúrovaný záznam
+SPARK_XML_PACKAGE   = "com.databricks:spark-xml_2.12:0.18.0"
+MAX_PARTITION_BYTES = "64m"                          # menšie kusy vstupu -> viac paralelných taskov
+BROADCAST_JOIN_THRESHOLD = "64m"                     # do tejto veľkosti Spark tabuľku pri joine broadcastuje
+SPLIT_MAX_BYTES     = 64 * 1024 * 1024               # najväčší kus .bz2 dumpu na jeden task (Hadoop input format)
+
+# schému zadám ručne – inferencia by musela prečítať celé dumpy; beriem len polia, ktoré potrebujem
+# <title>, <redirect title="..."> (atribút -> _title) a <revision><text ...>wikitext</text> (obsah -> _VALUE)
+PAGE_SCHEMA = StructType([
+    StructField("title", StringType()),
+    StructField("redirect", StructType([StructField("_title", StringType())])),
+    StructField("revision", StructType([
+        StructField("text", StructType([StructField("_VALUE", StringType())])),
+    ])),
+])
+
+# schéma df_wiki (stĺpce Row z parse_page) – stránky idú z Pythonu späť do JVM ako Arrow dávky cez mapInPandas
+WIKI_SCHEMA = StructType(
+    [StructField(name, StringType()) for name in ("wiki_title", "title_norm", "wiki_url")]
+    + [StructField(name, BooleanType()) for name in ("wiki_has_infobox", "wiki_has_atc")]
+    + [StructField(name, StringType()) for name in (
+        "wiki_summary", "wiki_tradename", "wiki_synonyms", "wiki_routes", "wiki_atc",
+        "wiki_half_life", "wiki_cas", "wiki_legal_status", "wiki_pregnancy",
+    )]
+)
 
 #--------------------------------------------
 # Pomocné funkcie na čistenie a spracovanie textu
 
+# regexy pre clean_val, skompilované raz (nie re.sub so stringom pri každom volaní)
+# HTML komentáre <!-- ... --> a <ref>...</ref> citácie (často obsahujú zdroje, nie samotnú hodnotu) idú v jednom prechode
+# šablóny a tagy zvlášť a v pôvodnom poradí – napr. {{ubl|A<ref>{{cite ...}}</ref>}} sa zmaže celá až po odstránení citácie
+# vnútro komentára/citácie je "unrolled loop": úseky bez '-' / '<' idú naraz, lookahead len pri tom znaku
+# (namiesto lazy .*?, ktoré skúša koniec po každom znaku – pri neuzavretom <ref name=x /> až po koniec textu)
+# (?=(X))\1 je atomická skupina (re v Pythone < 3.11 nemá (?>X)) – úsek sa pri neúspechu už nevracia po znakoch
+# zhodujú sa presne s <!--.*?--> a <ref[^>]*>.*?</ref>
+CLEAN_COMMENT_REF_RE = re.compile(
+    r"<!--(?=([^-]*))\1(?:-(?!->)(?=([^-]*))\2)*-->"
+    r"|<ref(?=([^>]*))\3>(?=([^<]*))\4(?:<(?!/ref>)(?=([^<]*))\5)*</ref>"
+)
+TEMPLATE_RE          = re.compile(r"\{\{[^{}]*\}\}")
+HTML_TAG_RE          = re.compile(r"<[^>]+>")
+WHITESPACE_RE        = re.compile(r"\s+")
+
+# začiatok infoboxu (Infobox drug / Drugbox / Chembox / ...) – rovnaký pre odstránenie aj extrakciu tela
+INFOBOX_START_RE = re.compile(
+    r"\{\{\s*(infobox\s*drug|drugbox|chembox|infobox\s*chemical|infobox\s*enzyme|infobox\s*anatomy)\b",
+    re.I,
+)
+# sekcie za popisom lieku a hranica odstavcov (prázdny riadok)
+SECTION_SPLIT_RE   = re.compile(r"\n==\s*(References|See also|External links|Further reading)\s*==")
+PARAGRAPH_SPLIT_RE = re.compile(r"\n\s*\n")
+# otváracie a zatváracie zátvorky šablón pri hľadaní konca infoboxu
+BRACES_RE          = re.compile(r"\{\{|\}\}")
+
 def clean_val(s: str, *, drop_markers: bool = True) -> str:
     # vyčistím hodnotu z infoboxu alebo wikitextu
     if not s:
         return ""
 
-    # prevedenie HTML entít na obyčajné znaky
-    s = html.unescape(s)
-    # HTML komentáre <!-- ... -->
-    s = re.sub(r"<!--.*?-->", " ", s, flags=re.S)
-    # <ref>...</ref> citácie – často obsahujú zdroje, nie samotnú hodnotu
-    s = re.sub(r"<ref[^>]*>.*?</ref>", " ", s, flags=re.S)
+    # prevedenie HTML entít na obyčajné znaky (bez '&' tam žiadna entita nie je)
+    if "&" in s:
+        s = html.unescape(s)
+    # komentáre a citácie -> medzera
+    s = CLEAN_COMMENT_REF_RE.sub(" ", s)
     # Šablóny {{...}} – jednoduché odstránenie bez rekurzívneho parsovania
-    s = re.sub(r"\{\{[^{}]*\}\}", " ", s)
+    s = TEMPLATE_RE.sub(" ", s)
     # Wikilinky [[ ... ]] – odstránim hranaté zátvorky ale vnútorný text nechám
     s = s.replace("[[", "").replace("]]", "")
     # formátovanie '''bold''' a ''italic''
     s = s.replace("'''", "").replace("''", "")
     # HTML tagy (napr. <b>, <i>, <span>, <sup>, ...)
-    s = re.sub(r"<[^>]+>", " ", s)
+    s = HTML_TAG_RE.sub(" ", s)
     # normalizujem whitespace (všetky medzery, tab, newline -> jedna medzera)
-    s = re.sub(r"\s+", " ", s).strip()
+    s = WHITESPACE_RE.sub(" ", s).strip()
 
     if drop_markers:
         # pre typické marker hodnoty vrátime prázdny string
@@ -70,108 +120,104 @@ def clean_val(s: str, *, drop_markers: bool = True) -> str:
     return s
 
 
-def remove_infobox_from_text(wt: str) -> str:
-    # z wikitextu odstránim celý infobox (Infobox drug / Drugbox / Chembox / ...),ktorý je na začiatku článku
+def _match_braces(codes, start):
+    # koniec šablóny začínajúcej na start: po znakoch zľava, {{ zvýši a }} zníži hĺbku; -1 ak sa nezavrie
+    # codes = kódy znakov textu (u32), takže indexy sedia s indexami v str
+    depth = 0
+    i = start
+    n = len(codes)
+    while i < n - 1:
+        if codes[i] == 123 and codes[i + 1] == 123:        # {{
+            depth += 1
+            i += 2
+            continue
+        if codes[i] == 125 and codes[i + 1] == 125:        # }}
+            depth -= 1
+            i += 2
+            if depth <= 0:
+                return i
+            continue
+        i += 1
+    return -1
+
+if njit is not None:
+    _match_braces = njit(cache=True)(_match_braces)      # skompilovaná slučka namiesto Python prechodu po tokenoch
+
+
+def locate_infobox(wt: str) -> Optional[Tuple[int, int]]:
+    # nájdem infobox (Infobox drug / Drugbox / Chembox / ...), ktorý je na začiatku článku, a vrátim (začiatok, koniec)
+    # počítam naň raz za stránku – odstránenie z textu aj extrakcia tela infoboxu dostanú hotový rozsah
     if not wt:
-        return ""
+        return None
 
     # nájdem začiatok konkrétnych typov infoboxov
-    m = re.search(
-        r"\{\{\s*(infobox\s*drug|drugbox|chembox|infobox\s*chemical|infobox\s*enzyme|infobox\s*anatomy)\b",
-        wt,
-        flags=re.I,
-    )
+    m = INFOBOX_START_RE.search(wt)
     if not m:
-        # ak žiadny infobox nenajdem – vrátim pôvodný text
-        return wt
+        return None
 
     start = m.start()
-    text = wt[start:]
 
     # počítadlo hĺbky vnorených {{ }}  - v niektorých infoboxoch sa nachádzalo viacero vnorení, ktoré mi potom robili problém
+    if njit is not None:
+        # s numbou: text ako pole kódov znakov (utf-32, index = index v str) a slučka _match_braces
+        end = _match_braces(np.frombuffer(wt[start:].encode("utf-32-le", "surrogatepass"), dtype=np.uint32), 0)
+        # ak sa nepodarilo nájsť koniec, infobox beriem až po koniec textu
+        return start, (start + end if end >= 0 else len(wt))
+
+    # bez numby: finditer skáče rovno po ďalších {{ / }} (rovnako ako prechod po znakoch zľava)
     depth = 0
-    end_idx = None
-    i = 0
-    while i < len(text):
-        if text.startswith("{{", i):
+    for b in BRACES_RE.finditer(wt, start):
+        if b.group() == "{{":
             depth += 1
-            i += 2
-            continue
-        if text.startswith("}}", i):
-            depth -= 1
-            i += 2
-            if depth <= 0:
-                # Našli sme koniec infoboxu
-                end_idx = i
-                break
             continue
-        i += 1
+        depth -= 1
+        if depth <= 0:
+            # Našli sme koniec infoboxu
+            return start, b.end()
+
+    # ak sa nepodarilo nájsť koniec, infobox beriem až po koniec textu
+    return start, len(wt)
 
-    if end_idx is None:
-        # ak sa nepodarilo nájsť koniec, odseknem text od začiatku infoboxu
-        return wt[:start]
 
-    # vrátim text bez úvodného infoboxu
-    return wt[:start] + text[end_idx:]
+def remove_infobox_from_text(wt: str, span: Optional[Tuple[int, int]]) -> str:
+    # z wikitextu odstránim celý infobox; span = výsledok locate_infobox(wt)
+    if not wt:
+        return ""
+    if span is None:
+        # ak žiadny infobox nenajdem – vrátim pôvodný text
+        return wt
+
+    # vrátim text bez úvodného infoboxu (bez nájdeného konca sa text odsekne od začiatku infoboxu)
+    start, end = span
+    return wt[:start] + wt[end:]
 
 
-def first_paragraph(wt: str) -> str:
-    # vrátim prvý odstavec článku (krátky summary alebo opis lieku)
+def first_paragraph(wt: str, span: Optional[Tuple[int, int]]) -> str:
+    # vrátim prvý odstavec článku (krátky summary alebo opis lieku); span = výsledok locate_infobox(wt)
 
     if not wt:
         return ""
-    wt = remove_infobox_from_text(wt)
+    wt = remove_infobox_from_text(wt, span)
     wt = clean_val(wt)
 
     # odrežem text za určitými sekciami, ktoré nie sú súčasťou popisu lieku
-    wt = re.split(r"\n==\s*(References|See also|External links|Further reading)\s*==", wt)[0]
+    wt = SECTION_SPLIT_RE.split(wt, maxsplit=1)[0]
 
     # rozdelím na odstavce podľa prázdneho riadku
-    parts = re.split(r"\n\s*\n", wt)
+    parts = PARAGRAPH_SPLIT_RE.split(wt, maxsplit=1)
     return (parts[0].strip() if parts else "")[:4000]
 
 
 # ----------------------------------------
 # extrakcia tela infoboxu z wikitextu
-def extract_infobox_body(wikitext: str) -> str:
-    # nájdem Infobox (Infobox drug, Drugbox, Chembox, Infobox chemical, enzyme, anatomy)
-    if not wikitext:
+def extract_infobox_body(wikitext: str, span: Optional[Tuple[int, int]]) -> str:
+    # telo infoboxu (Infobox drug, Drugbox, Chembox, Infobox chemical, enzyme, anatomy); span = výsledok locate_infobox
+    if not wikitext or span is None:
         return ""
 
-    # index začiatku infoboxu
-    m = re.search(
-        r"\{\{\s*(infobox\s*drug|drugbox|chembox|infobox\s*chemical|infobox\s*enzyme|infobox\s*anatomy)\b",
-        wikitext,
-        flags=re.I,
-    )
-    if not m:
-        return ""
-
-    start = m.start()
-    text = wikitext[start:]
-
-    depth = 0
-    end_idx = None
-    i = 0
-    while i < len(text):
-        if text.startswith("{{", i):
-            depth += 1
-            i += 2
-            continue
-        if text.startswith("}}", i):
-            depth -= 1
-            i += 2
-            if depth <= 0:
-                end_idx = i
-                break
-            continue
-        i += 1
-
-    if end_idx is None:
-        # ak sa mi nepodarí nájsť koniec, beriem zvyšok textu
-        box = text
-    else:
-        box = text[:end_idx]
+    # bez nájdeného konca je v span koniec textu, beriem teda zvyšok
+    start, end = span
+    box = wikitext[start:end]
 
     # rozdelím celý box na riadky
     lines = box.splitlines()
@@ -211,6 +257,27 @@ FIELD_PATTERNS = {
     "pregnancy_category": r"^\s*\|\s*pregnancy_category\s*=\s*(?P<val>[^|]+)",
 }
 
+# všetky vzory spojené do jedného regexu, infobox prejdem cez finditer len raz (namiesto re.search pre každé pole)
+# - každý vzor je v lookahead (?=...), takže match nič nespotrebuje a hodnota jedného poľa
+#   nezhltne začiatok ďalšieho riadku – výsledok je rovnaký ako pri samostatných re.search
+# - skupina s menom poľa povie, ktorý vzor sedel (m.lastgroup), hodnota je v skupine val_<pole>
+# - pred vzormi je lacný literálový predfilter: riadok s iným poľom (väčšina infoboxu) sa odmietne jedným testom,
+#   nie dvanástimi lookaheadmi; FIELD_PREFIXES musí pokrývať začiatok mena poľa v každom vzore
+FIELD_PREFIXES = ("trade", "synonyms", "other_names", "aka", "also_known_as", "route", "atc",
+                  "elimination", "half", "cas", "legal_status", "pregnancy")
+FIELD_RE = re.compile(
+    r"^(?=\s*\|\s*(?:" + "|".join(FIELD_PREFIXES) + "))"
+    "(?:" + "|".join(
+        f"(?=(?P<{key}>{pat.replace('(?P<val>', f'(?P<val_{key}>')}))"
+        for key, pat in FIELD_PATTERNS.items()
+    ) + ")",
+    re.I | re.M,
+)
+
+# pole s ATC kódom v infoboxe (flag has_atc) a text 'ATC code(s)' / 'ATC' v hodnote (normalize_atc)
+HAS_ATC_RE  = re.compile(r"^\s*\|\s*(atc|atc_code|atc_codes?|atc_prefix|atc_suffix)\s*=", re.I | re.M)
+ATC_TEXT_RE = re.compile(r"\bATC(?:\s*codes?)?\b", re.I)
+
 BASE_WIKI_URL = "https://en.wikipedia.org/wiki/"
 
 
@@ -228,10 +295,8 @@ def normalize_atc(val: str) -> str:
     if not val:
         return ""
     v = clean_val(val)
-    v = re.sub(r"(?i)\bATC\s*codes?\b", " ", v)
-    v = re.sub(r"(?i)\bATC\s*code\b", " ", v)
-    v = re.sub(r"(?i)\bATC\b", " ", v)
-    v = re.sub(r"\s+", " ", v).strip()
+    v = ATC_TEXT_RE.sub(" ", v)
+    v = WHITESPACE_RE.sub(" ", v).strip()
     return v
 
 
@@ -240,11 +305,14 @@ def parse_infobox_fields(body: str) -> dict:
     if not body:
         return {}
     out = {}
-    for key, pat in FIELD_PATTERNS.items():
-        m = re.search(pat, body, flags=re.I | re.M)
-        if not m:
+    seen = set()
+    for m in FIELD_RE.finditer(body):
+        key = m.lastgroup
+        # beriem len prvý výskyt poľa (ako re.search)
+        if key in seen:
             continue
-        raw = m.group("val")
+        seen.add(key)
+        raw = m.group(f"val_{key}")
         val = clean_val(raw)
 
         # ATC kódy normalizujem trochu špeciálne (odstránime text 'ATC code')
@@ -265,38 +333,24 @@ def make_spark() -> SparkSession:
 
     return (
         SparkSession.builder
-        .master("local[4]")        # 4 jadrá
+        .master("local[*]")        # všetky jadrá
         .appName("WikiJoinDrugs")
         .config("spark.driver.bindAddress", "127.0.0.1")    # fixnutie na 127.0.0.1
         .config("spark.driver.host", "127.0.0.1")
         .config("spark.network.timeout", "600s")                  # zabránenie time-outom pri dlhších operáciách
         .config("spark.executor.heartbeatInterval", "60s")        # zabránenie time-outom pri dlhších operáciách
         .config("spark.python.worker.reuse", "true")      # opätovné použitie worker procesov
+        .config("spark.jars.packages", SPARK_XML_PACKAGE)         # XML data source pre wiki dumpy
+        .config("spark.sql.files.maxPartitionBytes", MAX_PARTITION_BYTES)
+        .config("spark.sql.autoBroadcastJoinThreshold", BROADCAST_JOIN_THRESHOLD)   # malé tabuľky joinuj broadcastom
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")      # toPandas cez Arrow
+        # .bz2 je v Hadoope splittable už defaultne; spark-xml číta cez Hadoop input format, ktorý maxPartitionBytes
+        # nepozná, preto mu veľkosť kusu obmedzím aj tu – veľký dump tak rozbaľuje viac taskov naraz
+        .config("spark.hadoop.mapreduce.input.fileinputformat.split.maxsize", str(SPLIT_MAX_BYTES))
         .getOrCreate()
     )
 
 
-def split_pages(part_iter):
-    # funkcia na rozdelenie raw XML dumpu na jednotlivé <page> bloky
-    buf = []
-    in_page = False
-    for row in part_iter:
-        s = row[0]  # spark.read.text -> Row(value=...); row[0] = obsah riadku
-        if "<page>" in s:
-            # začiatok novej stránky – resetujem buffer
-            in_page = True
-            buf = [s]
-        elif "</page>" in s and in_page:
-            # koniec stránky – pridaj riadok
-            buf.append(s)
-            yield "\n".join(buf)
-            in_page = False
-            buf = []
-        elif in_page:
-            # som uprostred stránky – len pridávam riadky
-            buf.append(s)
-
-
 #--------------------------
 def main():
     # vytvorím SparkSession
@@ -333,16 +387,32 @@ def main():
         F.col("generic_norm").isNotNull() & (F.col("generic_norm") != "")
     )
 
-    print("[INFO] Počet riadkov v CSV:", df_drugs.count())
-    print("[INFO] Počet unikátnych generic_name:", df_drugs.select("generic_norm").distinct().count())
+    # počet riadkov aj unikátnych hodnôt v jednom prechode (jeden job namiesto count() + distinct().count())
+    # countDistinct ignoruje null, ale generic_norm je už bez null (rovnako title_norm a generic_name nižšie)
+    stats = df_drugs.agg(F.count("*").alias("n"), F.countDistinct("generic_norm").alias("uniq")).first()
+    print("[INFO] Počet riadkov v CSV:", stats["n"])
+    print("[INFO] Počet unikátnych generic_name:", stats["uniq"])
 
     # načítam si wiki dump a extrahujem relevantné stránky
-    # raw: DataFrame s jedným stĺpcom 'value' (riadky XML)
-    raw = spark.read.text(WIKI_DUMPS_PATTERN)
+    # pages_df: jeden riadok = jedna <page> (title, redirect_to, wikitext), XML rozdelí a parsuje spark-xml v JVM
+    pages_df = (
+        spark.read
+        .format("xml")
+        .option("rowTag", "page")
+        .option("rootTag", "mediawiki")
+        .schema(PAGE_SCHEMA)
+        .load(WIKI_DUMPS_PATTERN)
+        .select(
+            F.col("title"),
+            F.col("redirect._title").alias("redirect_to"),
+            F.col("revision.text._VALUE").alias("wikitext"),
+        )
+    )
 
     # uložím si všetky jedinečné generic_norm z df_drugs ako Python list
-    generic_names = [r["generic_norm"] for r in df_drugs.select("generic_norm").distinct().collect()]
-    generic_set = set(generic_names)
+    # toPandas ide cez Arrow (stĺpcovo), nie cez Row objekty ako collect()
+    generic_names = df_drugs.select("generic_norm").distinct().toPandas()["generic_norm"].tolist()
+    generic_set = frozenset(generic_names)
     # Broadcast-set – posielam do executors, aby vedeli kontrolovať, či title patrí medzi lieky
     generic_bc = spark.sparkContext.broadcast(generic_set)
 
@@ -352,46 +422,51 @@ def main():
         re.I
     )
 
-    def parse_page(xml: str) -> Optional[Row]:
-        # parsujem jeden <page> XML blok a v prípade, že title po normalizácii z wiki patrí do množiny generic_norm (lieky z Drugs.com),
+    def parse_page(page: dict, generic_set: frozenset) -> Optional[Row]:
+        # spracujem jednu <page> (title, redirect_to, wikitext) a v prípade, že title po normalizácii z wiki patrí do množiny generic_norm (lieky z Drugs.com),
         # vytvorím Row s extrahovanými wiki dátami a infobox informáciami
 
-        # Title a text článku
-        title_m = TITLE_RE.search(xml)
-        text_m  = TEXT_RE.search(xml)
-        # redirect (ak by bol)
-        redir_m = REDIR_RE.search(xml)
-
-        if not title_m:
+        if not page["title"]:
             return None
 
-        title = title_m.group(1).strip()
-        title_norm = title.lower().strip()
+        # title už má XML entity dekódované zo spark-xml; lower() na orezanom stringu už znova orezávať netreba
+        # (lower, nie casefold – musí sedieť s F.lower pri generic_norm)
+        title = page["title"].strip()
+        title_norm = title.lower()
+
+        # zaujímajú ma len tie tituly, ktoré sa zhodujú s generic_norm z Drugs.com
+        # (lookup v sete je najlacnejší test, preto ide prvý – regex nižšie beží len pre zhodné tituly)
+        if title_norm not in generic_set:
+            return None
 
         # vyfiltrujem neobsahové stránky napríklad zoznamy,..
         if INVALID_TITLE_RE.match(title):
             return None
 
-        # zaujímajú ma len tie tituly, ktoré sa zhodujú s generic_norm z Drugs.com
-        if title_norm not in generic_bc.value:
-            return None
+        wikitext = page["wikitext"] or ""
+        redirect_to = page["redirect_to"] or ""
 
-        wikitext = text_m.group(1) if text_m else ""
-        redirect_to = redir_m.group(1) if redir_m else ""
+        # redirect stránka nemá infobox ani popis (wikitext je len '#REDIRECT [[...]]') – vrátim prázdny riadok
+        # bez parsovania wikitextu; pri výbere najlepšieho záznamu pre title_norm tak vždy prehrá so skutočným článkom
+        if redirect_to or wikitext.lstrip()[:9].lower() == "#redirect":
+            return Row(
+                wiki_title=title,
+                title_norm=title_norm,
+                wiki_url=make_wiki_url(title),
+                wiki_has_infobox=False,
+                wiki_has_atc=False,
+                **{name: "" for name in WIKI_SCHEMA.fieldNames()[5:]},
+            )
 
-        # Alternatívne by sa dali vyhodiť stránky, ktoré sú len čistý redirect
-        # if wikitext.lstrip().lower().startswith("#redirect"):
-        #     return None
+        # infobox nájdem raz a rozsah použijem pre telo infoboxu aj pre summary bez infoboxu
+        infobox_span = locate_infobox(wikitext)
 
         # telo infoboxu
-        body = extract_infobox_body(wikitext)
+        body = extract_infobox_body(wikitext, infobox_span)
         has_infobox = bool(body)
 
         # flag, či sa v infoboxe nachádza ATC kód
-        has_atc = bool(re.search(
-            r"^\s*\|\s*(atc|atc_code|atc_codes?|atc_prefix|atc_suffix)\s*=",
-            body, flags=re.I | re.M
-        ))
+        has_atc = bool(HAS_ATC_RE.search(body))
 
         # parsovanie konkrétnych polí z infoboxu
         fields = parse_infobox_fields(body)
@@ -421,7 +496,7 @@ def main():
             wiki_url=wiki_url,
             wiki_has_infobox=has_infobox,
             wiki_has_atc=has_atc,
-            wiki_summary=first_paragraph(wikitext),
+            wiki_summary=first_paragraph(wikitext, infobox_span),
             wiki_tradename=fields.get("tradename", ""),
             wiki_synonyms=fields.get("synonyms", ""),
             wiki_routes=fields.get("routes", ""),
@@ -432,49 +507,62 @@ def main():
             wiki_pregnancy=preg_string
         )
 
-    # prevedieme raw DataFrame na RDD, zoskupíme riadky do <page> blokov
-    pages_rdd = raw.rdd.mapPartitions(split_pages)
-    rows_rdd = pages_rdd.map(parse_page).filter(lambda r: r is not None)
-
-    # vytvorím DataFrame z extrahovaných Row a persistneme (pre opakované použitie)
-    df_wiki = spark.createDataFrame(rows_rdd).persist(StorageLevel.MEMORY_AND_DISK)
-
-    wiki_count = df_wiki.count()
-    uniq_wiki_titles = df_wiki.select("title_norm").distinct().count()
-    print(f"[INFO] Počet wiki stránok, kde title zodpovedá generic_name: {wiki_count}")
-    print(f"[INFO] Počet unikátnych wiki titulkov (po normalizácii): {uniq_wiki_titles}")
+    # lacný predfilter ešte v JVM: do Pythonu pošlem len stránky, ktorých title je medzi generic_norm
+    # (isin nad veľa hodnotami je hash set), ostatné stránky (drvivá väčšina dumpu) sa vôbec neserializujú
+    # parse_page si title kontroluje aj sama, toto len ušetrí prenos a volania pre nepotrebné stránky
+    drug_pages_df = pages_df.where(F.lower(F.trim(F.col("title"))).isin(generic_names))
+
+    def parse_pages(batches):
+        # spracujem celú partíciu naraz – broadcast set si vytiahnem raz, nie pri každej stránke
+        # stránky prichádzajú ako pandas dávky (Arrow), výsledné riadky vrátim tiež ako dávku
+        generic_set = generic_bc.value
+        columns = WIKI_SCHEMA.fieldNames()
+        for pdf in batches:
+            rows = []
+            for page in pdf.to_dict("records"):
+                row = parse_page(page, generic_set)
+                if row is not None:
+                    rows.append(row.asDict())
+            if rows:
+                yield pd.DataFrame(rows, columns=columns)
+
+    # stránky už prídu rozdelené, v Pythone len parsujem wikitext
+    # vytvorím df_wiki s pevnou schémou (bez inferencie z Row objektov) a persistnem (pre opakované použitie)
+    df_wiki = drug_pages_df.mapInPandas(parse_pages, schema=WIKI_SCHEMA).persist(StorageLevel.MEMORY_AND_DISK)
+
+    stats = df_wiki.agg(F.count("*").alias("n"), F.countDistinct("title_norm").alias("uniq")).first()
+    print(f"[INFO] Počet wiki stránok, kde title zodpovedá generic_name: {stats['n']}")
+    print(f"[INFO] Počet unikátnych wiki titulkov (po normalizácii): {stats['uniq']}")
 
     # JOIN -> Drugs.com dáta a Wiki dáta
     # najprv vyberiem najlepší záznam z df_wiki pre každý title_norm -> "Najlepší" = s infoboxom + dlhším summary.
-    w = Window.partitionBy("title_norm").orderBy(
-        F.desc("wiki_has_infobox"),         # preferuj riadky, ktoré majú infobox
-        F.desc(F.length("wiki_summary"))    # a dlhší summary
-    )
-
+    # stávalo sa mi, že som mala viacero záznamov pre jeden liek, pričom v jednom bol len redirect na druhú stránku,
+    # tak tieto nechcem brať do úvahy (redirect nemá infobox ani summary, takže vždy prehrá)
+    # max nad štruktúrou (priorita, riadok) cez groupBy – agregácia sa čiastočne spraví už pred shuffle,
+    # takže sa neposielajú a netriedia všetky riadky ako pri Window + row_number
+    wiki_cols = [c for c in df_wiki.columns if c != "title_norm"]
     df_wiki_best = (
         df_wiki
-        # spravila som si voliteľné skóre, lebo sa mi stavalo, že som mala viacero zaznamov pre jeden liek pričom v jednom bol
-        # len redirect na druhu stranku tak tieto som nechcela brat do úvahy
-        .withColumn("row_score",
-                    F.when(F.col("wiki_has_infobox"), 1).otherwise(0) +
-                    F.when(F.length("wiki_summary") > 0, 1).otherwise(0))
-        # priradím poradie v rámci skupiny (title_norm), najlepší má rn = 1
-        .withColumn("rn", F.row_number().over(w))
-        .filter(F.col("rn") == 1)  # necháme si len najlepší riadok
-        .drop("rn", "row_score")   # pomocné stĺpce už nepotrebujeme
+        .groupBy("title_norm")
+        .agg(F.max(F.struct(
+            F.col("wiki_has_infobox").alias("p1"),          # preferuj riadky, ktoré majú infobox
+            F.length("wiki_summary").alias("p2"),           # a dlhší summary
+            F.struct(*wiki_cols).alias("row"),
+        )).alias("best"))
+        .select("title_norm", "best.row.*")                 # necháme si len najlepší riadok
     )
 
     # JOIN -> normalizovaný generický názov = normalizovaný wiki.title
     df_join = (
         df_drugs
-        .join(df_wiki_best, on=(df_drugs.generic_norm == df_wiki_best.title_norm), how="left")
+        # df_wiki_best je malý (jeden riadok na liek) -> broadcast hash join bez shuffle a triedenia oboch strán
+        .join(F.broadcast(df_wiki_best), on=(df_drugs.generic_norm == df_wiki_best.title_norm), how="left")
         .drop("generic_norm", "title_norm")  # joinovacie stĺpce vo výsledku už netreba tak ich dropnem
     )
 
-    joined_count = df_join.count()
-    uniq_join_generic = df_join.select("generic_name").distinct().count()
-    print(f"[INFO] Počet riadkov po JOIN-e: {joined_count}")
-    print(f"[INFO] Počet unikátnych generic_name po JOIN-e: {uniq_join_generic}")
+    stats = df_join.agg(F.count("*").alias("n"), F.countDistinct("generic_name").alias("uniq")).first()
+    print(f"[INFO] Počet riadkov po JOIN-e: {stats['n']}")
+    print(f"[INFO] Počet unikátnych generic_name po JOIN-e: {stats['uniq']}")
 
     # zápis výsledného datasetu do TSV (Spark CSV s tab delimiterom)
     if os.path.exists(OUT_TSV_DIR) and not os.path.isdir(OUT_TSV_DIR):
@@ -486,16 +574,18 @@ def main():
 
     (
         df_join
-        .coalesce(1)                # zlúčim všetko do jedného výstupného súboru (part-00000)
+        # toľko výstupných súborov, koľko je jadier – zápis beží paralelne (coalesce bez shuffle, poradie riadkov ostane)
+        .coalesce(spark.sparkContext.defaultParallelism)
         .write
         .mode("overwrite")          # prepíš prípadný starý obsah
-        .option("header", True)     # prvý riadok bude hlavička
+        .option("header", True)     # prvý riadok bude hlavička (v každom parte)
         .option("delimiter", "\t")  # použijem tabulátor ako oddeľovač
+        .option("compression", "gzip")
         .csv(OUT_TSV_DIR)
     )
 
     print(f"[OK] Join dataset uložený do: {OUT_TSV_DIR}")
-    print("    (vnútri nájdeš súbor part-*.csv, obsahuje TSV dáta)")
+    print("    (vnútri nájdeš súbory part-*.csv.gz, obsahujú TSV dáta – lucene_indexer ich číta všetky po poradí)")
 
     # Ukončenie SparkSession
     spark.stop()